@@ -0,0 +1,543 @@
+"""
+Benchmark phía truy vấn của warehouse (sql/schema.sql) trên Postgres local.
+
+    python benchmarks/query_benchmark.py --customers 10000 --transactions 1000000 --json v1.json
+    python benchmarks/query_benchmark.py --skip-load --runs 50 --baseline v1.json
+    python benchmarks/query_benchmark.py --workload my_queries.sql --skip-load
+
+Các bước:
+    1. Tạo schema trong 1 schema Postgres riêng (mặc định `etl_bench`, không đụng tới dữ liệu thật)
+    2. Sinh dữ liệu tất định (setseed) bằng generate_series: dimensions SCD2, facts theo thứ tự
+       ngày như khi load thật, bảng aggregate; đo thời gian load + kích thước bảng / index
+    3. Replay các star join / aggregate của dashboard (hoặc file --workload), mỗi query `--runs` lần
+       với tham số ngẫu nhiên tất định, báo cáo p50/p95/p99
+    4. 1 lần EXPLAIN (ANALYZE, BUFFERS) mỗi query: shared hit/read, temp, I/O time, plan
+
+Kết quả kèm fingerprint của schema (định nghĩa index) để so sánh giữa các phiên bản schema;
+--baseline in ra chênh lệch so với 1 file JSON trước đó.
+
+Kết nối lấy từ POSTGRES_HOST / POSTGRES_PORT / POSTGRES_USER / POSTGRES_PASSWORD / POSTGRES_DB
+hoặc --dsn.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCHEMA_FILE = os.path.join(BASE_DIR, "sql", "schema.sql")
+PHYSICAL_DESIGN_FILE = os.path.join(BASE_DIR, "sql", "physical_design.sql")
+
+CITIES = ['Hanoi', 'Ho Chi Minh City', 'Da Nang', 'Hai Phong', 'Can Tho', 'Hue', 'Nha Trang', 'Vung Tau']
+
+# ---------- Sinh dữ liệu ----------
+# Mỗi bước: (tên, SQL). Tham số: %(customers)s, %(transactions)s, %(start)s, %(days)s, ...
+LOAD_STEPS = [
+    ("dim_date", """
+        INSERT INTO dim_date
+        SELECT d::date, to_char(d, 'DD-MM-YYYY'), EXTRACT(DOW FROM d)::int + 1, to_char(d, 'FMDay'),
+               EXTRACT(DAY FROM d), EXTRACT(MONTH FROM d), 'Tháng ' || EXTRACT(MONTH FROM d),
+               EXTRACT(QUARTER FROM d), EXTRACT(YEAR FROM d), EXTRACT(DOW FROM d) IN (0, 6), FALSE
+        FROM generate_series(%(start)s::date, %(start)s::date + %(days)s - 1, interval '1 day') AS d;
+    """),
+    ("dim_branch", """
+        INSERT INTO dim_branch (branch_id_source, branch_name, branch_location)
+        SELECT 'BR' || i, 'Branch ' || i, (%(cities)s::text[])[1 + (i %% cardinality(%(cities)s::text[]))]
+        FROM generate_series(1, %(branches)s) AS i;
+    """),
+    # Phiên bản hiện tại trước (customer_key 1..N trùng với account / card), 10% có thêm 1 phiên bản cũ
+    ("dim_customer", """
+        INSERT INTO dim_customer (customer_id_source, birth_year, gender, city, valid_from_date)
+        SELECT i::text, 1950 + floor(random() * 55)::int, (ARRAY['Male', 'Female'])[1 + (i %% 2)],
+               (%(cities)s::text[])[1 + floor(random() * cardinality(%(cities)s::text[]))::int],
+               %(start)s::date + (i %% 10 = 0)::int * (%(days)s / 2)
+        FROM generate_series(1, %(customers)s) AS i;
+        INSERT INTO dim_customer (customer_id_source, birth_year, gender, city,
+                                  valid_from_date, valid_to_date, is_current)
+        SELECT customer_id_source, birth_year, gender, 'Unknown',
+               %(start)s::date - 365, valid_from_date - 1, FALSE
+        FROM dim_customer WHERE valid_from_date > %(start)s::date;
+    """),
+    ("dim_account", """
+        INSERT INTO dim_account (account_id_source, account_type, date_of_account_opening,
+                                 last_transaction_date, valid_from_date)
+        SELECT 'ACC_' || i, (ARRAY['Savings', 'Current'])[1 + (i %% 2)],
+               %(start)s::date - floor(random() * 3650)::int, NULL, %(start)s::date
+        FROM generate_series(1, %(customers)s) AS i;
+    """),
+    ("dim_card", """
+        INSERT INTO dim_card (card_id_source, card_type, credit_limit, rewards_points, valid_from_date)
+        SELECT 'C' || i, (ARRAY['Visa', 'MasterCard', 'AMEX'])[1 + (i %% 3)],
+               round((1000 + random() * 9000)::numeric, 2), floor(random() * 10000)::int, %(start)s::date
+        FROM generate_series(1, %(customers)s) AS i;
+    """),
+    ("dim_loan", """
+        INSERT INTO dim_loan (loan_id_source, loan_type, loan_amount, interest_rate, loan_term,
+                              current_loan_status, valid_from_date)
+        SELECT 'L' || i, (ARRAY['Mortgage', 'Auto', 'Personal'])[1 + (i %% 3)],
+               round((5000 + random() * 45000)::numeric, 2), round((0.02 + random() * 0.08)::numeric, 4),
+               (ARRAY[12, 24, 36, 48, 60])[1 + (i %% 5)],
+               (ARRAY['Approved', 'Rejected', 'Closed'])[1 + floor(random() * 3)::int], %(start)s::date
+        FROM generate_series(1, %(loans)s) AS i;
+    """),
+    # Giao dịch được sinh theo thứ tự ngày tăng dần như khi load hằng ngày
+    ("fact_transaction", """
+        INSERT INTO fact_transaction (transaction_id_source, transaction_date_key, customer_key, account_key,
+                                      branch_key, card_key, transaction_type, anomaly_flag,
+                                      transaction_amount, acc_balance_after_transaction)
+        SELECT 'T' || g, %(start)s::date + ((g - 1) * %(days)s / %(transactions)s)::int, c, c,
+               1 + floor(random() * %(branches)s)::int, CASE WHEN random() < 0.7 THEN c END,
+               (ARRAY['Deposit', 'Withdrawal', 'Transfer'])[1 + floor(random() * 3)::int],
+               CASE WHEN random() < 0.01 THEN '-1' ELSE '1' END,
+               round((1 + random() * 5000)::numeric, 2), round((random() * 100000)::numeric, 2)
+        FROM (SELECT g, 1 + floor(random() * %(customers)s)::int AS c
+              FROM generate_series(1, %(transactions)s::bigint) AS g) AS t;
+    """),
+    ("fact_account_snapshot", """
+        INSERT INTO fact_account_snapshot (snapshot_date_key, account_key, customer_key, account_balance)
+        SELECT d::date, a, a, round((random() * 100000)::numeric, 2)
+        FROM generate_series(%(start)s::date + %(days)s - %(snapshot_days)s,
+                             %(start)s::date + %(days)s - 1, interval '1 day') AS d,
+             generate_series(1, %(customers)s) AS a;
+    """),
+    ("fact_card_snapshot", """
+        INSERT INTO fact_card_snapshot (snapshot_date_key, card_key, customer_key, credit_card_balance,
+                                        minimum_payment_due, payment_due_date)
+        SELECT d::date, c, c, b, round(b * 0.05, 2), d::date + 25
+        FROM (SELECT d, c, round((random() * 5000)::numeric, 2) AS b
+              FROM generate_series(%(start)s::date + %(days)s - %(snapshot_days)s,
+                                   %(start)s::date + %(days)s - 1, interval '1 day') AS d,
+                   generate_series(1, %(customers)s) AS c) AS t;
+    """),
+    ("fact_loan_application", """
+        INSERT INTO fact_loan_application (application_date_key, customer_key, loan_key, application_status)
+        SELECT %(start)s::date + floor(random() * %(days)s)::int, 1 + floor(random() * %(customers)s)::int,
+               l.loan_key, l.current_loan_status
+        FROM dim_loan l;
+    """),
+    ("fact_feedback", """
+        INSERT INTO fact_feedback (feedback_id, feedback_date_key, resolution_date_key, customer_key,
+                                   feedback_type, resolution_status)
+        SELECT 'F' || i, f, CASE WHEN random() < 0.8 THEN LEAST(f + floor(random() * 30)::int,
+                                                              %(start)s::date + %(days)s - 1) END,
+               1 + floor(random() * %(customers)s)::int,
+               (ARRAY['Complaint', 'Suggestion', 'Praise'])[1 + (i %% 3)],
+               (ARRAY['Resolved', 'Pending'])[1 + (i %% 2)]
+        FROM (SELECT i, %(start)s::date + floor(random() * %(days)s)::int AS f
+              FROM generate_series(1, %(feedbacks)s) AS i) AS t;
+    """),
+    ("aggregates", """
+        INSERT INTO agg_daily_branch_transaction
+        SELECT transaction_date_key, branch_key, transaction_type, COUNT(*), SUM(transaction_amount)
+        FROM fact_transaction GROUP BY 1, 2, 3;
+        INSERT INTO agg_monthly_customer_balance
+        SELECT date_trunc('month', transaction_date_key)::date, customer_key, COUNT(*),
+               MIN(acc_balance_after_transaction), MAX(acc_balance_after_transaction),
+               (ARRAY_AGG(acc_balance_after_transaction ORDER BY transaction_date_key DESC, transaction_key DESC))[1],
+               MAX(transaction_date_key)
+        FROM fact_transaction GROUP BY 1, 2;
+        INSERT INTO agg_loan_approval_by_type (loan_type, application_count, approved_count)
+        SELECT l.loan_type, COUNT(*), COUNT(*) FILTER (WHERE f.application_status = 'Approved')
+        FROM fact_loan_application f JOIN dim_loan l ON l.loan_key = f.loan_key GROUP BY 1;
+    """),
+]
+
+# ---------- Workload ----------
+# Query dashboard tiêu biểu. params(rng, ctx) sinh tham số cho mỗi lần chạy.
+QUERIES = [
+    {
+        "name": "branch_daily_volume",
+        "sql": """
+            SELECT d.date_key, b.branch_name, COUNT(*), SUM(f.transaction_amount)
+            FROM fact_transaction f
+            JOIN dim_date d ON d.date_key = f.transaction_date_key
+            JOIN dim_branch b ON b.branch_key = f.branch_key
+            WHERE f.transaction_date_key BETWEEN %(from_date)s AND %(from_date)s + 6
+              AND f.branch_key = %(branch_key)s
+            GROUP BY d.date_key, b.branch_name ORDER BY d.date_key;
+        """,
+        "params": lambda rng, ctx: {"from_date": ctx.random_date(rng, 7), "branch_key": rng.randint(1, ctx.branches)},
+    },
+    {
+        "name": "customer_recent_history",
+        "sql": """
+            SELECT f.transaction_date_key, f.transaction_type, f.transaction_amount,
+                   f.acc_balance_after_transaction, a.account_type
+            FROM fact_transaction f
+            JOIN dim_account a ON a.account_key = f.account_key
+            WHERE f.customer_key = %(customer_key)s
+              AND f.transaction_date_key >= %(from_date)s
+            ORDER BY f.transaction_date_key DESC LIMIT 100;
+        """,
+        "params": lambda rng, ctx: {"customer_key": rng.randint(1, ctx.customers),
+                                    "from_date": ctx.random_date(rng, 90)},
+    },
+    {
+        "name": "monthly_amount_by_city",
+        "sql": """
+            SELECT d.year_num, d.month_num, c.city, SUM(f.transaction_amount), COUNT(DISTINCT f.customer_key)
+            FROM fact_transaction f
+            JOIN dim_date d ON d.date_key = f.transaction_date_key
+            JOIN dim_customer c ON c.customer_key = f.customer_key
+            WHERE f.transaction_date_key BETWEEN %(from_date)s AND %(from_date)s + 29
+            GROUP BY d.year_num, d.month_num, c.city;
+        """,
+        "params": lambda rng, ctx: {"from_date": ctx.random_date(rng, 30)},
+    },
+    {
+        "name": "quarterly_spend_by_card_type",
+        "sql": """
+            SELECT d.quarter_num, k.card_type, f.transaction_type, SUM(f.transaction_amount)
+            FROM fact_transaction f
+            JOIN dim_date d ON d.date_key = f.transaction_date_key
+            JOIN dim_card k ON k.card_key = f.card_key
+            WHERE d.year_num = %(year)s
+            GROUP BY d.quarter_num, k.card_type, f.transaction_type;
+        """,
+        "params": lambda rng, ctx: {"year": ctx.random_date(rng, 1).year},
+    },
+    {
+        "name": "weekend_anomalies",
+        "sql": """
+            SELECT d.is_weekend, b.branch_location, COUNT(*)
+            FROM fact_transaction f
+            JOIN dim_date d ON d.date_key = f.transaction_date_key
+            JOIN dim_branch b ON b.branch_key = f.branch_key
+            WHERE f.anomaly_flag = '-1'
+              AND f.transaction_date_key BETWEEN %(from_date)s AND %(from_date)s + 89
+            GROUP BY d.is_weekend, b.branch_location;
+        """,
+        "params": lambda rng, ctx: {"from_date": ctx.random_date(rng, 90)},
+    },
+    {
+        "name": "eod_balance_by_account_type",
+        "sql": """
+            SELECT a.account_type, SUM(s.account_balance), AVG(s.account_balance)
+            FROM fact_account_snapshot s
+            JOIN dim_account a ON a.account_key = s.account_key
+            WHERE s.snapshot_date_key = %(snapshot_date)s
+            GROUP BY a.account_type;
+        """,
+        "params": lambda rng, ctx: {"snapshot_date": ctx.random_snapshot_date(rng)},
+    },
+    {
+        "name": "card_utilization_trend",
+        "sql": """
+            SELECT s.snapshot_date_key, SUM(s.credit_card_balance) / NULLIF(SUM(k.credit_limit), 0)
+            FROM fact_card_snapshot s
+            JOIN dim_card k ON k.card_key = s.card_key
+            WHERE s.customer_key = %(customer_key)s
+            GROUP BY s.snapshot_date_key ORDER BY s.snapshot_date_key;
+        """,
+        "params": lambda rng, ctx: {"customer_key": rng.randint(1, ctx.customers)},
+    },
+    {
+        "name": "loan_approval_by_type",
+        "sql": """
+            SELECT l.loan_type, f.application_status, COUNT(*), SUM(l.loan_amount)
+            FROM fact_loan_application f
+            JOIN dim_loan l ON l.loan_key = f.loan_key
+            JOIN dim_date d ON d.date_key = f.application_date_key
+            WHERE d.quarter_num = %(quarter)s
+            GROUP BY l.loan_type, f.application_status;
+        """,
+        "params": lambda rng, ctx: {"quarter": rng.randint(1, 4)},
+    },
+    {
+        "name": "feedback_resolution_days",
+        "sql": """
+            SELECT f.feedback_type, AVG(f.resolution_date_key - f.feedback_date_key), COUNT(*)
+            FROM fact_feedback f
+            WHERE f.feedback_date_key BETWEEN %(from_date)s AND %(from_date)s + 29
+            GROUP BY f.feedback_type;
+        """,
+        "params": lambda rng, ctx: {"from_date": ctx.random_date(rng, 30)},
+    },
+    {
+        "name": "agg_branch_dashboard",
+        "sql": """
+            SELECT a.transaction_date_key, SUM(a.transaction_count), SUM(a.total_amount)
+            FROM agg_daily_branch_transaction a
+            WHERE a.branch_key = %(branch_key)s
+              AND a.transaction_date_key BETWEEN %(from_date)s AND %(from_date)s + 29
+            GROUP BY a.transaction_date_key ORDER BY a.transaction_date_key;
+        """,
+        "params": lambda rng, ctx: {"from_date": ctx.random_date(rng, 30), "branch_key": rng.randint(1, ctx.branches)},
+    },
+]
+
+
+class DatasetContext:
+    """Kích thước dataset đã sinh, dùng để sinh tham số query nằm trong miền dữ liệu."""
+
+    def __init__(self, args):
+        self.start = date.fromisoformat(args.start_date)
+        self.days = args.days
+        self.snapshot_days = min(args.snapshot_days, args.days)
+        self.customers = args.customers
+        self.branches = args.branches
+
+    def random_date(self, rng: random.Random, window_days: int) -> date:
+        return self.start + timedelta(days=rng.randint(0, max(0, self.days - window_days)))
+
+    def random_snapshot_date(self, rng: random.Random) -> date:
+        first = self.start + timedelta(days=self.days - self.snapshot_days)
+        return first + timedelta(days=rng.randint(0, self.snapshot_days - 1))
+
+    def load_params(self, args) -> dict:
+        return {
+            "start": self.start, "days": self.days, "snapshot_days": self.snapshot_days,
+            "customers": self.customers, "branches": self.branches, "transactions": args.transactions,
+            "loans": max(1, self.customers // 2), "feedbacks": max(1, self.customers // 2), "cities": CITIES,
+        }
+
+
+def percentile(values, p: float) -> float:
+    """Percentile nội suy tuyến tính (như numpy.percentile)."""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def connect(args):
+    import psycopg2
+    if args.dsn:
+        conn = psycopg2.connect(args.dsn, options=f"-c search_path={args.pg_schema},public")
+    else:
+        conn = psycopg2.connect(
+            host=os.getenv("POSTGRES_HOST", "localhost"),
+            port=os.getenv("POSTGRES_PORT", "5432"),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD"),
+            dbname=os.getenv("POSTGRES_DB"),
+            options=f"-c search_path={args.pg_schema},public",
+        )
+    conn.autocommit = True
+    return conn
+
+
+def create_schema(conn, args) -> dict:
+    """Tạo lại schema benchmark từ file DDL (+ physical design nếu chọn); trả về thời gian (giây)."""
+    sql_files = [args.schema_file] + ([PHYSICAL_DESIGN_FILE] if args.physical_design == "workload" else [])
+    print(f"----> Creating schema '{args.pg_schema}' from {', '.join(sql_files)}")
+    ddl = ""
+    for path in sql_files:
+        with open(path, "r", encoding="utf-8") as f:
+            ddl += f.read() + "\n"
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(f'DROP SCHEMA IF EXISTS "{args.pg_schema}" CASCADE')
+        cur.execute(f'CREATE SCHEMA "{args.pg_schema}"')
+        cur.execute(f'SET search_path TO "{args.pg_schema}", public')
+        cur.execute(ddl)
+    return {"schema_s": round(time.perf_counter() - start, 3)}
+
+
+def load_dataset(conn, ctx: DatasetContext, args) -> dict:
+    """Sinh dữ liệu tất định, mỗi bảng 1 transaction; trả về thời gian load từng bảng."""
+    params = ctx.load_params(args)
+    timings = {}
+    with conn.cursor() as cur:
+        cur.execute("SELECT setseed(%s)", (args.seed / 2 ** 31 % 1,))
+        for name, sql in LOAD_STEPS:
+            start = time.perf_counter()
+            cur.execute("BEGIN")
+            cur.execute(sql, params)
+            cur.execute("COMMIT")
+            timings[name] = round(time.perf_counter() - start, 3)
+            print(f"----> Loaded {name:<24} {timings[name]:>8.2f} s")
+        start = time.perf_counter()
+        cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = %s", (args.pg_schema,))
+        for (table,) in cur.fetchall():
+            cur.execute(f'VACUUM ANALYZE "{args.pg_schema}"."{table}"')
+        timings["vacuum_analyze"] = round(time.perf_counter() - start, 3)
+    return timings
+
+
+def schema_fingerprint(conn, pg_schema: str) -> dict:
+    """Định nghĩa index + kích thước bảng: xác định phiên bản schema đang được đo."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT tablename, indexname, indexdef FROM pg_indexes
+            WHERE schemaname = %s ORDER BY tablename, indexname
+        """, (pg_schema,))
+        indexes = cur.fetchall()
+        cur.execute("""
+            SELECT c.relname, c.reltuples::bigint, pg_table_size(c.oid), pg_indexes_size(c.oid)
+            FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relkind IN ('r', 'p') ORDER BY c.relname
+        """, (pg_schema,))
+        tables = {
+            name: {"rows": rows, "table_mb": round(table / 2 ** 20, 2), "index_mb": round(index / 2 ** 20, 2)}
+            for name, rows, table, index in cur.fetchall()
+        }
+        cur.execute("SHOW server_version")
+        server_version = cur.fetchone()[0]
+    definitions = "\n".join(re.sub(r'"?' + re.escape(pg_schema) + r'"?\.', "", row[2]) for row in indexes)
+    return {
+        "fingerprint": hashlib.sha256(definitions.encode("utf-8")).hexdigest()[:16],
+        "server_version": server_version,
+        "indexes": [row[2] for row in indexes],
+        "tables": tables,
+    }
+
+
+def load_workload(path: str) -> list:
+    """File SQL: mỗi query bắt đầu bằng dòng `-- name: <tên>`, không có tham số."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    queries = []
+    for block in re.split(r"^--\s*name:\s*", text, flags=re.MULTILINE)[1:]:
+        name, _, sql = block.partition("\n")
+        if sql.strip():
+            queries.append({"name": name.strip(), "sql": sql.strip(), "params": lambda rng, ctx: {}})
+    return queries
+
+
+def explain_stats(cur, sql: str, params: dict) -> dict:
+    """Tổng hợp buffer / I/O của toàn bộ plan từ EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)."""
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+    raw = cur.fetchone()[0]
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+    root = plan["Plan"]
+    node_types = []
+
+    def walk(node):
+        node_types.append(node["Node Type"] + (f" on {node['Relation Name']}" if "Relation Name" in node else ""))
+        for child in node.get("Plans", []):
+            walk(child)
+    walk(root)
+
+    # Buffers của node gốc đã bao gồm các node con
+    return {
+        "planning_ms": plan.get("Planning Time"),
+        "execution_ms": plan.get("Execution Time"),
+        "shared_hit": root.get("Shared Hit Blocks", 0),
+        "shared_read": root.get("Shared Read Blocks", 0),
+        "temp_read": root.get("Temp Read Blocks", 0),
+        "temp_written": root.get("Temp Written Blocks", 0),
+        "io_read_ms": root.get("I/O Read Time", root.get("Shared I/O Read Time")),
+        "rows": root.get("Actual Rows"),
+        "plan": node_types,
+    }
+
+
+def run_queries(conn, queries: list, ctx: DatasetContext, args) -> dict:
+    results = {}
+    with conn.cursor() as cur:
+        for query in queries:
+            rng = random.Random(f"{args.seed}:{query['name']}")
+            try:
+                for _ in range(args.warmup):
+                    cur.execute(query["sql"], query["params"](rng, ctx))
+                    cur.fetchall()
+                latencies = []
+                for _ in range(args.runs):
+                    params = query["params"](rng, ctx)
+                    start = time.perf_counter()
+                    cur.execute(query["sql"], params)
+                    cur.fetchall()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                result = {
+                    "p50_ms": round(percentile(latencies, 50), 3),
+                    "p95_ms": round(percentile(latencies, 95), 3),
+                    "p99_ms": round(percentile(latencies, 99), 3),
+                    "mean_ms": round(statistics.fmean(latencies), 3),
+                    "runs": args.runs,
+                }
+                result["explain"] = explain_stats(cur, query["sql"], query["params"](rng, ctx))
+            except Exception as e:
+                result = {"error": str(e).strip().splitlines()[0]}
+            results[query["name"]] = result
+            if "error" in result:
+                print(f"----> {query['name']:<30} ERROR: {result['error']}")
+            else:
+                explain = result["explain"]
+                print(f"----> {query['name']:<30} p50 {result['p50_ms']:>9.2f}  p95 {result['p95_ms']:>9.2f}  "
+                      f"p99 {result['p99_ms']:>9.2f} ms   hit {explain['shared_hit']:>8}  "
+                      f"read {explain['shared_read']:>8}  temp {explain['temp_written']:>6}")
+    return results
+
+
+def print_comparison(results: dict, baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"----> Compared with {baseline_path} (schema {baseline.get('schema', {}).get('fingerprint')})")
+    for name, result in results.items():
+        before = baseline.get("queries", {}).get(name)
+        if not before or "error" in before or "error" in result:
+            continue
+        deltas = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            change = (result[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            deltas.append(f"{metric[:3]} {change:+7.1f}%")
+        reads = result["explain"]["shared_read"] - before["explain"]["shared_read"]
+        print(f"----> {name:<30} {'  '.join(deltas)}   shared_read {reads:+d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark star-schema queries on a local Postgres")
+    parser.add_argument("--dsn", help="libpq DSN (mặc định: biến môi trường POSTGRES_*)")
+    parser.add_argument("--pg-schema", default="etl_bench", help="Schema Postgres riêng cho benchmark")
+    parser.add_argument("--schema-file", default=DEFAULT_SCHEMA_FILE, help="File DDL cần đo")
+    parser.add_argument("--physical-design", choices=["default", "workload"], default="default",
+                        help="Áp dụng sql/physical_design.sql sau schema (như SchemaManager)")
+    parser.add_argument("--skip-load", action="store_true", help="Dùng lại dữ liệu đã sinh trong --pg-schema")
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--branches", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--snapshot-days", type=int, default=30, help="Số ngày snapshot cuối ngày được sinh")
+    parser.add_argument("--start-date", default="2023-01-01")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--runs", type=int, default=20, help="Số lần chạy mỗi query")
+    parser.add_argument("--warmup", type=int, default=2, help="Số lần chạy bỏ qua trước khi đo")
+    parser.add_argument("--workload", help="File SQL thay cho workload mặc định (`-- name: ...` mỗi query)")
+    parser.add_argument("--label", help="Nhãn của phiên bản schema trong kết quả")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    parser.add_argument("--baseline", help="File JSON của lần chạy trước để so sánh")
+    args = parser.parse_args()
+
+    ctx = DatasetContext(args)
+    conn = connect(args)
+    try:
+        load = {}
+        if not args.skip_load:
+            load.update(create_schema(conn, args))
+            load.update(load_dataset(conn, ctx, args))
+        schema = schema_fingerprint(conn, args.pg_schema)
+        print(f"----> Schema fingerprint {schema['fingerprint']} ({len(schema['indexes'])} indexes)")
+
+        queries = load_workload(args.workload) if args.workload else QUERIES
+        results = run_queries(conn, queries, ctx, args)
+    finally:
+        conn.close()
+
+    if args.baseline:
+        print_comparison(results, args.baseline)
+
+    if args.json:
+        output = {
+            "label": args.label,
+            "physical_design": args.physical_design,
+            "python": sys.version.split()[0],
+            "dataset": {key: value for key, value in ctx.load_params(args).items() if key != "cities"},
+            "load": load,
+            "schema": schema,
+            "queries": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2, default=str)
+        print(f"----> Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
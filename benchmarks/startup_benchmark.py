@@ -0,0 +1,90 @@
+"""
+Đo thời gian khởi động của các module / đối tượng ETL, mỗi lần đo trong 1 process Python mới.
+
+    python benchmarks/startup_benchmark.py --runs 5
+    python benchmarks/startup_benchmark.py --json startup.json
+
+Mỗi target báo cáo:
+    - import_ms: thời gian chạy đoạn code của target (median)
+    - process_ms: tổng thời gian process (gồm khởi động interpreter, median)
+    - heavy: các thư viện nặng đã bị import sau khi chạy target (nên rỗng với import thuần)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'sqlalchemy', 'psycopg2', 'minio', 'redis', 'pyspark', 'dotenv']
+
+TARGETS = {
+    'import:config': "import config.base_config",
+    'import:postgres_loader': "import etl_design.loaders.postgres_loader",
+    'import:minio_extractor': "import etl_design.extractors.minio_extractor",
+    'import:etl_pipeline': "import etl_design.pipeline.etl_pipeline",
+    'init:etl_pipeline': (
+        "from config.base_config import get_database_config\n"
+        "from etl_design.pipeline.etl_pipeline import ETLPipeline\n"
+        "ETLPipeline(get_database_config())"
+    ),
+}
+
+SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {base_dir!r})
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(code: str, runs: int) -> dict:
+    snippet = SNIPPET.format(base_dir=BASE_DIR, code=code, heavy=HEAVY_MODULES)
+    import_times, process_times, heavy = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, cwd=BASE_DIR)
+        process_times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+        output = json.loads(result.stdout.strip().splitlines()[-1])
+        import_times.append(output["seconds"])
+        heavy = output["heavy"]
+
+    return {
+        "import_ms": round(statistics.median(import_times) * 1000, 1),
+        "process_ms": round(statistics.median(process_times) * 1000, 1),
+        "heavy": heavy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ETL startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Số lần đo mỗi target (lấy median)")
+    parser.add_argument("--target", action="append", choices=sorted(TARGETS), help="Chỉ đo target này")
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.target or TARGETS:
+        results[name] = measure(TARGETS[name], args.runs)
+        result = results[name]
+        if "error" in result:
+            print(f"----> {name:<26} ERROR: {result['error']}")
+        else:
+            print(f"----> {name:<26} import {result['import_ms']:>8.1f} ms   process {result['process_ms']:>8.1f} ms   "
+                  f"heavy: {', '.join(result['heavy']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "runs": args.runs, "results": results}, f, indent=2)
+        print(f"----> Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
+import json
 import os
-from dataclasses import dataclass
-from typing import Dict
-from dotenv import load_dotenv
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterable, Iterator
 
 
 # ========== BASE CLASS ==========
@@ -46,35 +47,244 @@ class MinioConfig(DatabaseConfig):
     secure: bool
 
 
-# ========== MAIN CONFIG LOADER ==========
-def get_database_config() -> Dict[str, DatabaseConfig]:
-    """Load toàn bộ cấu hình từ file .env"""
-    load_dotenv()
+# ========== ETL RUNTIME ==========
+@dataclass
+class EtlConfig:
+    """Cấu hình runtime cho 1 lần chạy ETL (không bắt buộc, có giá trị mặc định)."""
+    backend: str = "pandas"                 # 'pandas' | 'spark'
+    spark_master: str = "local[*]"
+    spark_app_name: str = "banking-etl"
+    spark_jdbc_package: str = "org.postgresql:postgresql:42.7.3"
+    spark_jdbc_batch_size: int = 10000
+    quality_gate_enabled: bool = True
+    quarantine_dir: str = ".quarantine"          # Nơi lưu các dòng bị quality gate cách ly (Parquet)
+    checkpoint_enabled: bool = True
+    checkpoint_dir: str = ".checkpoints"        # Output từng stage để resume khi chạy lại
+    commit_mode: str = "single"                 # 'single' (1 transaction) | 'batched'
+    fact_commit_batch_rows: int = 50000         # Số dòng facts mỗi lần commit ở chế độ batched
+    run_mode: str = "sequential"                # 'sequential' | 'pipelined' (extract/transform/load chạy song song)
+    pipeline_chunk_rows: int = 100000           # Số dòng mỗi chunk ở chế độ pipelined
+    pipeline_queue_size: int = 4                # Số chunk tối đa chờ giữa 2 stage
+    dedup_memory_budget_mb: int = 256           # Bộ nhớ cho key đã gặp khi dedup dimension qua các chunk
+    dedup_spill_dir: str = ".dedup_spill"       # Nơi spill key store ra đĩa khi vượt budget
+    memory_governor_enabled: bool = True
+    memory_budget_mb: int = 2048                # Budget RSS của process, governor chỉnh batch size để không vượt
+    governor_min_rows: int = 1000
+    governor_max_rows: int = 1000000
+    key_allocation: str = "client"              # 'client' (đặt trước block từ sequence) | 'database'
+    key_block_size: int = 10000                 # Số surrogate key đặt trước mỗi lần
+    scd_key_resolution: str = "asof"            # 'asof' (phiên bản tại ngày sự kiện) | 'current'
+    snapshot_mode: str = "daily"                # 'daily' (sinh snapshot cuối ngày) | 'source' (giữ dòng từ nguồn)
+    snapshot_partition_rows: int = 500000       # Số dòng tối đa của 1 partition snapshot
+    snapshot_diff_enabled: bool = False         # Nguồn gửi full snapshot: chỉ merge key thay đổi
+    snapshot_diff_store: str = "parquet"        # Nơi lưu hash index: 'parquet' | 'redis'
+    snapshot_index_dir: str = ".snapshot_index" # Thư mục hash index khi store = 'parquet'
+    minio_part_size_mb: int = 64                # Kích thước part multipart upload / range download
+    minio_transfer_workers: int = 8             # Số part truyền song song
+    minio_compression: str = "none"             # Nén khi upload: 'none' | 'zstd' | 'gzip'
+    object_cache_enabled: bool = True           # Cache object MinIO trên đĩa theo ETag
+    object_cache_dir: str = ".cache/objects"
+    object_cache_max_mb: int = 4096             # Vượt dung lượng thì xoá object dùng lâu nhất
+    physical_design: str = "default"            # 'default' | 'workload' (BRIN + index covering, ghi Fact theo ngày)
+    customer360_enabled: bool = False           # Cập nhật projection customer 360 trong Redis sau mỗi lần load
+    customer360_window_days: int = 30           # Cửa sổ tổng hợp giao dịch gần đây
+    customer360_ttl_s: int = 0                  # TTL của mỗi hash (0 = không hết hạn)
+    export_enabled: bool = False                # Export star schema ra Parquet trên MinIO sau mỗi lần load
+    export_bucket: str = "warehouse-export"
+    export_prefix: str = "star"
+    export_partition: str = "month"             # Partition Fact theo 'day' | 'month'
+    export_compression: str = "zstd"            # Codec Parquet: 'zstd' | 'snappy' | 'gzip' | 'none'
+    export_batch_rows: int = 100000             # Số dòng đọc từ Postgres mỗi lần (server-side cursor)
+    auto_tune: str = "off"                      # 'off' | 'once' (khi host chưa có profile) | 'always'
+    autotune_sample_rows: int = 200000          # Số dòng mẫu cho calibration transform / load
+    autotune_sample_mb: int = 64                # Số MB mẫu cho calibration extract (MinIO)
+    parallel_copy_workers: int = 1              # Số kết nối COPY song song cho 1 bảng Fact (1 = tắt)
+    parallel_copy_min_rows: int = 100000        # Bảng / batch nhỏ hơn thì COPY qua 1 kết nối
+    run_history_enabled: bool = False           # Lưu hiệu năng từng lần chạy vào Redis và phát hiện hồi quy
+    run_history_max_runs: int = 1000            # Số lần chạy giữ lại trong lịch sử
+    regression_window: int = 20                 # Số lần chạy thành công gần nhất làm baseline
+    regression_min_change: float = 0.1          # Chỉ báo khi chậm / giảm throughput >= 10%
+    batch_window_s: int = 0                     # Cửa sổ batch (giây) để ước lượng số lần chạy còn lại (0 = bỏ qua)
+
+
+# ========== TUNED PROFILE ==========
+# Kết quả auto-tune theo từng host, được load tự động làm giá trị mặc định của EtlConfig
+TUNED_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tuned_profile.json")
+TUNABLE_FIELDS = ("pipeline_chunk_rows", "fact_commit_batch_rows", "minio_transfer_workers", "minio_part_size_mb")
+
+
+def host_profile_key() -> str:
+    """Profile được lưu theo host: cùng file dùng được cho cả máy dev và ETL host."""
+    import platform
+    return f"{platform.node()}:{os.cpu_count()}"
+
 
-    config = {
-        "redis": RedisConfig(
-            host=os.getenv("REDIS_HOST"),
-            port=int(os.getenv("REDIS_PORT", 6379)),
-            password=os.getenv("REDIS_PASSWORD"),
-            database=os.getenv("REDIS_DB"),
-        ),
-        "postgres": PostgresConfig(
-            host=os.getenv("POSTGRES_HOST"),
-            port=int(os.getenv("POSTGRES_PORT", 5432)),
-            user=os.getenv("POSTGRES_USER"),
-            password=os.getenv("POSTGRES_PASSWORD"),
-            database=os.getenv("POSTGRES_DB"),
-        ),
-        "minio": MinioConfig(
-            endpoint=os.getenv("MINIO_ENDPOINT"),
-            access_key=os.getenv("MINIO_USER"),
-            secret_key=os.getenv("MINIO_PASSWORD"),
-            secure=os.getenv("MINIO_SECURE", "false").lower() == "true",
-        ),
+def _read_tuned_profile(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {"version": 1, "hosts": {}}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"----> Bỏ qua tuned profile lỗi {path}: {e}")
+        return {"version": 1, "hosts": {}}
+
+
+def load_tuned_profile(path: str = None) -> Dict:
+    """Các tham số đã tune cho host hiện tại (rỗng nếu host chưa được tune)."""
+    profile = _read_tuned_profile(path or os.getenv("ETL_TUNED_PROFILE", TUNED_PROFILE_PATH))
+    settings = profile.get("hosts", {}).get(host_profile_key(), {}).get("settings", {})
+    return {key: value for key, value in settings.items() if key in TUNABLE_FIELDS}
+
+
+def save_tuned_profile(settings: Dict, measurements: Dict, path: str = None) -> str:
+    """Ghi (thay thế) profile của host hiện tại, giữ nguyên profile của các host khác."""
+    from datetime import datetime
+    path = path or os.getenv("ETL_TUNED_PROFILE", TUNED_PROFILE_PATH)
+    profile = _read_tuned_profile(path)
+    profile.setdefault("hosts", {})[host_profile_key()] = {
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in settings.items() if key in TUNABLE_FIELDS},
+        "measurements": measurements,
     }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_etl_config() -> EtlConfig:
+    """
+    Load cấu hình runtime ETL từ file .env (các biến ETL_* / SPARK_*).
+
+    Thứ tự ưu tiên: biến môi trường > tuned profile của host (ETL_TUNED_PROFILE_ENABLED) > mặc định.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    defaults = EtlConfig()
+    if os.getenv("ETL_TUNED_PROFILE_ENABLED", "true").lower() == "true":
+        defaults = replace(defaults, **load_tuned_profile())
+
+    return EtlConfig(
+        backend=os.getenv("ETL_BACKEND", defaults.backend).lower(),
+        spark_master=os.getenv("SPARK_MASTER", defaults.spark_master),
+        spark_app_name=os.getenv("SPARK_APP_NAME", defaults.spark_app_name),
+        spark_jdbc_package=os.getenv("SPARK_JDBC_PACKAGE", defaults.spark_jdbc_package),
+        spark_jdbc_batch_size=int(os.getenv("SPARK_JDBC_BATCH_SIZE", defaults.spark_jdbc_batch_size)),
+        quality_gate_enabled=os.getenv("ETL_QUALITY_GATE", "true").lower() == "true",
+        quarantine_dir=os.getenv("ETL_QUARANTINE_DIR", defaults.quarantine_dir),
+        checkpoint_enabled=os.getenv("ETL_CHECKPOINT", "true").lower() == "true",
+        checkpoint_dir=os.getenv("ETL_CHECKPOINT_DIR", defaults.checkpoint_dir),
+        commit_mode=os.getenv("ETL_COMMIT_MODE", defaults.commit_mode).lower(),
+        fact_commit_batch_rows=int(os.getenv("ETL_FACT_COMMIT_BATCH_ROWS", defaults.fact_commit_batch_rows)),
+        run_mode=os.getenv("ETL_RUN_MODE", defaults.run_mode).lower(),
+        pipeline_chunk_rows=int(os.getenv("ETL_PIPELINE_CHUNK_ROWS", defaults.pipeline_chunk_rows)),
+        pipeline_queue_size=int(os.getenv("ETL_PIPELINE_QUEUE_SIZE", defaults.pipeline_queue_size)),
+        dedup_memory_budget_mb=int(os.getenv("ETL_DEDUP_MEMORY_BUDGET_MB", defaults.dedup_memory_budget_mb)),
+        dedup_spill_dir=os.getenv("ETL_DEDUP_SPILL_DIR", defaults.dedup_spill_dir),
+        memory_governor_enabled=os.getenv("ETL_MEMORY_GOVERNOR", "true").lower() == "true",
+        memory_budget_mb=int(os.getenv("ETL_MEMORY_BUDGET_MB", defaults.memory_budget_mb)),
+        governor_min_rows=int(os.getenv("ETL_GOVERNOR_MIN_ROWS", defaults.governor_min_rows)),
+        governor_max_rows=int(os.getenv("ETL_GOVERNOR_MAX_ROWS", defaults.governor_max_rows)),
+        key_allocation=os.getenv("ETL_KEY_ALLOCATION", defaults.key_allocation).lower(),
+        key_block_size=int(os.getenv("ETL_KEY_BLOCK_SIZE", defaults.key_block_size)),
+        scd_key_resolution=os.getenv("ETL_SCD_KEY_RESOLUTION", defaults.scd_key_resolution).lower(),
+        snapshot_mode=os.getenv("ETL_SNAPSHOT_MODE", defaults.snapshot_mode).lower(),
+        snapshot_partition_rows=int(os.getenv("ETL_SNAPSHOT_PARTITION_ROWS", defaults.snapshot_partition_rows)),
+        snapshot_diff_enabled=os.getenv("ETL_SNAPSHOT_DIFF", "false").lower() == "true",
+        snapshot_diff_store=os.getenv("ETL_SNAPSHOT_DIFF_STORE", defaults.snapshot_diff_store).lower(),
+        snapshot_index_dir=os.getenv("ETL_SNAPSHOT_INDEX_DIR", defaults.snapshot_index_dir),
+        minio_part_size_mb=int(os.getenv("ETL_MINIO_PART_SIZE_MB", defaults.minio_part_size_mb)),
+        minio_transfer_workers=int(os.getenv("ETL_MINIO_TRANSFER_WORKERS", defaults.minio_transfer_workers)),
+        minio_compression=os.getenv("ETL_MINIO_COMPRESSION", defaults.minio_compression).lower(),
+        object_cache_enabled=os.getenv("ETL_OBJECT_CACHE", "true").lower() == "true",
+        object_cache_dir=os.getenv("ETL_OBJECT_CACHE_DIR", defaults.object_cache_dir),
+        object_cache_max_mb=int(os.getenv("ETL_OBJECT_CACHE_MAX_MB", defaults.object_cache_max_mb)),
+        physical_design=os.getenv("ETL_PHYSICAL_DESIGN", defaults.physical_design).lower(),
+        customer360_enabled=os.getenv("ETL_CUSTOMER360", "false").lower() == "true",
+        customer360_window_days=int(os.getenv("ETL_CUSTOMER360_WINDOW_DAYS", defaults.customer360_window_days)),
+        customer360_ttl_s=int(os.getenv("ETL_CUSTOMER360_TTL_S", defaults.customer360_ttl_s)),
+        export_enabled=os.getenv("ETL_EXPORT", "false").lower() == "true",
+        export_bucket=os.getenv("ETL_EXPORT_BUCKET", defaults.export_bucket),
+        export_prefix=os.getenv("ETL_EXPORT_PREFIX", defaults.export_prefix),
+        export_partition=os.getenv("ETL_EXPORT_PARTITION", defaults.export_partition).lower(),
+        export_compression=os.getenv("ETL_EXPORT_COMPRESSION", defaults.export_compression).lower(),
+        export_batch_rows=int(os.getenv("ETL_EXPORT_BATCH_ROWS", defaults.export_batch_rows)),
+        auto_tune=os.getenv("ETL_AUTO_TUNE", defaults.auto_tune).lower(),
+        autotune_sample_rows=int(os.getenv("ETL_AUTOTUNE_SAMPLE_ROWS", defaults.autotune_sample_rows)),
+        autotune_sample_mb=int(os.getenv("ETL_AUTOTUNE_SAMPLE_MB", defaults.autotune_sample_mb)),
+        parallel_copy_workers=int(os.getenv("ETL_PARALLEL_COPY_WORKERS", defaults.parallel_copy_workers)),
+        parallel_copy_min_rows=int(os.getenv("ETL_PARALLEL_COPY_MIN_ROWS", defaults.parallel_copy_min_rows)),
+        run_history_enabled=os.getenv("ETL_RUN_HISTORY", "false").lower() == "true",
+        run_history_max_runs=int(os.getenv("ETL_RUN_HISTORY_MAX_RUNS", defaults.run_history_max_runs)),
+        regression_window=int(os.getenv("ETL_REGRESSION_WINDOW", defaults.regression_window)),
+        regression_min_change=float(os.getenv("ETL_REGRESSION_MIN_CHANGE", defaults.regression_min_change)),
+        batch_window_s=int(os.getenv("ETL_BATCH_WINDOW_S", defaults.batch_window_s)),
+    )
+
+
+# ========== MAIN CONFIG LOADER ==========
+_CONFIG_BUILDERS: Dict[str, Callable[[], DatabaseConfig]] = {
+    "redis": lambda: RedisConfig(
+        host=os.getenv("REDIS_HOST"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        password=os.getenv("REDIS_PASSWORD"),
+        database=os.getenv("REDIS_DB"),
+    ),
+    "postgres": lambda: PostgresConfig(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT", 5432)),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        database=os.getenv("POSTGRES_DB"),
+    ),
+    "minio": lambda: MinioConfig(
+        endpoint=os.getenv("MINIO_ENDPOINT"),
+        access_key=os.getenv("MINIO_USER"),
+        secret_key=os.getenv("MINIO_PASSWORD"),
+        secure=os.getenv("MINIO_SECURE", "false").lower() == "true",
+    ),
+}
+
+
+class LazyDatabaseConfig(Mapping):
+    """
+    Dict cấu hình backend, mỗi backend chỉ được đọc từ env và validate ở lần truy cập
+    đầu tiên. Lần chạy không dùng Redis sẽ không lỗi vì thiếu REDIS_*.
+    """
+
+    def __init__(self):
+        self._configs: Dict[str, DatabaseConfig] = {}
+
+    def __getitem__(self, name: str) -> DatabaseConfig:
+        if name not in self._configs:
+            setting = _CONFIG_BUILDERS[name]()
+            setting.validate()
+            self._configs[name] = setting
+        return self._configs[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_CONFIG_BUILDERS)
+
+    def __len__(self) -> int:
+        return len(_CONFIG_BUILDERS)
+
+
+def get_database_config(backends: Iterable[str] = None) -> LazyDatabaseConfig:
+    """
+    Load cấu hình từ file .env
+
+    Args:
+        backends: Các backend chắc chắn dùng trong lần chạy, được validate ngay (fail fast);
+                  backend khác chỉ được validate khi được truy cập.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
 
-    # Validate toàn bộ config
-    for name, setting in config.items():
-        setting.validate()
+    config = LazyDatabaseConfig()
+    for name in backends or ():
+        config[name]
 
     return config
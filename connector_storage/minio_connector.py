@@ -1,6 +1,8 @@
 import os
-from minio import Minio
-from minio.error import S3Error
+from typing import Dict, Set, Tuple
+
+# Bucket đã biết là tồn tại, theo từng client (endpoint, access_key) - dùng chung giữa các instance
+_KNOWN_BUCKETS: Dict[Tuple[str, str], Set[str]] = {}
 
 class MinIOConnector:
     def __init__(self, endpoint: str, access_key: str, secret_key: str, secure: bool = False):
@@ -16,18 +18,27 @@ class MinIOConnector:
         self.access_key = access_key
         self.secret_key = secret_key
         self.secure = secure
+        self._client = None
+        self._client_failed = False
 
-        try: 
-            self.client = Minio(
-                endpoint,
-                access_key=access_key, 
-                secret_key=secret_key, 
-                secure=secure
-            )
-            print(f"----> Kết nối với MinIO thành công")
-        except (S3Error, TypeError) as e:
-            print(f"----> Lỗi khởi tạo với MinIO client: {e}")
-            self.client = None
+    @property
+    def client(self):
+        """Client MinIO chỉ được tạo (và module minio chỉ được import) ở lần dùng đầu tiên."""
+        if self._client is None and not self._client_failed:
+            from minio import Minio
+            from minio.error import S3Error
+            try: 
+                self._client = Minio(
+                    self.endpoint,
+                    access_key=self.access_key, 
+                    secret_key=self.secret_key, 
+                    secure=self.secure
+                )
+                print(f"----> Kết nối với MinIO thành công")
+            except (S3Error, TypeError) as e:
+                print(f"----> Lỗi khởi tạo với MinIO client: {e}")
+                self._client_failed = True
+        return self._client
 
     def __enter__(self):
         return self
@@ -38,11 +49,20 @@ class MinIOConnector:
         
     def check_bucket_exists(self, bucket_name: str):
         """
-        Xem 1 bucket có tồn tại không, nếu không tạo mới trước khi upload
+        Xem 1 bucket có tồn tại không, nếu không tạo mới trước khi upload.
+        Kết quả được nhớ theo client nên mỗi bucket chỉ kiểm tra 1 lần.
+
+        Returns:
+            bool: True nếu bucket tồn tại (hoặc vừa được tạo), False nếu lỗi.
         """
         if not self.client:
             print(f"----> Client chưa được tạo")
             return False
+
+        known = _KNOWN_BUCKETS.setdefault((self.endpoint, self.access_key), set())
+        if bucket_name in known:
+            return True
+        from minio.error import S3Error
         try:
             found = self.client.bucket_exists(bucket_name)
             if not found:
@@ -50,6 +70,8 @@ class MinIOConnector:
                 print(f"----> Bucket {bucket_name} đã được tạo")
             else:
                 print(f"----> Bucket {bucket_name} đã tồn tại")
+            known.add(bucket_name)
+            return True
         except S3Error as e:
             print(f"---->  Lỗi khi kiểm tra/ tạo bucket {e}")
             return False
@@ -71,10 +93,12 @@ class MinIOConnector:
 
         if not os.path.exists(file_path):
             print(f"----> File không tồn tại {file_path}")
+            return False
 
         if not self.check_bucket_exists(bucket_name):
             return False
 
+        from minio.error import S3Error
         try:
             print(f"----> Upload file '{file_path}' to '{bucket_name}/{object_name}' ...")
             self.client.fput_object(
@@ -104,6 +128,7 @@ class MinIOConnector:
             print(f"----> Client chưa được tạo")
             return False
         
+        from minio.error import S3Error
         try:
             print(f"----> Đang download file '{bucket_name}/{object_name}' về '{file_path}'")
             self.client.fget_object(
@@ -116,5 +141,55 @@ class MinIOConnector:
         except S3Error as e:
             print(f"----> Lỗi khi tải file về: {e}")
             return False
-    
-        
+
+    def stat_object(self, bucket_name: str, object_name: str):
+        """
+        Lấy metadata của object (etag, size, last_modified) mà không tải file về
+        Returns:
+            Object stat nếu thành công, None nếu thất bại.
+        """
+        if not self.client:
+            print(f"----> Client chưa được tạo")
+            return None
+
+        from minio.error import S3Error
+        try:
+            return self.client.stat_object(bucket_name, object_name)
+        except S3Error as e:
+            print(f"----> Lỗi khi lấy thông tin object: {e}")
+            return None
+
+    def get_object_stream(self, bucket_name: str, object_name: str):
+        """
+        Mở object dưới dạng stream HTTP để đọc dần (không ghi ra file tạm)
+        Returns:
+            Response stream nếu thành công (caller phải close() và release_conn()), None nếu thất bại.
+        """
+        if not self.client:
+            print(f"----> Client chưa được tạo")
+            return None
+
+        from minio.error import S3Error
+        try:
+            return self.client.get_object(bucket_name, object_name)
+        except S3Error as e:
+            print(f"----> Lỗi khi mở stream object: {e}")
+            return None
+
+    def remove_object(self, bucket_name: str, object_name: str):
+        """
+        Xoá 1 object trên MinIO
+        Returns:
+            bool: True nếu thành công, False nếu thất bại.
+        """
+        if not self.client:
+            print(f"----> Client chưa được tạo")
+            return False
+
+        from minio.error import S3Error
+        try:
+            self.client.remove_object(bucket_name, object_name)
+            return True
+        except S3Error as e:
+            print(f"----> Lỗi khi xoá object: {e}")
+            return False
@@ -0,0 +1,216 @@
+import gzip
+import importlib.util
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from etl_design.lazy_import import lazy_module
+
+# zstandard là tuỳ chọn, chỉ cần khi dùng compression = 'zstd': import thật ở lần nén / giải nén đầu tiên
+zstandard = lazy_module("zstandard")
+HAS_ZSTANDARD = importlib.util.find_spec("zstandard") is not None
+
+# Metadata lưu trên object để biết cách giải nén khi tải về
+COMPRESSION_METADATA = "x-amz-meta-etl-compression"
+COMPRESSION_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 multipart: mỗi part (trừ part cuối) >= 5MB
+
+
+class MinIOTransferManager:
+    def __init__(self, connector, part_size: int = 64 * 1024 * 1024, max_workers: int = 8,
+                 compression: str = None):
+        """
+        Upload / download song song nhiều part qua MinIOConnector
+        Args:
+            connector (MinIOConnector): Connector đã khởi tạo client.
+            part_size (int): Kích thước mỗi part (bytes), tối thiểu 5MB.
+            max_workers (int): Số part upload / download đồng thời (số kết nối TCP).
+            compression (str): None | 'zstd' | 'gzip' - nén file trước khi upload.
+        """
+        self.connector = connector
+        self.part_size = max(MIN_PART_SIZE, part_size)
+        self.max_workers = max(1, max_workers)
+        self.compression = self._resolve_compression(compression)
+
+    @staticmethod
+    def _resolve_compression(compression: str):
+        if not compression or compression == "none":
+            return None
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"----> Unsupported compression: {compression}")
+        if compression == "zstd" and not HAS_ZSTANDARD:
+            # Không tự đổi sang gzip: object sẽ mang hậu tố / metadata khác với cấu hình
+            raise ValueError("----> compression = 'zstd' cần package zstandard (pip install zstandard)")
+        return compression
+
+    # ---------- Upload ----------
+    def upload(self, bucket_name: str, object_name: str, file_path: str):
+        """
+        Upload file bằng multipart song song (nén trước nếu bật compression)
+        Returns:
+            Tên object đã upload (có hậu tố .zst/.gz nếu nén), None nếu thất bại.
+        """
+        client = self.connector.client
+        if not client:
+            print(f"----> Client chưa được tạo")
+            return None
+        if not os.path.exists(file_path):
+            print(f"----> File không tồn tại {file_path}")
+            return None
+        if not self.connector.check_bucket_exists(bucket_name):
+            return None
+
+        from minio.error import S3Error
+        upload_path, metadata = file_path, None
+        if self.compression:
+            object_name += COMPRESSION_SUFFIXES[self.compression]
+            upload_path = self._compress(file_path)
+            metadata = {COMPRESSION_METADATA: self.compression}
+
+        try:
+            size = os.path.getsize(upload_path)
+            print(f"----> Upload '{upload_path}' ({size} bytes) to '{bucket_name}/{object_name}' "
+                  f"- part {self.part_size} bytes x {self.max_workers} luồng")
+            client.fput_object(
+                bucket_name=bucket_name,
+                object_name=object_name,
+                file_path=upload_path,
+                metadata=metadata,
+                part_size=self.part_size,
+                num_parallel_uploads=self.max_workers,
+            )
+            print(f"----> Đã tải file lên thành công")
+            return object_name
+        except S3Error as e:
+            print(f"----> Lỗi khi upload file: {e}")
+            return None
+        finally:
+            if upload_path != file_path:
+                os.remove(upload_path)
+
+    # ---------- Download ----------
+    def download(self, bucket_name: str, object_name: str, file_path: str, length: int = None) -> bool:
+        """
+        Tải object bằng các range GET song song vào cùng 1 file, giải nén nếu object được nén
+        Args:
+            length (int): Chỉ tải `length` byte đầu, giữ nguyên dạng nén (dùng để đo tốc độ truyền).
+        Returns:
+            bool: True nếu thành công, False nếu thất bại.
+        """
+        stat = self.connector.stat_object(bucket_name, object_name)
+        if stat is None:
+            return False
+        from minio.error import S3Error
+
+        compression = self._object_compression(stat) if length is None else None
+        size = stat.size if length is None else min(stat.size, length)
+        target_path = file_path
+        if compression:
+            fd, target_path = tempfile.mkstemp(suffix=COMPRESSION_SUFFIXES.get(compression, ""))
+            os.close(fd)
+
+        try:
+            ranges = [(offset, min(self.part_size, size - offset))
+                      for offset in range(0, size, self.part_size)]
+            print(f"----> Đang download '{bucket_name}/{object_name}' ({size} bytes) "
+                  f"- {len(ranges)} part x {self.max_workers} luồng")
+
+            with open(target_path, "wb") as f:
+                f.truncate(size)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(
+                    lambda part: self._download_range(bucket_name, object_name, target_path, *part, stat.etag),
+                    ranges
+                ))
+
+            if compression:
+                self._decompress(target_path, file_path, compression)
+            print(f"----> Đã tải file về thành công")
+            return True
+        except (S3Error, OSError) as e:
+            print(f"----> Lỗi khi tải file về: {e}")
+            return False
+        finally:
+            if target_path != file_path and os.path.exists(target_path):
+                os.remove(target_path)
+
+    @staticmethod
+    def _object_compression(stat):
+        """Kiểu nén ghi trong metadata của object lúc upload, None nếu không nén."""
+        metadata = {key.lower(): value for key, value in (stat.metadata or {}).items()}
+        return metadata.get(COMPRESSION_METADATA)
+
+    # ---------- Stream ----------
+    def open_stream(self, bucket_name: str, object_name: str):
+        """
+        Mở object để đọc tuần tự, giải nén giống `download` nếu object được upload có nén
+        Returns:
+            (reader, response): đọc từ reader; caller đóng reader rồi close() + release_conn() response.
+            (None, None) nếu thất bại.
+        """
+        stat = self.connector.stat_object(bucket_name, object_name)
+        if stat is None:
+            return None, None
+        compression = self._object_compression(stat)
+        response = self.connector.get_object_stream(bucket_name, object_name)
+        if response is None:
+            return None, None
+        try:
+            return self._decompressing_reader(response, compression), response
+        except OSError:
+            response.close()
+            response.release_conn()
+            raise
+
+    @staticmethod
+    def _decompressing_reader(raw, compression: str):
+        if not compression:
+            return raw
+        if compression == "zstd":
+            if not HAS_ZSTANDARD:
+                raise OSError("zstandard chưa được cài, không thể giải nén object zstd")
+            return zstandard.ZstdDecompressor().stream_reader(raw)
+        if compression == "gzip":
+            return gzip.GzipFile(fileobj=raw, mode="rb")
+        raise OSError(f"Kiểu nén không hỗ trợ: {compression}")
+
+    def _download_range(self, bucket_name: str, object_name: str, file_path: str,
+                        offset: int, length: int, etag: str):
+        # If-Match: object bị ghi đè trong lúc tải -> lỗi thay vì trộn 2 phiên bản
+        response = self.connector.client.get_object(
+            bucket_name, object_name, offset=offset, length=length,
+            request_headers={"If-Match": etag},
+        )
+        try:
+            with open(file_path, "r+b") as f:
+                f.seek(offset)
+                for data in response.stream(1024 * 1024):
+                    f.write(data)
+        finally:
+            response.close()
+            response.release_conn()
+
+    # ---------- Nén ----------
+    def _compress(self, file_path: str) -> str:
+        fd, compressed_path = tempfile.mkstemp(suffix=COMPRESSION_SUFFIXES[self.compression])
+        os.close(fd)
+        with open(file_path, "rb") as src, open(compressed_path, "wb") as dst:
+            if self.compression == "zstd":
+                # threads=-1: nén đa luồng theo số CPU
+                zstandard.ZstdCompressor(level=3, threads=-1).copy_stream(src, dst)
+            else:
+                with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=6) as gz:
+                    shutil.copyfileobj(src, gz, 1024 * 1024)
+        print(f"----> Đã nén {os.path.getsize(file_path)} -> {os.path.getsize(compressed_path)} bytes ({self.compression})")
+        return compressed_path
+
+    @staticmethod
+    def _decompress(src_path: str, dst_path: str, compression: str):
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            if compression == "zstd":
+                if not HAS_ZSTANDARD:
+                    raise OSError("zstandard chưa được cài, không thể giải nén object zstd")
+                zstandard.ZstdDecompressor().copy_stream(src, dst)
+            else:
+                with gzip.GzipFile(fileobj=src, mode="rb") as gz:
+                    shutil.copyfileobj(gz, dst, 1024 * 1024)
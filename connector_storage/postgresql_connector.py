@@ -1,6 +1,3 @@
-import psycopg2
-from psycopg2 import OperationalError
-
 class PostgresConnect:
     
     def __init__(self, host, port, user, password, dbname):
@@ -22,6 +19,9 @@ class PostgresConnect:
         self.cursor = None
 
     def connect(self):
+        # Import khi kết nối: job không dùng Postgres không phải trả chi phí import
+        import psycopg2
+        from psycopg2 import OperationalError
         try:
             self.conn = psycopg2.connect(**self.config)
             self.cursor = self.conn.cursor()
@@ -1,6 +1,3 @@
-import redis
-from redis.exceptions import ConnectionError
-
 class RedisConnect:
     def __init__(self, host, port, user, password, db):
         self.host = host
@@ -18,6 +15,9 @@ class RedisConnect:
         self.client = None
 
     def connect(self):
+        # Import khi kết nối: job không dùng Redis không phải trả chi phí import
+        import redis
+        from redis.exceptions import ConnectionError
         try:
             self.client = redis.Redis(**self.config,decode_responses=True)
             self.client.ping()
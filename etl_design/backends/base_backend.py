@@ -0,0 +1,60 @@
+from abc import ABC, abstractmethod
+from typing import Any
+
+
+class ExecutionBackend(ABC):
+    """
+    Lớp trừu tượng cho engine xử lý DataFrame của các bước ETL.
+
+    Transformer chỉ dùng API kiểu pandas qua `self.backend.lib` (pandas hoặc
+    pyspark.pandas), nên cùng 1 logic transform chạy được trên cả 2 engine.
+    """
+
+    name = "base"
+
+    @property
+    @abstractmethod
+    def lib(self) -> Any:
+        """Module có API kiểu pandas (to_datetime, concat, DataFrame, ...)."""
+        pass
+
+    @abstractmethod
+    def read_csv(self, file_path: str, memory_map: bool = False) -> Any:
+        pass
+
+    @abstractmethod
+    def from_pandas(self, df) -> Any:
+        pass
+
+    @abstractmethod
+    def to_pandas(self, df) -> Any:
+        pass
+
+    @abstractmethod
+    def write_table(self, df, table_name: str, engine, if_exists: str = "append") -> None:
+        """Ghi DataFrame vào bảng Postgres (engine: SQLAlchemy engine của loader)."""
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def create_backend(etl_config=None) -> ExecutionBackend:
+    """
+    Tạo backend theo cấu hình của lần chạy (EtlConfig.backend: 'pandas' | 'spark').
+    Spark chỉ được import khi thực sự được chọn.
+    """
+    backend_name = getattr(etl_config, "backend", "pandas").lower()
+
+    if backend_name == "pandas":
+        from etl_design.backends.pandas_backend import PandasBackend
+        return PandasBackend()
+    if backend_name == "spark":
+        from etl_design.backends.spark_backend import SparkBackend
+        return SparkBackend(
+            master=etl_config.spark_master,
+            app_name=etl_config.spark_app_name,
+            jdbc_package=etl_config.spark_jdbc_package,
+            jdbc_batch_size=etl_config.spark_jdbc_batch_size,
+        )
+    raise ValueError(f"----> Unknown execution backend: {backend_name}")
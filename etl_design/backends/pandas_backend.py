@@ -0,0 +1,24 @@
+import pandas as pd
+from etl_design.backends.base_backend import ExecutionBackend
+
+
+class PandasBackend(ExecutionBackend):
+    """Backend mặc định: xử lý toàn bộ DataFrame trong bộ nhớ bằng pandas."""
+
+    name = "pandas"
+
+    @property
+    def lib(self):
+        return pd
+
+    def read_csv(self, file_path: str, memory_map: bool = False) -> pd.DataFrame:
+        return pd.read_csv(file_path, memory_map=memory_map)
+
+    def from_pandas(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df
+
+    def to_pandas(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df
+
+    def write_table(self, df: pd.DataFrame, table_name: str, engine, if_exists: str = "append") -> None:
+        df.to_sql(table_name, engine, if_exists=if_exists, index=False, method='multi')
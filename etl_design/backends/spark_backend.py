@@ -0,0 +1,68 @@
+from etl_design.backends.base_backend import ExecutionBackend
+
+
+class SparkBackend(ExecutionBackend):
+    """
+    Backend PySpark chạy ở chế độ local[*].
+
+    Transformer dùng pyspark.pandas (API kiểu pandas trên Spark), dữ liệu được
+    xử lý theo partition nên không cần nằm gọn trong RAM của 1 máy.
+    Ghi xuống Postgres qua JDBC sink với batch insert được rewrite.
+    """
+
+    name = "spark"
+
+    def __init__(self, master: str = "local[*]", app_name: str = "banking-etl",
+                 jdbc_package: str = "org.postgresql:postgresql:42.7.3", jdbc_batch_size: int = 10000):
+        from pyspark.sql import SparkSession
+        import pyspark.pandas as ps
+
+        self.spark = (
+            SparkSession.builder
+            .master(master)
+            .appName(app_name)
+            .config("spark.jars.packages", jdbc_package)
+            .getOrCreate()
+        )
+        self.jdbc_batch_size = jdbc_batch_size
+        self._ps = ps
+        # Transformer gán cột từ DataFrame gốc sang DataFrame mới (vd: trans_df[...] = df[...])
+        ps.set_option("compute.ops_on_diff_frames", True)
+
+    @property
+    def lib(self):
+        return self._ps
+
+    def read_csv(self, file_path: str, memory_map: bool = False):
+        # Spark tự đọc file theo partition, memory_map không áp dụng
+        sdf = self.spark.read.csv(file_path, header=True, inferSchema=True)
+        return sdf.pandas_api()
+
+    def from_pandas(self, df):
+        return self._ps.from_pandas(df)
+
+    def to_pandas(self, df):
+        return df.to_pandas() if hasattr(df, "to_pandas") else df
+
+    def write_table(self, df, table_name: str, engine, if_exists: str = "append") -> None:
+        url = engine.url
+        jdbc_url = (
+            f"jdbc:postgresql://{url.host}:{url.port or 5432}/{url.database}"
+            f"?reWriteBatchedInserts=true"
+        )
+        sdf = df.to_spark() if hasattr(df, "to_spark") else self.spark.createDataFrame(df)
+        (
+            sdf.write
+            .format("jdbc")
+            .option("url", jdbc_url)
+            .option("dbtable", table_name)
+            .option("user", url.username)
+            .option("password", url.password)
+            .option("driver", "org.postgresql.Driver")
+            .option("batchsize", self.jdbc_batch_size)
+            .mode("overwrite" if if_exists == "replace" else "append")
+            .save()
+        )
+
+    def close(self) -> None:
+        self.spark.stop()
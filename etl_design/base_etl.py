@@ -7,9 +7,19 @@ logger = logging.getLogger(__name__)
 
 class BaseETL(ABC):
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, backend=None):
         self.name = name
         self.logger = logging.getLogger(f"{__name__}.{name}")
+        self._backend = backend
+
+    @property
+    def backend(self):
+        """Execution backend (pandas/Spark) dùng cho DataFrame, mặc định lấy theo EtlConfig.backend."""
+        if self._backend is None:
+            from config.base_config import get_etl_config
+            from etl_design.backends.base_backend import create_backend
+            self._backend = create_backend(get_etl_config())
+        return self._backend
     
     @abstractmethod
     def execute(self, *args, **kwargs) -> Any:
@@ -1,15 +1,17 @@
-import pandas as pd
+from __future__ import annotations
 from  etl_design.base_etl import BaseETL
+from etl_design.lazy_import import lazy_module
+pd = lazy_module("pandas")
 
 class CSV_Extractor(BaseETL):
-    def __init__(self):
-        super().__init__(CSV_Extractor)
+    def __init__(self, backend=None):
+        super().__init__("CSV_Extractor", backend)
     
-    def execute(self, file_path: str) -> pd.DataFrame:
+    def execute(self, file_path: str, memory_map: bool = False) -> pd.DataFrame:
         try:
             self.log_info(f"----> Reading CSV from {file_path}")
 
-            df = pd.read_csv(file_path)
+            df = self.backend.read_csv(file_path, memory_map=memory_map)
             
             self.log_info(f"----> Successfully read '{len(df)}' rows and '{len(df.columns)}' columns")
             self.log_info(f"----> Columns: {list(df.columns)}")
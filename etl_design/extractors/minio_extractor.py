@@ -1,34 +1,75 @@
+from __future__ import annotations
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from etl_design.base_etl import BaseETL
 from connector_storage.minio_connector import MinIOConnector
+from connector_storage.minio_transfer import MinIOTransferManager
+from etl_design.extractors.object_cache import LocalObjectCache
+from config.base_config import get_etl_config
 import tempfile
+import hashlib
+from typing import Iterator, Tuple
+from etl_design.lazy_import import lazy_module
+pd = lazy_module("pandas")
 
 
 class Minio_Extracter(BaseETL):
     """Extract files from MinIO storage"""
 
-    def __init__(self, minio_config):
-        super().__init__(Minio_Extracter)
+    def __init__(self, minio_config, etl_config=None):
+        super().__init__("Minio_Extracter")
         self.config = minio_config
+        self.etl_config = etl_config or get_etl_config()
         self.connector = None
+        self.transfer = None
+        self.cache = None
+        if self.etl_config.object_cache_enabled:
+            self.cache = LocalObjectCache(self.etl_config.object_cache_dir,
+                                          self.etl_config.object_cache_max_mb * 1024 * 1024)
     
-    def execute(self, bucket_name: str, object_name: str) -> str:
-        try: 
-            self.log_info(f"----> Extracting {bucket_name}/{object_name} from MinIO")
-
+    def _get_connector(self) -> MinIOConnector:
+        if self.connector is None:
             self.connector = MinIOConnector(
                 endpoint=self.config.endpoint,
                 access_key=self.config.access_key,
                 secret_key=self.config.secret_key,
                 secure=self.config.secure
             )
+        return self.connector
+
+    def _get_transfer(self) -> MinIOTransferManager:
+        if self.transfer is None:
+            self.transfer = MinIOTransferManager(
+                self._get_connector(),
+                part_size=self.etl_config.minio_part_size_mb * 1024 * 1024,
+                max_workers=self.etl_config.minio_transfer_workers,
+                compression=self.etl_config.minio_compression,
+            )
+        return self.transfer
+
+    def get_object_fingerprint(self, bucket_name: str, object_name: str) -> str:
+        """Fingerprint của object dựa trên ETag + size, không cần tải file về."""
+        stat = self._get_connector().stat_object(bucket_name, object_name)
+        if stat is None:
+            return None
+        raw = f"{bucket_name}/{object_name}:{stat.etag}:{stat.size}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def execute(self, bucket_name: str, object_name: str) -> str:
+        try: 
+            self.log_info(f"----> Extracting {bucket_name}/{object_name} from MinIO")
+
+            self._get_connector()
+
+            if self.cache:
+                return self._extract_cached(bucket_name, object_name)
 
             temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
             local_path = temp_file.name
             temp_file.close()
 
-            success = self.connector.download_file(bucket_name, object_name, local_path)
+            # Range GET song song nhiều part, tự giải nén nếu object được upload có nén
+            success = self._get_transfer().download(bucket_name, object_name, local_path)
             if success:
                 self.log_info(f"----> Successfully extracted to {local_path}")
                 return local_path
@@ -37,4 +78,80 @@ class Minio_Extracter(BaseETL):
                 return None
         except Exception as e:
             self.log_error(f"----> Error extracting from MinIO: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def _extract_cached(self, bucket_name: str, object_name: str) -> str:
+        """Object chưa đổi (cùng ETag) -> dùng file trong cache, không tải qua mạng."""
+        stat = self.connector.stat_object(bucket_name, object_name)
+        if stat is None:
+            self.log_error(f"----> Failed to stat {bucket_name}/{object_name}")
+            return None
+
+        local_path = self.cache.get(bucket_name, object_name, stat.etag)
+        if local_path:
+            self.log_info(f"----> Cache hit for {bucket_name}/{object_name} (etag {stat.etag}), skip download")
+            return local_path
+
+        local_path = self.cache.put(bucket_name, object_name, stat.etag,
+                                    lambda path: self._get_transfer().download(bucket_name, object_name, path))
+        if local_path is None:
+            self.log_error(f"----> Failed to download file from MinIO")
+            return None
+        self.log_info(f"----> Cached {bucket_name}/{object_name} at {local_path} "
+                      f"(cache usage {self.cache.usage_bytes() // (1024 * 1024)}MB)")
+        return local_path
+
+    def is_cached(self, local_path: str) -> bool:
+        return self.cache is not None and self.cache.contains(local_path)
+
+    def release(self, local_path: str):
+        """Xoá file tạm sau khi dùng xong; file trong cache được giữ lại cho lần chạy sau."""
+        if local_path and not self.is_cached(local_path) and os.path.exists(local_path):
+            os.remove(local_path)
+
+    def iter_chunks(self, bucket_name: str, object_name: str, chunk_size: int,
+                    governor=None, skip_rows: int = 0) -> Iterator[Tuple[int, pd.DataFrame]]:
+        """
+        Đọc CSV trực tiếp từ stream MinIO theo từng chunk, tải mạng và parse chồng lên nhau.
+
+        Args:
+            chunk_size: Số dòng mỗi chunk (kích thước ban đầu nếu có governor)
+            governor: MemoryGovernor điều chỉnh số dòng chunk tiếp theo theo bộ nhớ
+            skip_rows: Số dòng dữ liệu đầu file bỏ qua (đã load ở lần chạy trước)
+
+        Yields:
+            (vị trí dòng bắt đầu, chunk DataFrame)
+        """
+        self.log_info(f"----> Streaming {bucket_name}/{object_name} in chunks of {chunk_size} rows")
+        # Giải nén theo metadata của object giống download (object .csv.zst / .csv.gz)
+        stream, response = self._get_transfer().open_stream(bucket_name, object_name)
+        if stream is None:
+            raise RuntimeError(f"----> Failed to open stream for {bucket_name}/{object_name}")
+
+        try:
+            reader = pd.read_csv(stream, iterator=True, compression=None)
+            offset = 0
+            # Bỏ qua phần đã load theo từng đoạn để không giữ cả phần đầu file trong bộ nhớ
+            while offset < skip_rows:
+                try:
+                    offset += len(reader.get_chunk(min(chunk_size, skip_rows - offset)))
+                except StopIteration:
+                    return
+            if offset:
+                self.log_info(f"----> Skipped {offset} rows already loaded")
+
+            while True:
+                rows = governor.recommend('extract') if governor else chunk_size
+                try:
+                    chunk = reader.get_chunk(rows)
+                except StopIteration:
+                    break
+                if governor:
+                    governor.observe('extract', len(chunk), int(chunk.memory_usage(deep=True).sum()))
+                yield offset, chunk
+                offset += len(chunk)
+        finally:
+            if stream is not response:
+                stream.close()
+            response.close()
+            response.release_conn()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+from typing import Callable, Optional
+from connector_storage.minio_transfer import COMPRESSION_SUFFIXES
+
+
+class LocalObjectCache:
+    """
+    Cache file object MinIO trên đĩa, key theo (bucket, object, ETag), giới hạn dung lượng (LRU).
+
+    Tên file: {hash(bucket/object)}-{hash(etag)}{suffix}
+        - suffix bỏ hậu tố nén (.zst/.gz): file trong cache đã được giải nén khi tải về
+        - Cùng object nhưng ETag khác (object đã thay đổi) -> file mới, bản cũ bị xoá khi put.
+        - mtime của file là thời điểm dùng gần nhất; vượt max_bytes thì xoá file cũ nhất trước.
+
+    File được ghi ra tên tạm rồi os.replace nên process khác không bao giờ đọc phải file dở dang.
+    """
+
+    def __init__(self, cache_dir: str = ".cache/objects", max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _object_prefix(bucket_name: str, object_name: str) -> str:
+        return hashlib.sha256(f"{bucket_name}/{object_name}".encode("utf-8")).hexdigest()[:24]
+
+    def path_for(self, bucket_name: str, object_name: str, etag: str) -> str:
+        etag_hash = hashlib.sha256(etag.strip('"').encode("utf-8")).hexdigest()[:16]
+        name = object_name
+        for compressed_suffix in COMPRESSION_SUFFIXES.values():
+            if name.endswith(compressed_suffix):
+                name = name[:-len(compressed_suffix)]
+        suffix = os.path.splitext(name)[1]
+        return os.path.join(self.cache_dir, f"{self._object_prefix(bucket_name, object_name)}-{etag_hash}{suffix}")
+
+    def contains(self, path: str) -> bool:
+        """path có phải file do cache quản lý không (caller không được xoá file này)."""
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.cache_dir)
+
+    def get(self, bucket_name: str, object_name: str, etag: str) -> Optional[str]:
+        path = self.path_for(bucket_name, object_name, etag)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)  # đánh dấu vừa dùng (LRU)
+        return path
+
+    def put(self, bucket_name: str, object_name: str, etag: str, download: Callable[[str], bool]) -> Optional[str]:
+        """
+        Args:
+            download: Hàm tải object vào đường dẫn được truyền vào, trả về True nếu thành công
+
+        Returns:
+            Đường dẫn file trong cache, None nếu tải thất bại
+        """
+        path = self.path_for(bucket_name, object_name, etag)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if not download(tmp_path):
+                return None
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self._remove_stale_versions(bucket_name, object_name, keep=path)
+            self._evict(keep=path)
+        return path
+
+    def _remove_stale_versions(self, bucket_name: str, object_name: str, keep: str):
+        prefix = self._object_prefix(bucket_name, object_name) + "-"
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(prefix) and not name.endswith(".tmp") and path != keep:
+                self._remove(path)
+
+    def _evict(self, keep: str):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def usage_bytes(self) -> int:
+        return sum(os.path.getsize(os.path.join(self.cache_dir, name))
+                   for name in os.listdir(self.cache_dir) if not name.endswith(".tmp"))
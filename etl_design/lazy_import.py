@@ -0,0 +1,32 @@
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Proxy cho 1 module nặng (pandas, numpy, ...): chỉ import thật ở lần truy cập
+    thuộc tính đầu tiên. Sau đó thuộc tính của module thật được chép vào proxy
+    nên các lần truy cập sau không còn chi phí.
+
+    Module dùng proxy cần `from __future__ import annotations` để type hint như
+    `pd.DataFrame` không bị đánh giá (và kích hoạt import) khi định nghĩa hàm.
+    """
+
+    def _load(self) -> types.ModuleType:
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_module(name: str) -> types.ModuleType:
+    """Module thật nếu đã được import, ngược lại trả về LazyModule."""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
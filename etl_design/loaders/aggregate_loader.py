@@ -0,0 +1,197 @@
+from __future__ import annotations
+from etl_design.base_etl import BaseETL
+from typing import Dict, List, Tuple
+from etl_design.lazy_import import lazy_module
+pd = lazy_module("pandas")
+psycopg2_extras = lazy_module("psycopg2.extras")
+
+
+class AggregateLoader(BaseETL):
+    """
+    Cập nhật tăng dần các bảng tổng hợp (Agg_*) từ delta của mỗi lần load facts.
+
+    Thay vì REFRESH MATERIALIZED VIEW trên toàn bộ lịch sử, mỗi lần load chỉ
+    group-by phần facts vừa được tải rồi cộng dồn vào bảng tổng hợp bằng
+    INSERT ... ON CONFLICT DO UPDATE.
+
+    Upsert cộng dồn chỉ đúng khi mỗi delta được áp dụng đúng 1 lần: mỗi lần `execute`
+    phải đi kèm 1 batch đã `claim` (dòng etl_load_progress mới) trong cùng transaction.
+    Batch đã commit trước đó không claim được nên chạy lại / resume không cộng lại delta.
+    """
+
+    def __init__(self, connector, backend=None):
+        super().__init__("AggregateLoader", backend)
+        self.connector = connector
+        # (run_id, input_fingerprint, batch_id) đã claim trong transaction hiện tại, chưa áp dụng delta
+        self.claimed = set()
+
+    def claim(self, run_key: Tuple[str, str], batch_id: str, row_count: int) -> bool:
+        """
+        Ghi dòng tiến độ của batch trong transaction hiện tại (không commit).
+
+        Returns:
+            False nếu batch đã được commit trước đó (PK trùng) -> không được ghi lại facts / delta
+        """
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO etl_load_progress (run_id, input_fingerprint, batch_id, row_count) "
+                "VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING",
+                (*run_key, batch_id, row_count)
+            )
+            if cursor.rowcount != 1:
+                return False
+        self.claimed.add((*run_key, batch_id))
+        return True
+
+    def execute(self, facts: Dict[str, pd.DataFrame], batch_key: Tuple[str, str, str]) -> Dict[str, int]:
+        """
+        Áp dụng delta của các bảng facts vào bảng tổng hợp.
+
+        Args:
+            facts: Dict các fact DataFrame đã được map sang surrogate keys
+            batch_key: (run_id, input_fingerprint, batch_id) đã `claim` trong transaction hiện tại
+
+        Returns:
+            Dict {tên bảng tổng hợp: số nhóm đã upsert}
+        """
+        if batch_key not in self.claimed:
+            raise ValueError(f"Batch {batch_key} was not claimed in this transaction, refusing to apply aggregate delta")
+        self.claimed.discard(batch_key)
+
+        self.log_info("----> BẮT ĐẦU CẬP NHẬT AGGREGATES <----")
+        stats = {}
+
+        trans_df = facts.get('fact_transaction')
+        if trans_df is not None and not trans_df.empty:
+            stats['agg_daily_branch_transaction'] = self._refresh_daily_branch(trans_df)
+            stats['agg_monthly_customer_balance'] = self._refresh_monthly_balance(trans_df)
+
+        loan_df = facts.get('fact_loan_application')
+        if loan_df is not None and not loan_df.empty:
+            stats['agg_loan_approval_by_type'] = self._refresh_loan_approval(loan_df)
+
+        self.log_info(f"----> CẬP NHẬT AGGREGATES HOÀN TẤT: {stats} <----")
+        return stats
+
+    def _select(self, df, columns: List[str], agg_name: str):
+        """Lấy các cột cần cho 1 bảng tổng hợp dưới dạng pandas (None nếu thiếu cột)."""
+        if not self._has_columns(df, columns, agg_name):
+            return None
+        return self.backend.to_pandas(df[columns])
+
+    def _has_columns(self, df: pd.DataFrame, columns: List[str], agg_name: str) -> bool:
+        missing = [col for col in columns if col not in df.columns]
+        if missing:
+            self.log_error(f"----> Missing columns {missing} for {agg_name}, skipping refresh")
+            return False
+        return True
+
+    @staticmethod
+    def _to_records(df: pd.DataFrame) -> List[tuple]:
+        """Chuyển DataFrame sang list tuple kiểu Python thuần (psycopg2 không adapt được numpy)."""
+        df = df.astype(object).where(df.notna(), None)
+        return list(df.itertuples(index=False, name=None))
+
+    def _refresh_daily_branch(self, df: pd.DataFrame) -> int:
+        cols = ['transaction_date_key', 'branch_key', 'transaction_type', 'transaction_amount']
+        df = self._select(df, cols, 'agg_daily_branch_transaction')
+        if df is None:
+            return 0
+
+        delta = (
+            df[cols]
+            .dropna(subset=['transaction_date_key', 'branch_key', 'transaction_type'])
+            .assign(transaction_date_key=lambda d: pd.to_datetime(d['transaction_date_key']).dt.date)
+            .groupby(['transaction_date_key', 'branch_key', 'transaction_type'], as_index=False)
+            .agg(transaction_count=('transaction_amount', 'size'),
+                 total_amount=('transaction_amount', 'sum'))
+        )
+
+        sql_upsert = """
+            INSERT INTO agg_daily_branch_transaction
+                (transaction_date_key, branch_key, transaction_type, transaction_count, total_amount)
+            VALUES %s
+            ON CONFLICT (transaction_date_key, branch_key, transaction_type) DO UPDATE
+            SET transaction_count = agg_daily_branch_transaction.transaction_count + EXCLUDED.transaction_count,
+                total_amount = agg_daily_branch_transaction.total_amount + EXCLUDED.total_amount;
+        """
+        with self.connector.conn.cursor() as cursor:
+            psycopg2_extras.execute_values(cursor, sql_upsert, self._to_records(delta))
+        self.log_info(f"----> Upserted {len(delta)} groups into agg_daily_branch_transaction")
+        return len(delta)
+
+    def _refresh_monthly_balance(self, df: pd.DataFrame) -> int:
+        cols = ['transaction_date_key', 'customer_key', 'acc_balance_after_transaction']
+        df = self._select(df, cols, 'agg_monthly_customer_balance')
+        if df is None:
+            return 0
+
+        month_df = df[cols].dropna(subset=['transaction_date_key', 'customer_key']).copy()
+        month_df['transaction_date_key'] = pd.to_datetime(month_df['transaction_date_key'])
+        month_df['month_key'] = month_df['transaction_date_key'].dt.to_period('M').dt.to_timestamp().dt.date
+        month_df = month_df.sort_values('transaction_date_key', kind='stable')
+
+        delta = (
+            month_df
+            .groupby(['month_key', 'customer_key'], as_index=False)
+            .agg(transaction_count=('acc_balance_after_transaction', 'size'),
+                 min_balance=('acc_balance_after_transaction', 'min'),
+                 max_balance=('acc_balance_after_transaction', 'max'),
+                 closing_balance=('acc_balance_after_transaction', 'last'),
+                 last_transaction_date=('transaction_date_key', 'max'))
+        )
+        delta['last_transaction_date'] = delta['last_transaction_date'].dt.date
+
+        # closing_balance chỉ bị ghi đè khi delta có giao dịch mới hơn
+        sql_upsert = """
+            INSERT INTO agg_monthly_customer_balance
+                (month_key, customer_key, transaction_count, min_balance, max_balance,
+                 closing_balance, last_transaction_date)
+            VALUES %s
+            ON CONFLICT (month_key, customer_key) DO UPDATE
+            SET transaction_count = agg_monthly_customer_balance.transaction_count + EXCLUDED.transaction_count,
+                min_balance = LEAST(agg_monthly_customer_balance.min_balance, EXCLUDED.min_balance),
+                max_balance = GREATEST(agg_monthly_customer_balance.max_balance, EXCLUDED.max_balance),
+                closing_balance = CASE
+                    WHEN agg_monthly_customer_balance.last_transaction_date IS NULL
+                      OR EXCLUDED.last_transaction_date >= agg_monthly_customer_balance.last_transaction_date
+                    THEN EXCLUDED.closing_balance
+                    ELSE agg_monthly_customer_balance.closing_balance END,
+                last_transaction_date = GREATEST(agg_monthly_customer_balance.last_transaction_date,
+                                                 EXCLUDED.last_transaction_date);
+        """
+        with self.connector.conn.cursor() as cursor:
+            psycopg2_extras.execute_values(cursor, sql_upsert, self._to_records(delta))
+        self.log_info(f"----> Upserted {len(delta)} groups into agg_monthly_customer_balance")
+        return len(delta)
+
+    def _refresh_loan_approval(self, df: pd.DataFrame) -> int:
+        cols = ['loan_key', 'application_status']
+        df = self._select(df, cols, 'agg_loan_approval_by_type')
+        if df is None:
+            return 0
+
+        # Gom theo loan_key ở client, loan_type được lấy từ Dim_Loan khi upsert
+        delta = (
+            df[cols]
+            .dropna(subset=['loan_key'])
+            .assign(is_approved=lambda d: d['application_status'].eq('Approved').astype(int))
+            .groupby('loan_key', as_index=False)
+            .agg(application_count=('is_approved', 'size'),
+                 approved_count=('is_approved', 'sum'))
+        )
+
+        sql_upsert = """
+            INSERT INTO agg_loan_approval_by_type (loan_type, application_count, approved_count)
+            SELECT l.loan_type, SUM(d.application_count), SUM(d.approved_count)
+            FROM (VALUES %s) AS d(loan_key, application_count, approved_count)
+            JOIN dim_loan l ON l.loan_key = d.loan_key
+            GROUP BY l.loan_type
+            ON CONFLICT (loan_type) DO UPDATE
+            SET application_count = agg_loan_approval_by_type.application_count + EXCLUDED.application_count,
+                approved_count = agg_loan_approval_by_type.approved_count + EXCLUDED.approved_count;
+        """
+        with self.connector.conn.cursor() as cursor:
+            psycopg2_extras.execute_values(cursor, sql_upsert, self._to_records(delta))
+        self.log_info(f"----> Upserted {len(delta)} loans into agg_loan_approval_by_type")
+        return len(delta)
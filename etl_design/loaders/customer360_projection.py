@@ -0,0 +1,171 @@
+from __future__ import annotations
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Set
+from etl_design.base_etl import BaseETL
+
+
+class Customer360Projection(BaseETL):
+    """
+    Projection "customer 360" phi chuẩn hoá trong Redis cho các công cụ fraud / support.
+
+    Mỗi khách hàng là 1 Redis HASH `c360:{customer_id_source}` gồm:
+        - thuộc tính hiện tại của Dim_Customer (customer_key, birth_year, gender, city, ...)
+        - accounts / cards: JSON list các Dim_Account / Dim_Card hiện tại của khách hàng
+        - tổng hợp Fact_Transaction: số giao dịch + tổng tiền trong `window_days` ngày gần nhất,
+          tổng số giao dịch, ngày giao dịch cuối, số dư sau giao dịch cuối
+
+    Sau mỗi lần load chỉ các khách hàng bị chạm tới được đọc lại từ Postgres (theo batch)
+    và ghi đè hash của họ; đọc từ công cụ chỉ cần 1 HGETALL, không chạm vào warehouse.
+    """
+
+    def __init__(self, connector, redis_cache, window_days: int = 30, batch_size: int = 5000,
+                 ttl_seconds: int = 0, backend=None):
+        super().__init__("Customer360Projection", backend)
+        self.connector = connector
+        self.redis_cache = redis_cache
+        self.window_days = window_days
+        self.batch_size = batch_size
+        self.ttl_seconds = ttl_seconds
+
+    def execute(self, customer_ids: Iterable) -> int:
+        """
+        Args:
+            customer_ids: customer_id_source của các khách hàng có thay đổi trong lần load
+
+        Returns:
+            Số khách hàng đã được cập nhật trong Redis
+        """
+        ids = sorted({str(value) for value in customer_ids if value is not None and value == value})
+        refreshed = 0
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            records = self._build_records(batch)
+            deleted = [customer_id for customer_id in batch if customer_id not in records]
+            self.redis_cache.execute('cache_customer360', records=records, deleted=deleted, ttl=self.ttl_seconds)
+            refreshed += len(records)
+        self.log_info(f"----> Refreshed customer 360 projection for {refreshed}/{len(ids)} customers")
+        return refreshed
+
+    def touched_customers(self, dimensions: Dict, facts: Dict) -> Set[str]:
+        """customer_id_source xuất hiện trong dimensions / facts của 1 lần load."""
+        touched = set()
+        for frames in (dimensions or {}, facts or {}):
+            for df in frames.values():
+                if df is not None and 'customer_id_source' in df.columns:
+                    ids = self.backend.to_pandas(df[['customer_id_source']])['customer_id_source']
+                    touched.update(str(value) for value in ids.dropna().unique().tolist())
+        return touched
+
+    def _build_records(self, customer_ids: List[str]) -> Dict[str, Dict]:
+        try:
+            return self._query_records(customer_ids)
+        finally:
+            # Chỉ đọc: kết thúc transaction để không giữ snapshot / lock giữa các lần load
+            self.connector.conn.rollback()
+
+    def _query_records(self, customer_ids: List[str]) -> Dict[str, Dict]:
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT customer_id_source, customer_key, birth_year, gender, city, valid_from_date
+                FROM dim_customer
+                WHERE is_current = TRUE AND customer_id_source = ANY(%s::varchar[]);
+            """, (customer_ids,))
+            records = {
+                row[0]: {
+                    'customer_id': row[0],
+                    'customer_key': row[1],
+                    'birth_year': row[2],
+                    'gender': row[3],
+                    'city': row[4],
+                    'valid_from_date': row[5],
+                    'accounts': [],
+                    'cards': [],
+                    'txn_window_days': self.window_days,
+                    'txn_count_recent': 0,
+                    'txn_amount_recent': 0,
+                    'txn_count_total': 0,
+                    'last_txn_date': None,
+                    'last_balance': None,
+                }
+                for row in cursor.fetchall()
+            }
+            if not records:
+                return {}
+            found_ids = list(records)
+
+            # Account id được sinh từ Customer ID ('ACC_' + id), xem DimensionTransformers._transform_account
+            cursor.execute("""
+                SELECT account_id_source, account_key, account_type, date_of_account_opening, last_transaction_date
+                FROM dim_account
+                WHERE is_current = TRUE AND account_id_source = ANY(%s::varchar[]);
+            """, ([f"ACC_{customer_id}" for customer_id in found_ids],))
+            for account_id, account_key, account_type, opened, last_txn in cursor.fetchall():
+                records[account_id[len("ACC_"):]]['accounts'].append({
+                    'account_id': account_id, 'account_key': account_key, 'account_type': account_type,
+                    'date_of_account_opening': opened, 'last_transaction_date': last_txn,
+                })
+
+            # Thẻ của khách hàng: theo giao dịch, lấy phiên bản hiện tại của thẻ
+            cursor.execute("""
+                SELECT DISTINCT c.customer_id_source, cur.card_key, cur.card_id_source, cur.card_type,
+                       cur.credit_limit, cur.rewards_points
+                FROM fact_transaction ft
+                JOIN dim_customer c ON c.customer_key = ft.customer_key
+                JOIN dim_card v ON v.card_key = ft.card_key
+                JOIN dim_card cur ON cur.card_id_source = v.card_id_source AND cur.is_current = TRUE
+                WHERE c.customer_id_source = ANY(%s::varchar[]);
+            """, (found_ids,))
+            for customer_id, card_key, card_id, card_type, credit_limit, rewards_points in cursor.fetchall():
+                records[customer_id]['cards'].append({
+                    'card_id': card_id, 'card_key': card_key, 'card_type': card_type,
+                    'credit_limit': credit_limit, 'rewards_points': rewards_points,
+                })
+
+            # Tổng hợp giao dịch trên mọi phiên bản SCD2 của khách hàng
+            cursor.execute("""
+                SELECT c.customer_id_source,
+                       COUNT(*) FILTER (WHERE ft.transaction_date_key >= CURRENT_DATE - %s),
+                       COALESCE(SUM(ft.transaction_amount) FILTER (WHERE ft.transaction_date_key >= CURRENT_DATE - %s), 0),
+                       COUNT(*),
+                       MAX(ft.transaction_date_key),
+                       (ARRAY_AGG(ft.acc_balance_after_transaction
+                                  ORDER BY ft.transaction_date_key DESC, ft.transaction_key DESC))[1]
+                FROM fact_transaction ft
+                JOIN dim_customer c ON c.customer_key = ft.customer_key
+                WHERE c.customer_id_source = ANY(%s::varchar[])
+                GROUP BY c.customer_id_source;
+            """, (self.window_days, self.window_days, found_ids))
+            for customer_id, count_recent, amount_recent, count_total, last_date, last_balance in cursor.fetchall():
+                records[customer_id].update({
+                    'txn_count_recent': count_recent,
+                    'txn_amount_recent': amount_recent,
+                    'txn_count_total': count_total,
+                    'last_txn_date': last_date,
+                    'last_balance': last_balance,
+                })
+
+        updated_at = datetime.now().isoformat(timespec='seconds')
+        return {customer_id: self._to_hash(record, updated_at) for customer_id, record in records.items()}
+
+    @classmethod
+    def _to_hash(cls, record: Dict, updated_at: str) -> Dict[str, str]:
+        """Giá trị Redis HASH phải là chuỗi: list -> JSON, None -> bỏ field."""
+        mapping = {'updated_at': updated_at}
+        for field, value in record.items():
+            if value is None:
+                continue
+            if isinstance(value, list):
+                mapping[field] = json.dumps(value, default=cls._json_default)
+            else:
+                mapping[field] = cls._json_default(value) if isinstance(value, (date, Decimal)) else str(value)
+        return mapping
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        raise TypeError(f"Cannot serialize {type(value)}")
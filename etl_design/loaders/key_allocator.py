@@ -0,0 +1,61 @@
+from typing import Dict, List
+from etl_design.base_etl import BaseETL
+
+
+class SurrogateKeyAllocator(BaseETL):
+    """
+    Cấp surrogate key phía client bằng cách đặt trước từng block giá trị từ
+    sequence SERIAL của dimension.
+
+    Mỗi lần hết block, 1 query `nextval(...) FROM generate_series(1, n)` đặt
+    trước n giá trị. nextval không bị rollback, nên giá trị đã đặt trước luôn là
+    duy nhất. Giá trị chưa dùng khi kết thúc chỉ tạo khoảng trống trong sequence,
+    giống như SERIAL vẫn làm khi rollback.
+    """
+
+    # Dimension SCD2 có surrogate key SERIAL -> cột key
+    SEQUENCE_COLUMNS = {
+        'dim_customer': 'customer_key',
+        'dim_account': 'account_key',
+        'dim_card': 'card_key',
+        'dim_loan': 'loan_key',
+    }
+
+    def __init__(self, connector, block_size: int = 10000):
+        super().__init__("SurrogateKeyAllocator")
+        self.connector = connector
+        self.block_size = block_size
+        self._sequences: Dict[str, str] = {}
+        self._pools: Dict[str, List[int]] = {}
+
+    def execute(self, dim_name: str, count: int) -> List[int]:
+        return self.allocate(dim_name, count)
+
+    def supports(self, dim_name: str) -> bool:
+        return dim_name in self.SEQUENCE_COLUMNS
+
+    def allocate(self, dim_name: str, count: int) -> List[int]:
+        """Lấy `count` surrogate key mới cho dimension."""
+        if count <= 0:
+            return []
+        pool = self._pools.setdefault(dim_name, [])
+        if len(pool) < count:
+            pool.extend(self._reserve(dim_name, max(self.block_size, count - len(pool))))
+        keys, self._pools[dim_name] = pool[:count], pool[count:]
+        return keys
+
+    def _sequence_name(self, dim_name: str) -> str:
+        if dim_name not in self._sequences:
+            with self.connector.conn.cursor() as cursor:
+                cursor.execute("SELECT pg_get_serial_sequence(%s, %s);",
+                               (dim_name, self.SEQUENCE_COLUMNS[dim_name]))
+                self._sequences[dim_name] = cursor.fetchone()[0]
+        return self._sequences[dim_name]
+
+    def _reserve(self, dim_name: str, count: int) -> List[int]:
+        sequence = self._sequence_name(dim_name)
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s);", (sequence, count))
+            keys = [row[0] for row in cursor.fetchall()]
+        self.log_info(f"----> Reserved {len(keys)} keys from {sequence}")
+        return keys
@@ -0,0 +1,223 @@
+from __future__ import annotations
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+from etl_design.base_etl import BaseETL
+from connector_storage.postgresql_connector import PostgresConnect
+from etl_design.lazy_import import lazy_module
+pd = lazy_module("pandas")
+
+# Id của prepared transaction: "{prefix}|{md5(run_id, input_fingerprint, batch_id)}|{slice}".
+# Băm thay vì ghép chuỗi: run_id tuỳ ý (có thể chứa '|') và gid tối đa 200 byte
+GID_PREFIX = "etl_copy"
+# Ký tự ngăn cách các thành phần trước khi băm (giống bên SQL trong `recover`)
+DECISION_SEPARATOR = "\x1f"
+
+
+def decision_digest(run_id: str, input_fingerprint: str, batch_id: str) -> str:
+    """md5 của dòng etl_load_progress là điểm quyết định commit cho các slice của 1 batch."""
+    raw = DECISION_SEPARATOR.join([run_id, input_fingerprint, batch_id])
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+class ParallelCopyWriter(BaseETL):
+    """
+    Ghi 1 bảng Fact lớn qua N kết nối song song (N backend Postgres thay vì 1).
+
+    DataFrame được chia thành N slice liên tục theo thứ tự dòng (đã sắp theo ngày khi
+    physical_design = 'workload' -> mỗi slice là 1 khoảng ngày). Có 2 cách commit:
+
+        - prepared (mặc định): mỗi worker COPY thẳng vào bảng đích (kiểm tra FK + cập nhật
+          index cũng song song) rồi PREPARE TRANSACTION. Loader ghi etl_load_progress và commit
+          transaction của mình trước (điểm quyết định), sau đó COMMIT PREPARED các slice.
+          Nếu process chết giữa chừng, `recover` dựa vào etl_load_progress (đúng run_id,
+          input_fingerprint và batch) để commit hoặc rollback các prepared transaction còn sót.
+          Cần max_prepared_transactions >= N và Dims mà slice tham chiếu đã commit.
+        - staging (dự phòng): mỗi worker COPY slice vào 1 bảng UNLOGGED chung rồi commit, sau đó
+          INSERT ... SELECT vào bảng đích trên cursor của loader -> dòng chỉ hiện ra khi transaction
+          của loader commit. Dùng khi server không bật prepared transaction hoặc Dims còn nằm trong
+          transaction chưa commit của loader (commit_mode = 'single'); bước INSERT chạy trên 1 backend.
+
+    Args:
+        copy_fn: hàm COPY 1 DataFrame (cursor, bảng metadata, df, bảng đích) - dùng chung
+                 logic ép kiểu của loader
+    """
+
+    def __init__(self, postgres_config, copy_fn: Callable, workers: int = 4, backend=None):
+        super().__init__("ParallelCopyWriter", backend)
+        self.config = postgres_config
+        self.copy_fn = copy_fn
+        self.workers = max(2, workers)
+        self.connectors: List[PostgresConnect] = []
+        # Kết nối autocommit cho DDL staging và COMMIT/ROLLBACK PREPARED
+        self.coordinator = None
+        self._prepared_capacity = None
+
+    def open(self):
+        if self.coordinator is None:
+            self.coordinator = self._new_connector()
+            self.coordinator.conn.autocommit = True
+        while len(self.connectors) < self.workers:
+            self.connectors.append(self._new_connector())
+
+    def _new_connector(self) -> PostgresConnect:
+        connector = PostgresConnect(host=self.config.host, port=self.config.port, user=self.config.user,
+                                    password=self.config.password, dbname=self.config.database)
+        connector.connect()
+        return connector
+
+    def close(self):
+        for connector in self.connectors + [self.coordinator]:
+            if connector:
+                connector.close()
+        self.connectors, self.coordinator = [], None
+
+    def supports_prepared(self) -> bool:
+        """max_prepared_transactions mặc định = 0 -> phải bật trên server mới dùng được chế độ prepared."""
+        if self._prepared_capacity is None:
+            self.open()
+            with self.coordinator.conn.cursor() as cursor:
+                cursor.execute("SHOW max_prepared_transactions")
+                self._prepared_capacity = int(cursor.fetchone()[0])
+        return self._prepared_capacity >= self.workers
+
+    def slices(self, df: pd.DataFrame) -> List[pd.DataFrame]:
+        """Chia thành tối đa N khoảng dòng liên tục, kích thước gần bằng nhau."""
+        count = min(self.workers, len(df))
+        bounds = [len(df) * index // count for index in range(count + 1)]
+        return [df.iloc[start:end] for start, end in zip(bounds, bounds[1:]) if end > start]
+
+    def _run(self, work: Callable, parts: List[pd.DataFrame]) -> list:
+        with ThreadPoolExecutor(max_workers=len(parts), thread_name_prefix="parallel-copy") as pool:
+            futures = [pool.submit(work, index, self.connectors[index], part) for index, part in enumerate(parts)]
+            # Chờ mọi worker kết thúc trước khi báo lỗi -> không còn COPY nào chạy khi dọn dẹp
+            errors = [future.exception() for future in futures]
+        for error in errors:
+            if error:
+                raise error
+        return [future.result() for future in futures]
+
+    # ---------- Staging ----------
+    def copy_via_staging(self, cursor, table_name: str, df: pd.DataFrame, order_by: str = None) -> int:
+        """
+        COPY song song vào bảng staging, rồi INSERT ... SELECT vào `table_name` trên `cursor`
+        (transaction của loader, không commit). Trả về số dòng đã ghi.
+
+        Args:
+            order_by: Cột ngày - các slice vào staging xen kẽ nhau, INSERT theo thứ tự cột này
+                      để bảng đích vẫn tăng dần theo ngày
+        """
+        self.open()
+        staging = f"etl_stage_{table_name}_{os.getpid()}"
+        cols = ", ".join(f'"{col}"' for col in df.columns)
+        with self.coordinator.conn.cursor() as admin:
+            # Staging của lần chạy trước bị rollback (nếu có) được thay bằng bảng mới
+            admin.execute(f"DROP TABLE IF EXISTS {staging}")
+            # Chỉ lấy kiểu cột: không NOT NULL / default -> COPY không cần cột SERIAL
+            admin.execute(f"CREATE UNLOGGED TABLE {staging} AS SELECT {cols} FROM {table_name} WITH NO DATA")
+
+        def work(index, connector, part):
+            try:
+                with connector.conn.cursor() as worker_cursor:
+                    self.copy_fn(worker_cursor, table_name, part, staging)
+                connector.conn.commit()
+            except Exception:
+                connector.conn.rollback()
+                raise
+            return len(part)
+
+        parts = self.slices(df)
+        try:
+            rows = sum(self._run(work, parts))
+        except Exception:
+            with self.coordinator.conn.cursor() as admin:
+                admin.execute(f"DROP TABLE IF EXISTS {staging}")
+            raise
+
+        order = f' ORDER BY "{order_by}"' if order_by in df.columns else ""
+        cursor.execute(f"INSERT INTO {table_name} ({cols}) SELECT {cols} FROM {staging}{order}")
+        # DROP trong transaction của loader: rollback thì bảng staging còn lại và bị thay ở lần sau
+        cursor.execute(f"DROP TABLE {staging}")
+        self.log_info(f"----> Copied {rows} rows into {table_name} over {len(parts)} connections (staging)")
+        return rows
+
+    # ---------- Two-phase commit ----------
+    def copy_prepared(self, table_name: str, df: pd.DataFrame, run_id: str, input_fingerprint: str,
+                      batch_id: str) -> List[str]:
+        """
+        COPY song song thẳng vào `table_name`, mỗi slice để ở trạng thái PREPARED. Trả về các gid.
+        Loader phải ghi đúng (run_id, input_fingerprint, batch_id) vào etl_load_progress trước khi commit.
+        """
+        self.open()
+        parts = self.slices(df)
+        digest = decision_digest(run_id, input_fingerprint, batch_id)
+        gids = [f"{GID_PREFIX}|{digest}|{index}" for index in range(len(parts))]
+
+        def work(index, connector, part):
+            conn = connector.conn
+            conn.tpc_begin(gids[index])
+            try:
+                with conn.cursor() as worker_cursor:
+                    self.copy_fn(worker_cursor, table_name, part, table_name)
+                conn.tpc_prepare()
+            except Exception:
+                conn.tpc_rollback()
+                raise
+            return gids[index]
+
+        try:
+            return self._run(work, parts)
+        except Exception:
+            # Slice đã PREPARE thành công vẫn giữ lock / dòng -> rollback ngay
+            self.rollback_prepared(self._pending(gids))
+            raise
+
+    def commit_prepared(self, gids: List[str]):
+        for gid in gids:
+            self.coordinator.conn.tpc_commit(gid)
+        self._reset_workers()
+
+    def rollback_prepared(self, gids: List[str]):
+        for gid in gids:
+            self.coordinator.conn.tpc_rollback(gid)
+        self._reset_workers()
+
+    def _reset_workers(self):
+        # Transaction đã PREPARE không còn gắn với kết nối của worker -> đưa kết nối về trạng thái sẵn sàng
+        for connector in self.connectors:
+            connector.conn.reset()
+
+    def _pending(self, gids: List[str]) -> List[str]:
+        with self.coordinator.conn.cursor() as cursor:
+            cursor.execute("SELECT gid FROM pg_prepared_xacts WHERE database = current_database()")
+            prepared = {row[0] for row in cursor.fetchall()}
+        return [gid for gid in gids if gid in prepared]
+
+    def recover(self) -> int:
+        """
+        Xử lý prepared transaction còn sót từ lần chạy bị ngắt: etl_load_progress có dòng
+        khớp đúng (run_id, input_fingerprint, batch_id) của slice (loader đã commit) -> COMMIT
+        PREPARED, ngược lại (kể cả cùng run nhưng input đã đổi) -> ROLLBACK PREPARED.
+        """
+        self.open()
+        with self.coordinator.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT gid FROM pg_prepared_xacts WHERE database = current_database() AND gid LIKE %s",
+                (f"{GID_PREFIX}|%",)
+            )
+            orphans = [row[0] for row in cursor.fetchall()]
+            for gid in orphans:
+                digest = gid.split("|")[1]
+                cursor.execute(
+                    "SELECT 1 FROM etl_load_progress "
+                    "WHERE md5(concat_ws(%s, run_id, input_fingerprint, batch_id)) = %s",
+                    (DECISION_SEPARATOR, digest)
+                )
+                decided = cursor.fetchone() is not None
+                self.log_warning(f"----> {'Committing' if decided else 'Rolling back'} orphaned prepared COPY {gid}")
+                if decided:
+                    self.coordinator.conn.tpc_commit(gid)
+                else:
+                    self.coordinator.conn.tpc_rollback(gid)
+        return len(orphans)
@@ -0,0 +1,255 @@
+from __future__ import annotations
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+from etl_design.base_etl import BaseETL
+from etl_design.lazy_import import lazy_module
+pa = lazy_module("pyarrow")
+pq = lazy_module("pyarrow.parquet")
+
+# Dimension được export toàn bộ khi nội dung thay đổi: bảng -> cột sắp xếp.
+# Dim_Customer_PII cố ý không export: dữ liệu cá nhân không rời khỏi Postgres.
+EXPORT_DIMENSIONS = {
+    'dim_date': 'date_key',
+    'dim_customer': 'customer_key',
+    'dim_account': 'account_key',
+    'dim_card': 'card_key',
+    'dim_branch': 'branch_key',
+    'dim_loan': 'loan_key',
+}
+
+# Fact được export theo partition ngày: bảng -> (cột partition, cột watermark tăng dần)
+# Watermark là surrogate key SERIAL, hoặc chính cột ngày với bảng snapshot (chỉ append theo ngày)
+EXPORT_FACTS = {
+    'fact_transaction': ('transaction_date_key', 'transaction_key'),
+    'fact_loan_application': ('application_date_key', 'application_key'),
+    'fact_feedback': ('feedback_date_key', 'feedback_key'),
+    'fact_account_snapshot': ('snapshot_date_key', 'snapshot_date_key'),
+    'fact_card_snapshot': ('snapshot_date_key', 'snapshot_date_key'),
+}
+
+MANIFEST_NAME = "_manifest.json"
+
+
+class ParquetExporter(BaseETL):
+    """
+    Export star schema từ Postgres ra Parquet nén trên MinIO cho phân tích offline.
+
+    Layout trong bucket:
+        {prefix}/dimensions/{table}/{table}-{run_id}.parquet
+        {prefix}/facts/{table}/{partition_column}={YYYY-MM-DD}/part-{run_id}.parquet
+        {prefix}/_manifest.json
+
+    Tăng dần:
+        - Dimension: chỉ export lại khi fingerprint (số dòng + md5 nội dung) đổi
+        - Fact: chỉ các partition có dòng mới so với watermark trong manifest được
+          export lại (toàn bộ partition đó), các partition khác giữ nguyên
+
+    Mọi query chạy trong 1 transaction REPEATABLE READ READ ONLY nên dimensions và
+    facts được export từ cùng 1 snapshot. Manifest chỉ được ghi sau khi mọi file đã
+    upload xong, file cũ bị thay thế được xoá sau đó -> người đọc theo manifest luôn
+    thấy 1 phiên bản đầy đủ.
+    """
+
+    # Kiểu Postgres (OID) -> kiểu Arrow
+    ARROW_TYPES = {
+        16: 'bool', 20: 'int64', 21: 'int16', 23: 'int32', 700: 'float32', 701: 'float64',
+        1082: 'date32', 1114: 'timestamp', 1184: 'timestamptz',
+    }
+
+    def __init__(self, connector, minio_connector, bucket_name: str, prefix: str = "star",
+                 partition: str = "month", compression: str = "zstd", batch_rows: int = 100000):
+        super().__init__("ParquetExporter")
+        if partition not in ("day", "month"):
+            raise ValueError(f"Unknown export partition: {partition}")
+        self.connector = connector
+        self.minio = minio_connector
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip("/")
+        self.partition = partition
+        self.compression = compression
+        self.batch_rows = batch_rows
+
+    def execute(self, run_id: str) -> Dict:
+        """
+        Returns:
+            {'dimensions': [bảng đã export], 'partitions': {bảng: số partition đã export}, 'objects': int}
+        """
+        manifest = self._read_manifest()
+        tables = manifest.setdefault('tables', {})
+        replaced: List[str] = []
+        summary = {'dimensions': [], 'partitions': {}, 'objects': 0}
+
+        conn = self.connector.conn
+        conn.rollback()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+
+            for table, order_column in EXPORT_DIMENSIONS.items():
+                entry = tables.setdefault(table, {'kind': 'dimension'})
+                fingerprint = self._dimension_fingerprint(table, order_column)
+                if fingerprint == entry.get('fingerprint'):
+                    continue
+                object_name = f"{self.prefix}/dimensions/{table}/{table}-{run_id}.parquet"
+                stats = self._export_query(object_name, f"SELECT * FROM {table} ORDER BY {order_column}")
+                if entry.get('object') and entry['object'] != object_name:
+                    replaced.append(entry['object'])
+                entry.update(stats, object=object_name, fingerprint=fingerprint)
+                summary['dimensions'].append(table)
+                summary['objects'] += 1
+
+            for table, (partition_column, watermark_column) in EXPORT_FACTS.items():
+                entry = tables.setdefault(table, {'kind': 'fact', 'partition_column': partition_column,
+                                                  'partition': self.partition, 'partitions': {}})
+                touched, watermark = self._touched_partitions(table, partition_column, watermark_column,
+                                                              entry.get('watermark'))
+                for start, end in touched:
+                    object_name = (f"{self.prefix}/facts/{table}/{partition_column}={start.isoformat()}"
+                                   f"/part-{run_id}.parquet")
+                    stats = self._export_query(
+                        object_name,
+                        f"SELECT * FROM {table} WHERE {partition_column} >= %s AND {partition_column} < %s "
+                        f"ORDER BY {partition_column}",
+                        (start, end),
+                    )
+                    previous = entry['partitions'].get(start.isoformat(), {}).get('object')
+                    if previous and previous != object_name:
+                        replaced.append(previous)
+                    entry['partitions'][start.isoformat()] = dict(stats, object=object_name)
+                    summary['objects'] += 1
+                if watermark is not None:
+                    entry['watermark'] = watermark
+                summary['partitions'][table] = len(touched)
+        finally:
+            conn.rollback()
+
+        if summary['objects']:
+            manifest.update(updated_at=datetime.now().isoformat(timespec='seconds'), last_run_id=run_id)
+            self._write_manifest(manifest)
+            for object_name in replaced:
+                self.minio.remove_object(self.bucket_name, object_name)
+        self.log_info(f"----> Exported {summary['objects']} Parquet objects to {self.bucket_name}/{self.prefix} "
+                      f"(dimensions: {summary['dimensions']}, partitions: {summary['partitions']})")
+        return summary
+
+    # ---------- Tăng dần ----------
+    def _dimension_fingerprint(self, table: str, order_column: str) -> str:
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*), md5(string_agg(md5(t::text), '' ORDER BY t.{order_column})) "
+                           f"FROM {table} t")
+            count, digest = cursor.fetchone()
+        return f"{count}:{digest}"
+
+    def _touched_partitions(self, table: str, partition_column: str, watermark_column: str, watermark):
+        """Các partition có dòng mới hơn watermark; watermark mới = giá trị lớn nhất đã thấy."""
+        unit = 'day' if self.partition == 'day' else 'month'
+        condition = f"WHERE {watermark_column} > %s" if watermark is not None else ""
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT date_trunc('{unit}', {partition_column})::date, MAX({watermark_column}) "
+                f"FROM {table} {condition} GROUP BY 1 ORDER BY 1",
+                (watermark,) if watermark is not None else None,
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return [], None
+
+        touched = [(start, self._partition_end(start)) for start, _ in rows]
+        new_watermark = max(row[1] for row in rows)
+        return touched, new_watermark.isoformat() if isinstance(new_watermark, date) else new_watermark
+
+    def _partition_end(self, start: date) -> date:
+        if self.partition == 'day':
+            return start + timedelta(days=1)
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+    # ---------- Parquet ----------
+    def _arrow_schema(self, description) -> pa.Schema:
+        fields = []
+        for column in description:
+            type_name = self.ARROW_TYPES.get(column.type_code)
+            if type_name == 'date32':
+                arrow_type = pa.date32()
+            elif type_name == 'timestamp':
+                arrow_type = pa.timestamp('us')
+            elif type_name == 'timestamptz':
+                arrow_type = pa.timestamp('us', tz='UTC')
+            elif type_name:
+                arrow_type = getattr(pa, type_name)()
+            elif column.type_code == 1700 and column.precision and column.precision > 0:
+                arrow_type = pa.decimal128(column.precision, max(column.scale or 0, 0))
+            else:
+                arrow_type = pa.string()
+            fields.append(pa.field(column.name, arrow_type))
+        return pa.schema(fields)
+
+    def _export_query(self, object_name: str, sql: str, params=None) -> Dict:
+        """Đọc bằng server-side cursor theo batch, ghi Parquet nén ra file tạm rồi upload."""
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.parquet')
+        local_path = temp_file.name
+        temp_file.close()
+        rows = 0
+        writer = None
+        try:
+            with self.connector.conn.cursor(name=f"export_{os.getpid()}") as cursor:
+                cursor.itersize = self.batch_rows
+                cursor.execute(sql, params)
+                while True:
+                    batch = cursor.fetchmany(self.batch_rows)
+                    if writer is None:
+                        schema = self._arrow_schema(cursor.description)
+                        writer = pq.ParquetWriter(local_path, schema, compression=self.compression)
+                    if not batch:
+                        break
+                    columns = list(zip(*batch))
+                    writer.write_table(pa.Table.from_arrays(
+                        [pa.array(self._to_arrow_values(values, field.type), type=field.type)
+                         for values, field in zip(columns, schema)],
+                        schema=schema,
+                    ))
+                    rows += len(batch)
+            writer.close()
+            size = os.path.getsize(local_path)
+            if not self.minio.upload_file(self.bucket_name, object_name, local_path):
+                raise RuntimeError(f"----> Failed to upload {object_name}")
+            return {'rows': rows, 'bytes': size, 'exported_at': datetime.now().isoformat(timespec='seconds')}
+        finally:
+            if os.path.exists(local_path):
+                os.remove(local_path)
+
+    @staticmethod
+    def _to_arrow_values(values, arrow_type):
+        # Kiểu không map được (varchar, text, numeric không giới hạn, ...) ghi dưới dạng chuỗi
+        if pa.types.is_string(arrow_type):
+            return [None if value is None else str(value) for value in values]
+        return list(values)
+
+    # ---------- Manifest ----------
+    def _manifest_object(self) -> str:
+        return f"{self.prefix}/{MANIFEST_NAME}"
+
+    def _read_manifest(self) -> Dict:
+        stream = None
+        if self.minio.check_bucket_exists(self.bucket_name):
+            stream = self.minio.get_object_stream(self.bucket_name, self._manifest_object())
+        if stream is None:
+            self.log_info(f"----> No export manifest in {self.bucket_name}, starting a full export")
+            return {'version': 1, 'tables': {}}
+        try:
+            return json.loads(stream.read().decode('utf-8'))
+        finally:
+            stream.close()
+            stream.release_conn()
+
+    def _write_manifest(self, manifest: Dict):
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.json', mode='w', encoding='utf-8')
+        try:
+            with temp_file:
+                json.dump(manifest, temp_file, indent=2, default=str)
+            if not self.minio.upload_file(self.bucket_name, self._manifest_object(), temp_file.name):
+                raise RuntimeError("----> Failed to upload export manifest")
+        finally:
+            os.remove(temp_file.name)
@@ -1,16 +1,103 @@
-import pandas as pd
+from __future__ import annotations
+import io
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from etl_design.base_etl import BaseETL
+from etl_design.loaders.aggregate_loader import AggregateLoader
+from etl_design.loaders.key_allocator import SurrogateKeyAllocator
+from etl_design.loaders.parallel_copy import ParallelCopyWriter
+from etl_design.transformers.asof_key_resolver import AsOfKeyResolver, FACT_EVENT_DATES
+from etl_design.transformers.snapshot_builder import DailySnapshotBuilder
+from etl_design.validators.data_quality_gate import DataQualityGate
+from etl_design.pipeline.checkpoint_store import contiguous_offset
+from config.base_config import get_etl_config
 from connector_storage.postgresql_connector import PostgresConnect
-from typing import Dict
-from sqlalchemy import create_engine
+from src.schema_metadata import SchemaMetadataCache, FACT_DATE_COLUMNS
+from typing import Callable, Dict, Tuple
+from etl_design.lazy_import import lazy_module
+pd = lazy_module("pandas")
+
+# ánh xạ : (cột nguồn, cột đích, bảng Dim)
+FACT_KEY_MAP = {
+    'fact_transaction': {
+        ('transaction_date', 'transaction_date_key', 'dim_date'),
+        ('customer_id_source', 'customer_key', 'dim_customer'),
+        ('account_id_source', 'account_key', 'dim_account'),
+        ('branch_id_source', 'branch_key', 'dim_branch'),
+        ('card_id_source', 'card_key', 'dim_card')
+    },
+    'fact_loan_application': {
+        ('application_date', 'application_date_key', 'dim_date'),  
+        ('customer_id_source', 'customer_key', 'dim_customer'),
+        ('loan_id_source', 'loan_key', 'dim_loan')
+    },
+    'fact_feedback': {
+        ('feedback_date', 'feedback_date_key', 'dim_date'),
+        ('resolution_date', 'resolution_date_key', 'dim_date'),
+        ('customer_id_source', 'customer_key', 'dim_customer')
+    },
+    'fact_account_snapshot': {
+        ('customer_id_source', 'customer_key', 'dim_customer'),
+        ('account_id_source', 'account_key', 'dim_account')
+    },
+    'fact_card_snapshot': {
+        ('customer_id_source', 'customer_key', 'dim_customer'),
+        ('card_id_source', 'card_key', 'dim_card')
+    }
+}
+
+# Bảng snapshot được sinh theo ngày -> bảng nguồn trong DB khi snapshot_mode = 'daily'
+# (chỉ dòng đã commit, tức đã qua quality gate, của mọi chunk / batch)
+PENDING_CARD_STATES = 'etl_pending_card_state'
+DAILY_SNAPSHOT_SOURCES = {
+    'fact_account_snapshot': 'fact_transaction',
+    'fact_card_snapshot': PENDING_CARD_STATES,
+}
+
+
+def business_key_strings(series: pd.Series) -> pd.Series:
+    """Business key dạng chuỗi để so khớp giữa DataFrame (int / float do NaN / datetime) và DB (varchar / date)."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d')
+    if pd.api.types.is_float_dtype(series):
+        series = series.astype('Int64')
+    return series.astype(str).where(series.notna())
+
 
 class PostgresLoader(BaseETL):
 
-    def __init__(self, postgres_config):
-        super().__init__("PostgresLoader")
+    def __init__(self, postgres_config, backend=None, etl_config=None, governor=None):
+        super().__init__("PostgresLoader", backend)
         self.config = postgres_config
+        self.etl_config = etl_config or get_etl_config()
+        self.governor = governor
         self.connector = None
         self.engine = None
+        self.schema_cache = SchemaMetadataCache({
+            "host": postgres_config.host,
+            "port": postgres_config.port,
+            "user": postgres_config.user,
+            "password": postgres_config.password,
+            "dbname": postgres_config.database,
+        })
+        self.quality_gate = None
+        if self.etl_config.quality_gate_enabled:
+            self.quality_gate = DataQualityGate(self.schema_cache, self.etl_config.quarantine_dir, backend)
+        self.orphan_masks = {}
+        # Key mapping của lần execute hiện tại: key vừa merge + key hiện tại đọc lại cho facts.
+        # Reset mỗi lần execute để không lớn dần theo số chunk
+        self.dim_key_cache = {}
+        # Dimension đã ghi thành công ở lần execute gần nhất (chỉ các dòng qua quality gate)
+        self.loaded_dimensions = {}
+        self.key_allocator = None
+        self.asof_resolver = None
+        # Writer COPY song song cho Fact lớn (tạo khi cần, parallel_copy_workers > 1)
+        self.parallel_writer = None
+        self._prepared_recovered = False
+        # Cập nhật Agg_* + ghi tiến độ batch (etl_load_progress), tạo khi connect
+        self.aggregator = None
+        # Kết nối riêng của thread map key as-of (tạo khi cần)
+        self.premap_connector = None
 
         self.table_configs = {
             'dim_customer': {
@@ -53,27 +140,69 @@ class PostgresLoader(BaseETL):
 
     def connect(self):
         self.log_info("----> Connecting to Postgres database")
-        self.connector = PostgresConnect(**self.config)
+        self.connector = PostgresConnect(host=self.config.host, port=self.config.port, user=self.config.user,
+                                         password=self.config.password, dbname=self.config.database)
         self.connector.connect()
 
-        db_url = f"postgresql://{self.config.user}:{self.config.password}@{self.config.host}:{self.config.port}/{self.config.database}"
+        from sqlalchemy import create_engine
+        db_url = f"postgresql+psycopg2://{self.config.user}:{self.config.password}@{self.config.host}:{self.config.port}/{self.config.database}"
         self.engine = create_engine(db_url)
         self.log_info("----> Engine SQLAlchemy created - sẵn sàng cho bulk load.")
+        self.aggregator = AggregateLoader(self.connector, self.backend)
 
-    def execute(self, dimensions: Dict[str, pd.DataFrame], facts: Dict[str, pd.DataFrame]) -> Dict:
-        """Quy trình chính: Tải Dimensions -> Transform Facts -> Tải Facts."""
+        if self.etl_config.key_allocation == 'client':
+            self.key_allocator = SurrogateKeyAllocator(self.connector, self.etl_config.key_block_size)
+        if self.etl_config.scd_key_resolution == 'asof':
+            self.asof_resolver = AsOfKeyResolver(self.connector, self.backend)
+
+    def execute(self, dimensions: Dict[str, pd.DataFrame], facts: Dict[str, pd.DataFrame],
+                checkpoint=None, build_snapshots: bool = True, run_key: Tuple[str, str] = None,
+                batch_id: str = 'load') -> Dict:
+        """
+        Quy trình chính: Tải Dimensions -> Transform Facts -> Tải Facts -> Cập nhật Aggregates.
+
+        Args:
+            build_snapshots: False khi input được load theo nhiều lần execute (chế độ pipelined):
+                             snapshot cuối ngày được sinh 1 lần qua `build_daily_snapshots` sau chunk cuối
+            run_key: (run_id, input_fingerprint) - `batch_id` được ghi vào etl_load_progress trong
+                     cùng transaction với facts + aggregates; batch đã commit sẽ bị bỏ qua.
+                     Không có run_key -> dùng key adhoc riêng cho lần execute này
+            batch_id: ID của phần input được load (vd. 'chunk:0-100000' ở chế độ pipelined)
+        """
         try:
             if not self.connector:
                 self.connect()
-            # 1. Tải Dimensions
-            dim_keys = self._load_dimensions(dimensions)
+            self.dim_key_cache = {}
+
+            if self.etl_config.commit_mode == 'batched':
+                return self._execute_batched(dimensions, facts, checkpoint, build_snapshots, run_key, batch_id)
+
+            # 0. Đánh dấu batch trước khi ghi: dòng tiến độ chỉ tồn tại nếu transaction này commit
+            claim_key = run_key or self._adhoc_run_key()
+            if not self.aggregator.claim(claim_key, batch_id, self._source_rows(facts)):
+                self.connector.conn.rollback()
+                self.loaded_dimensions = {}
+                self.log_warning(f"----> {batch_id} of run {run_key[0]} was already committed, skipping")
+                return {}
+
+            # 1. Tải Dimensions (map key cho facts chạy song song khi key được cấp phía client)
+            dim_keys, premapped = self._load_dimensions(dimensions, facts=facts)
             
             # 2. Dùng key mapping để tranform các bảng Facts
             self.log_info("----> Transforming fact tables using dimension keys")
-            transformed_facts = self._transform_facts(facts, dim_keys)
+            transformed_facts = self._transform_facts(facts, self._remember_keys(dim_keys), premapped)
             
-            # 3. Tải Facts
-            self._load_facts(transformed_facts)
+            # 3. Tải Facts (chỉ các dòng đã qua quality gate)
+            loaded_facts = self._load_facts(self._without_daily_snapshots(transformed_facts))
+
+            # 4. Cập nhật tăng dần các bảng tổng hợp (cùng transaction với facts)
+            self.aggregator.execute(loaded_facts, (*claim_key, batch_id))
+
+            # 5. Snapshot cuối ngày từ giao dịch đã ghi + trạng thái thẻ đã qua quality gate
+            if self.etl_config.snapshot_mode == 'daily':
+                self._stage_card_states(transformed_facts)
+                if build_snapshots:
+                    self._load_daily_snapshots()
             
             self.connector.conn.commit()
             self.log_info("----> Data loading completed successfully (Đã commit)")
@@ -84,14 +213,166 @@ class PostgresLoader(BaseETL):
             if self.connector and self.connector.conn:
                 self.log_error("----> Rolling back transaction due to error")
                 self.connector.conn.rollback()
+            if self.aggregator:
+                self.aggregator.claimed.clear()
             raise
 
-    def _load_dimensions(self, dimensions: Dict[str, pd.DataFrame]) -> Dict:
+    def _execute_batched(self, dimensions: Dict[str, pd.DataFrame], facts: Dict[str, pd.DataFrame],
+                         checkpoint=None, build_snapshots: bool = True, run_key: Tuple[str, str] = None,
+                         batch_id: str = 'load') -> Dict:
+        """
+        Chế độ batched: commit Dimensions trước (mỗi merge trong 1 savepoint),
+        sau đó commit Facts theo từng batch N dòng. Facts chỉ tham chiếu keys đã commit.
+        `batch_id` được ghi vào etl_load_progress cùng transaction cuối (snapshot) khi đã xong.
+        """
+        run_key = run_key or ((checkpoint.run_id, checkpoint.input_fingerprint) if checkpoint else None)
+        if batch_id in self.committed_batches(run_key):
+            self.loaded_dimensions = {}
+            self.log_warning(f"----> {batch_id} of run {run_key[0]} was already committed, skipping")
+            return checkpoint.load_key_mappings('dim_keys') if checkpoint and checkpoint.is_done('dim_keys') else {}
+
+        # 1. Tải Dimensions và commit
+        if checkpoint and checkpoint.is_done('dim_keys'):
+            self.log_info("----> Dimensions already committed for this run, reusing key mappings")
+            dim_keys, premapped = checkpoint.load_key_mappings('dim_keys'), {}
+        else:
+            dim_keys, premapped = self._load_dimensions(dimensions, use_savepoints=True, facts=facts)
+            self.connector.conn.commit()
+            self.log_info("----> Dimensions committed")
+            if checkpoint:
+                checkpoint.save_key_mappings('dim_keys', dim_keys)
+
+        # 2. Transform Facts bằng keys đã commit
+        transformed_facts = self._transform_facts(facts, self._remember_keys(dim_keys), premapped)
+
+        # 3. Tải Facts + Aggregates theo batch
+        self._load_facts_batched(self._without_daily_snapshots(transformed_facts), run_key, batch_id)
+
+        # 4. Snapshot cuối ngày từ các batch giao dịch đã commit + đánh dấu xong (1 transaction riêng)
+        if self.etl_config.snapshot_mode == 'daily':
+            self._stage_card_states(transformed_facts)
+            if build_snapshots:
+                self._load_daily_snapshots()
+        if run_key:
+            self.aggregator.claim(run_key, batch_id, self._source_rows(facts))
+        self.connector.conn.commit()
+        # Dòng tiến độ của cả phần input không đi kèm delta aggregates
+        self.aggregator.claimed.clear()
+        self.log_info("----> Data loading completed successfully (batched commit)")
+        return dim_keys
+
+    def build_daily_snapshots(self):
+        """Sinh snapshot cuối ngày 1 lần sau khi mọi chunk đã commit (chế độ pipelined), trong 1 transaction riêng."""
+        if self.etl_config.snapshot_mode != 'daily':
+            return
+        if not self.connector:
+            self.connect()
+        try:
+            self._load_daily_snapshots()
+            self.connector.conn.commit()
+        except Exception as e:
+            self.log_error(f"----> Error building daily snapshots: {e}")
+            self.connector.conn.rollback()
+            raise
+
+    def expire_deleted(self, deleted_keys: Dict[str, list]):
+        """Expire phiên bản hiện tại của các business key không còn trong snapshot nguồn (chỉ SCD2)."""
+        if not self.connector:
+            self.connect()
+        try:
+            with self.connector.conn.cursor() as cursor:
+                for dim_name, keys in deleted_keys.items():
+                    config = self.table_configs.get(dim_name)
+                    if not keys or not config or config['type'] != 'scd2':
+                        continue
+                    b_key = config['business_key']
+                    cursor.execute(
+                        f"UPDATE {dim_name} SET valid_to_date = CURRENT_DATE - 1, is_current = FALSE "
+                        f"WHERE {b_key} = ANY(%s::varchar[]) AND is_current = TRUE;",
+                        ([str(key) for key in keys],)
+                    )
+                    self.log_info(f"----> Expired {cursor.rowcount} deleted records in {dim_name}")
+                    cache = self.dim_key_cache.get(dim_name, {})
+                    for key in keys:
+                        cache.pop(key, None)
+            self.connector.conn.commit()
+        except Exception as e:
+            self.log_error(f"----> Error expiring deleted keys: {e}")
+            self.connector.conn.rollback()
+            raise
+
+    def _remember_keys(self, dim_keys: Dict) -> Dict:
+        """Gộp key mapping mới vào cache (business key dạng chuỗi), trả về mapping đầy đủ cho các facts."""
+        for dim_name, mapping in dim_keys.items():
+            if not mapping:
+                continue
+            business_keys = business_key_strings(pd.Series(list(mapping.keys())))
+            self.dim_key_cache.setdefault(dim_name, {}).update(zip(business_keys, mapping.values()))
+        return self.dim_key_cache
+
+    def _lookup_current_keys(self, facts: Dict[str, pd.DataFrame], known: Dict) -> Dict:
+        """
+        Dimension chỉ được merge cho các dòng mới / thay đổi (snapshot diff, dedup), nên key mapping
+        không chứa business key không đổi. Facts vẫn tham chiếu các key đó -> đọc surrogate key
+        hiện tại từ bảng Dim, 1 query mỗi dimension cho các business key còn thiếu.
+        """
+        wanted = {}
+        for fact_name, df in facts.items():
+            for source_col, _, dim_table in FACT_KEY_MAP.get(fact_name, ()):
+                if source_col not in df.columns or dim_table not in self.table_configs:
+                    continue
+                mapping = known.get(dim_table, {})
+                keys = business_key_strings(df[source_col]).dropna().unique()
+                wanted.setdefault(dim_table, set()).update(key for key in keys if key not in mapping)
+
+        found = {}
+        with self.connector.conn.cursor() as cursor:
+            for dim_table, keys in wanted.items():
+                if not keys:
+                    continue
+                config = self.table_configs[dim_table]
+                b_key, s_key = config['business_key'], config['surrogate_key']
+                cast = self._business_key_cast(dim_table, b_key)
+                current = " AND is_current = TRUE" if config['type'] == 'scd2' else ""
+                cursor.execute(
+                    f"SELECT {b_key}, {s_key} FROM {dim_table} WHERE {b_key} = ANY(%s::{cast}[]){current};",
+                    (sorted(keys),)
+                )
+                found[dim_table] = dict(cursor.fetchall())
+                self.log_info(f"----> {dim_table}: resolved {len(found[dim_table])}/{len(keys)} unchanged business keys from the table")
+        return found
+
+    def _business_key_cast(self, dim_table: str, b_key: str) -> str:
+        """Kiểu mảng cho `{b_key} = ANY(%s::<kiểu>[])` - business key được truyền dạng chuỗi (business_key_strings)."""
+        table_meta = self.schema_cache.get_table(dim_table, self.connector.conn) or {"columns": {}}
+        b_key_type = table_meta["columns"].get(b_key, {}).get("type", "")
+        if b_key_type.startswith('date'):
+            return 'date'
+        if b_key_type in ('smallint', 'integer', 'bigint'):
+            return 'bigint'
+        return 'varchar'
+
+    def _load_dimensions(self, dimensions: Dict[str, pd.DataFrame], use_savepoints: bool = False,
+                         facts: Dict[str, pd.DataFrame] = None) -> Tuple[Dict, Dict]:
+        """
+        Tải Dimensions theo load_order.
+
+        Khi key được cấp phía client, các dimension SCD2 được "lên kế hoạch" trước
+        (biết key của mọi dòng mà không cần đọc lại sau merge), rồi map key cho facts
+        chạy trong thread riêng trong lúc các dimension được ghi xuống Postgres.
+
+        Returns:
+            (key mapping của các dimension, cột key đã map sẵn cho facts)
+        """
         self.log_info(f"----> BẮT ĐẦU TẢI DIMENSIONS <----")
         all_dim_keys = {}
+        self.loaded_dimensions = {}
         
         load_order = ['dim_customer', 'dim_customer_pii', 'dim_branch','dim_account', 'dim_card', 'dim_loan', 'dim_date']
-        
+
+        # 1. Quality gate + lập kế hoạch cấp key phía client
+        ready = {}
+        plans = {}
         for dim_name in load_order:
             if dim_name in dimensions and dim_name in self.table_configs:
                 df = dimensions[dim_name]
@@ -99,19 +380,227 @@ class PostgresLoader(BaseETL):
                     self.log_info(f"----> Dimension table {dim_name} is empty, skipping load.")
                     continue
 
+                if self.quality_gate:
+                    df, _ = self.quality_gate.execute(dim_name, df, self.connector.conn)
+                    if df.empty:
+                        self.log_error(f"----> All rows of {dim_name} were quarantined, skipping load.")
+                        continue
+
+                config = self.table_configs[dim_name]
+                ready[dim_name] = df
+                if config['type'] == 'scd2' and self.key_allocator and self.key_allocator.supports(dim_name):
+                    plans[dim_name] = self._plan_scd2_dimension(dim_name, df, config)
+                    all_dim_keys[dim_name] = plans[dim_name]['key_mapping']
+
+        # 2. Map key cho facts song song với việc ghi dimensions
+        #    (chế độ as-of: khoảng SCD2 đọc trên kết nối riêng + áp dụng trước kế hoạch expire/insert)
+        premap_future = None
+        executor = None
+        if plans and facts:
+            self._remember_keys(all_dim_keys)
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fact-key-mapping")
+            premap_future = executor.submit(self._premap_fact_keys, facts, plans)
+
+        try:
+            # 3. Ghi dimensions theo đúng thứ tự (FK của dim_customer_pii -> dim_customer)
+            failed = set()
+            for dim_name, df in ready.items():
                 self.log_info(f"----> Loading {dim_name}")
                 config = self.table_configs[dim_name]
+                if dim_name == 'dim_customer_pii':
+                    df = self._link_customer_pii(df, all_dim_keys.get('dim_customer', {}))
 
-                if config['type'] == 'scd2':
-                    keys = self._load_scd2_dimension(dim_name, df, config)
+                if dim_name in plans:
+                    write = plans[dim_name]['write']
+                elif config['type'] == 'scd2':
+                    write = lambda d=dim_name, f=df, c=config: self._load_scd2_dimension(d, f, c)
                 else:
-                    keys = self._load_scd1_dimension(dim_name, df, config)
+                    write = lambda d=dim_name, f=df, c=config: self._load_scd1_dimension(d, f, c)
 
+                keys = self._run_with_savepoint(dim_name, write) if use_savepoints else write()
+                if keys is None:
+                    failed.add(dim_name)
+                    continue
+                self.loaded_dimensions[dim_name] = df
                 if keys:
                     all_dim_keys[dim_name] = keys
 
+            premapped = premap_future.result() if premap_future else {}
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
+
+        # Dimension ghi lỗi: bỏ key mới cấp (không tồn tại trong DB), giữ lại key hiện tại đã commit
+        for dim_name in failed & set(plans):
+            plan = plans[dim_name]
+            cache = self.dim_key_cache.get(dim_name, {})
+            for b_key_value in business_key_strings(pd.Series(plan['new_business_keys'])):
+                cache.pop(b_key_value, None)
+            self._remember_keys({dim_name: plan['previous_keys']})
+            all_dim_keys.pop(dim_name, None)
+            premapped = {k: v for k, v in premapped.items() if k[2] != dim_name}
+
         self.log_info(f"----> TẢI DIMENSIONS HOÀN TẤT <----")
-        return all_dim_keys
+        return all_dim_keys, premapped
+
+    def _link_customer_pii(self, df: pd.DataFrame, customer_keys: Dict) -> pd.DataFrame:
+        """PII gắn với dim_customer qua customer_key (FK) -> đổi customer_id_source sang key vừa merge."""
+        df = self.backend.to_pandas(df)
+        keys = dict(self.dim_key_cache.get('dim_customer', {}))
+        keys.update({str(b_key): s_key for b_key, s_key in customer_keys.items()})
+        linked = df.assign(customer_key=business_key_strings(df['customer_id_source']).map(keys).astype('Int64'))
+        missing = linked['customer_key'].isnull()
+        if missing.any():
+            self.log_warning(f"----> {missing.sum()} PII rows have no matching dim_customer key, skipping them")
+        return linked[~missing].drop(columns=['customer_id_source'])
+
+    def _run_with_savepoint(self, dim_name: str, write: Callable):
+        """Merge 1 dimension trong savepoint: lỗi chỉ rollback dimension đó (trả về None), không mất các dimension khác."""
+        savepoint = f"sp_{dim_name}"
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute(f"SAVEPOINT {savepoint};")
+        try:
+            keys = write()
+            with self.connector.conn.cursor() as cursor:
+                cursor.execute(f"RELEASE SAVEPOINT {savepoint};")
+            return keys
+        except Exception as e:
+            self.log_error(f"----> Error merging {dim_name}, rolling back to savepoint: {e}")
+            with self.connector.conn.cursor() as cursor:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint};")
+            return None
+
+    def _plan_scd2_dimension(self, dim_name: str, df: pd.DataFrame, config: Dict) -> Dict:
+        """
+        So sánh với phiên bản hiện tại trong DB và cấp surrogate key phía client:
+            - business key mới hoặc thuộc tính thay đổi -> key mới từ block sequence đã đặt trước
+            - không đổi -> giữ key hiện tại
+        Trả về key mapping ngay, cùng hàm `write` để expire + COPY phiên bản mới sau đó.
+        """
+        b_key = config['business_key']
+        s_key = config['surrogate_key']
+        df = self.backend.to_pandas(df)
+
+        scd_cols = {'valid_from_date', 'valid_to_date', 'is_current', s_key}
+        compare_cols = [col for col in df.columns if col not in scd_cols and col != b_key]
+
+        # 1. Phiên bản hiện tại của các business key trong batch (1 query, trước khi merge)
+        business_keys = [str(value) for value in df[b_key].unique().tolist()]
+        select_cols = ", ".join([f'"{col}"' for col in [b_key, s_key] + compare_cols])
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {select_cols} FROM {dim_name} WHERE is_current = TRUE AND {b_key} = ANY(%s::varchar[]);",
+                (business_keys,)
+            )
+            current = pd.DataFrame(cursor.fetchall(), columns=[b_key, s_key] + compare_cols)
+
+        # 2. Phát hiện dòng mới / thay đổi
+        current = current.rename(columns={col: f"{col}__current" for col in compare_cols})
+        current['_bk'] = current[b_key].astype(str)
+        merged = df.assign(_bk=df[b_key].astype(str)).merge(
+            current.drop(columns=[b_key]), on='_bk', how='left'
+        )
+        table_meta = self.schema_cache.get_table(dim_name, self.connector.conn) or {"columns": {}}
+
+        is_new = merged[s_key].isna()
+        changed = pd.Series(False, index=merged.index)
+        for col in compare_cols:
+            col_type = table_meta["columns"].get(col, {}).get("type", "")
+            new_values = self._normalize_for_compare(merged[col], col_type)
+            old_values = self._normalize_for_compare(merged[f"{col}__current"], col_type)
+            changed |= ~((new_values == old_values) | (new_values.isna() & old_values.isna()))
+        changed &= ~is_new
+        need_key = (is_new | changed).to_numpy()
+
+        # 3. Cấp key phía client
+        new_keys = self.key_allocator.allocate(dim_name, int(need_key.sum()))
+        final_keys = merged[s_key].astype('Int64').to_numpy(dtype=object)
+        final_keys[need_key] = new_keys
+        key_mapping = dict(zip(df[b_key].tolist(), [int(key) for key in final_keys]))
+
+        expire_keys = [int(key) for key in merged.loc[changed, s_key].tolist()]
+        insert_df = df[need_key].copy()
+        insert_df[s_key] = new_keys
+        valid_from = (pd.to_datetime(insert_df['valid_from_date'], errors='coerce')
+                      if 'valid_from_date' in insert_df.columns
+                      else pd.Series(pd.Timestamp.today().normalize(), index=insert_df.index))
+        # Phiên bản mới dạng khoảng SCD2 (còn mở) cho việc map key as-of trước khi ghi
+        new_versions = pd.DataFrame({
+            '_bk': business_key_strings(insert_df[b_key]).to_numpy(),
+            'valid_from': valid_from.to_numpy(),
+            'valid_to': pd.NaT,
+            'surrogate_key': insert_df[s_key].to_numpy(dtype='int64'),
+        })
+        self.log_info(f"----> {dim_name}: {int(is_new.sum())} new, {int(changed.sum())} changed, "
+                      f"{len(df) - int(need_key.sum())} unchanged")
+
+        def write() -> Dict:
+            with self.connector.conn.cursor() as cursor:
+                if expire_keys:
+                    cursor.execute(
+                        f"UPDATE {dim_name} SET valid_to_date = CURRENT_DATE - 1, is_current = FALSE "
+                        f"WHERE {s_key} = ANY(%s);",
+                        (expire_keys,)
+                    )
+                    self.log_info(f"----> Expired {cursor.rowcount} old records in {dim_name}")
+                if len(insert_df):
+                    self._copy_dataframe(cursor, dim_name, insert_df)
+                    self.log_info(f"----> Copied {len(insert_df)} new/update records into {dim_name}")
+            return key_mapping
+
+        return {
+            'key_mapping': key_mapping,
+            'write': write,
+            'new_business_keys': df.loc[need_key, b_key].tolist(),
+            'previous_keys': dict(zip(merged.loc[changed, b_key].tolist(), expire_keys)),
+            'expire_keys': expire_keys,
+            'new_versions': new_versions,
+        }
+
+    @staticmethod
+    def _normalize_for_compare(series: pd.Series, col_type: str) -> pd.Series:
+        """Đưa giá trị từ DB và từ DataFrame về cùng dạng trước khi so sánh."""
+        if col_type.startswith(('date', 'timestamp')):
+            return pd.to_datetime(series, errors='coerce').dt.strftime('%Y-%m-%d')
+        if col_type.startswith(('numeric', 'integer', 'bigint', 'smallint', 'double', 'real')):
+            return pd.to_numeric(series, errors='coerce').round(6)
+        return series.where(series.isna(), series.astype(str))
+
+    def _premap_fact_keys(self, facts: Dict[str, pd.DataFrame], plans: Dict[str, Dict]) -> Dict:
+        """
+        Map trước các cột key của facts cho những dimension đã biết key (chạy trong thread riêng).
+
+        Chế độ as-of: dimension chưa được ghi, nên các khoảng SCD2 được đọc trên kết nối riêng
+        (chỉ thấy dữ liệu đã commit) rồi áp dụng kế hoạch expire/insert của lần merge này -
+        cùng kết quả với việc đọc lại sau khi ghi, mà không phải chờ ghi xong.
+        """
+        premapped = {}
+        for fact_name, df in facts.items():
+            event_col = FACT_EVENT_DATES.get(fact_name)
+            for source_col, target_col, dim_table in FACT_KEY_MAP.get(fact_name, ()):
+                if dim_table not in plans or source_col not in df.columns:
+                    continue
+                source_keys = business_key_strings(df[source_col])
+                mapped = source_keys.map(self.dim_key_cache[dim_table]).astype('Int64')
+                if self.asof_resolver and event_col in df.columns:
+                    plan = plans[dim_table]
+                    intervals = self.asof_resolver.load_intervals(dim_table, self.table_configs[dim_table],
+                                                                  source_keys, self._premap_connection())
+                    intervals = self.asof_resolver.with_pending_versions(intervals, plan['expire_keys'],
+                                                                         plan['new_versions'])
+                    mapped = self.asof_resolver.resolve(source_keys, df[event_col], intervals).fillna(mapped)
+                premapped[(fact_name, target_col, dim_table)] = mapped
+        return premapped
+
+    def _premap_connection(self):
+        """Kết nối autocommit riêng cho thread map key (không dùng chung kết nối đang ghi dimension)."""
+        if self.premap_connector is None:
+            self.premap_connector = PostgresConnect(host=self.config.host, port=self.config.port,
+                                                    user=self.config.user, password=self.config.password,
+                                                    dbname=self.config.database)
+            self.premap_connector.connect()
+            self.premap_connector.conn.autocommit = True
+        return self.premap_connector.conn
 
     def _load_scd1_dimension(self, dim_name: str, df: pd.DataFrame, config: Dict) -> Dict:
         staging_table = f"stg_{dim_name}"
@@ -119,7 +608,7 @@ class PostgresLoader(BaseETL):
         s_key = config['surrogate_key']
 
         with self.connector.conn.cursor() as cursor:
-            df.to_sql(staging_table, self.engine, if_exists='replace', index=False, method='multi')
+            self.backend.write_table(df, staging_table, self.engine, if_exists='replace')
             self.log_info(f"----> Staging table {staging_table} created with {len(df)} records")
             
             cols = ", ".join([f'"{col}"' for col in df.columns])
@@ -132,10 +621,11 @@ class PostgresLoader(BaseETL):
                 SET {update_cols};
             """
             cursor.execute(sql_merge)
-            business_keys = tuple[b_key].unique()
+            business_keys = business_key_strings(df[b_key]).dropna().unique().tolist()
+            cast = self._business_key_cast(dim_name, b_key)
             cursor.execute(
-                f"SELECT {s_key}, {b_key} FROM {dim_name} WHERE {b_key} IN %s",
-                ((business_keys,))
+                f"SELECT {b_key}, {s_key} FROM {dim_name} WHERE {b_key} = ANY(%s::{cast}[])",
+                (business_keys,)
             )
             key_mapping = dict(cursor.fetchall())
 
@@ -154,11 +644,11 @@ class PostgresLoader(BaseETL):
 
         with self.connector.conn.cursor() as cursor:
             # 1. Tải vào staging
-            df.to_sql(staging_table, self.engine, if_exists='replace', index=False)
+            self.backend.write_table(df, staging_table, self.engine, if_exists='replace')
             self.log_info(f"----> Staging table {staging_table} created with {len(df)} records")
 
             # 2. Expire old records
-            diff_checks = " OR ".join([f'd"{col} <> s."{col}"' for col in compare_cols])
+            diff_checks = " OR ".join([f'd."{col}" IS DISTINCT FROM s."{col}"' for col in compare_cols])
 
             sql_expire = f"""
                 UPDATE {dim_name} d SET
@@ -188,9 +678,9 @@ class PostgresLoader(BaseETL):
             self.log_info(f"----> Inserted {cursor.rowcount} new/update records into {dim_name}")
 
             # 4. Lấy surrogate keys cho các bản ghi hiện tại
-            business_keys = tuple[df[b_key].unique()]
+            business_keys = tuple(df[b_key].unique().tolist())
             sql_get_keys = f"""
-                SELECT {s_key}, {b_key} FROM {dim_name}
+                SELECT {b_key}, {s_key} FROM {dim_name}
                 WHERE {b_key} IN %s AND is_current = TRUE;
             """
             cursor.execute(sql_get_keys, (business_keys,))
@@ -202,39 +692,21 @@ class PostgresLoader(BaseETL):
             self.log_info(f"----> Staging table {staging_table} dropped")
             return key_mapping
     
-    def _transform_facts(self, facts: Dict[str, pd.DataFrame], all_dim_keys: Dict) -> Dict[str, pd.DataFrame]:
+    def _transform_facts(self, facts: Dict[str, pd.DataFrame], all_dim_keys: Dict,
+                         premapped: Dict = None) -> Dict[str, pd.DataFrame]:
         """Thay thế business keys trong bảng Facts bằng surrogate keys từ Dimensions."""
         self.log_info("----> Starting Transform FACT Table <----")
 
-        # ánh xạ : (cột nguồn, cột đích, bảng Dim)
-        fact_key_map = {
-            'fact_tramsaction': {
-                ('transaction_date', 'transaction_date_key', 'dim_date'),
-                ('customer_id_source', 'customer_key', 'dim_customer'),
-                ('account_id_source', 'account_key', 'dim_account'),
-                ('branch_id_source', 'branch_key', 'dim_branch'),
-                ('card_id_source', 'card_key', 'dim_card')
-            },
-            'fact_loan_application': {
-                ('application_date', 'application_date_key', 'dim_date'),  
-                ('customer_id_source', 'customer_key', 'dim_customer'),
-                ('loan_id_source', 'loan_key', 'dim_loan')
-            },
-            'fact_feedback': {
-                ('feedback_date', 'feedback_date_key', 'dim_date'),
-                ('resolution_date', 'resolution_date_key', 'dim_date'),
-                ('customer_id_source', 'customer_key', 'dim_customer')
-            }
-        }
-
         transformed_facts = {}
+        self.orphan_masks = {}
+        all_dim_keys = self._remember_keys(self._lookup_current_keys(facts, all_dim_keys))
         for fact_name, df in facts.items():
-            if fact_name in fact_key_map:
+            if fact_name in FACT_KEY_MAP:
                 self.log_info(f"----> Transforming fact table {fact_name}")
                 df_copy = df.copy()
 
                 source_cols_to_drop = []
-                for source_col, target_col, dim_table in fact_key_map.get(fact_name):
+                for source_col, target_col, dim_table in FACT_KEY_MAP.get(fact_name):
                     if dim_table not in all_dim_keys:
                         self.log_error(f"----> Dimension keys for {dim_table} not found, skipping key mapping for {fact_name}")
                         continue
@@ -243,18 +715,38 @@ class PostgresLoader(BaseETL):
                         continue
 
                     key_mapping = all_dim_keys[dim_table]
+                    source_keys = business_key_strings(df_copy[source_col])
+                    current = source_keys.map(key_mapping)
+                    config = self.table_configs.get(dim_table, {})
+                    if config.get('business_key') != config.get('surrogate_key'):
+                        # Key tự nhiên (dim_date: date_key là ngày) giữ nguyên kiểu, còn lại là surrogate INT
+                        current = current.astype('Int64')
 
-                    # Tạo cột mới với surrogate key
-                    df_copy[target_col] = df_copy[source_col].map(key_mapping)
+                    # Tạo cột mới với surrogate key (dùng kết quả map sẵn nếu có)
+                    premapped_key = (fact_name, target_col, dim_table)
+                    event_col = FACT_EVENT_DATES.get(fact_name)
+                    if premapped and premapped_key in premapped:
+                        df_copy[target_col] = premapped[premapped_key].fillna(current)
+                    elif (self.asof_resolver and self.table_configs.get(dim_table, {}).get('type') == 'scd2'
+                            and event_col in df_copy.columns):
+                        # Phiên bản SCD2 có hiệu lực tại ngày sự kiện; thiếu ngày thì dùng phiên bản hiện tại
+                        resolved = self.asof_resolver.execute(dim_table, self.table_configs[dim_table],
+                                                              source_keys, df_copy[event_col])
+                        df_copy[target_col] = resolved.fillna(current)
+                    else:
+                        df_copy[target_col] = current
                     source_cols_to_drop.append(source_col)
 
                     null_keys = df_copy[target_col].isnull()
                     if null_keys.any():
                         missing_count = null_keys.sum()
                         self.log_error(f"----> Warning: {missing_count} records in {fact_name} have no matching key in {dim_table} for source column {source_col}")
+                        # Có business key nhưng không map được -> orphan, để quality gate cách ly
+                        orphan = df_copy[source_col].notna() & null_keys
+                        self.orphan_masks.setdefault(fact_name, {})[target_col] = orphan
                 
                 # Loại bỏ các cột nguồn đã được thay thế
-                df_copy.drop(columns=list(set(source_cols_to_drop)), inplace=True)
+                df_copy = df_copy.drop(columns=list(set(source_cols_to_drop)))
                 transformed_facts[fact_name] = df_copy
             else:
                 self.log_info(f"----> No key mapping defined for fact table {fact_name}, skipping transformation")
@@ -262,8 +754,9 @@ class PostgresLoader(BaseETL):
         self.log_info("----> Transform FACT Table Completed <----")
         return transformed_facts
     
-    def _load_facts(self, facts: Dict[str, pd.DataFrame]):
+    def _load_facts(self, facts: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
         self.log_info("----> BẮT ĐẦU TẢI FACTS <----")
+        loaded_facts = {}
         
         for fact_name, df in facts.items():
             if df.empty:
@@ -271,17 +764,276 @@ class PostgresLoader(BaseETL):
                 continue
 
             self.log_info(f"----> Loading fact table {fact_name} with {len(df)} records")
-            with self.connector.conn.cursor() as cursor:
-                cursor.execute(f"SELECT column_name FROM information_schema.columns WHERE table_name = '{fact_name}';")
-                db_columns = {row[0] for row in cursor.fetchall()}
+            db_columns = set(self.schema_cache.get_columns(fact_name, self.connector.conn))
 
             df_cols_to_load = [col for col in df.columns if col in db_columns]
 
-            df[df_cols_to_load].to_sql(fact_name, self.engine, if_exists='append', index=False, method='multi')
+            if self.quality_gate:
+                df, _ = self.quality_gate.execute(fact_name, df, self.connector.conn,
+                                                  self.orphan_masks.get(fact_name))
+                if df.empty:
+                    self.log_error(f"----> All rows of {fact_name} were quarantined, skipping load.")
+                    continue
+
+            # COPY trên kết nối của loader: Facts, Aggregates và Dimensions cùng 1 transaction
+            # (Spark cũng vậy: ghi JDBC theo partition sẽ commit riêng ngoài transaction này)
+            df = self._order_for_load(fact_name, self.backend.to_pandas(df))
+            writer = self._parallel_writer(len(df))
+            with self.connector.conn.cursor() as cursor:
+                if writer:
+                    # Dims chưa commit -> worker không thấy key mới (FK), chỉ dùng được staging
+                    writer.copy_via_staging(cursor, fact_name, df[df_cols_to_load], self._load_order_column(fact_name))
+                else:
+                    self._copy_dataframe(cursor, fact_name, df[df_cols_to_load])
             self.log_info(f"----> Loaded {len(df)} records into {fact_name}")
+            loaded_facts[fact_name] = df
         self.log_info("----> TẢI FACTS HOÀN TẤT <----")
+        return loaded_facts
+
+    def _load_order_column(self, fact_name: str):
+        """Cột ngày mà Fact được ghi theo thứ tự (physical_design = 'workload'), ngược lại None."""
+        if self.etl_config.physical_design != 'workload':
+            return None
+        return FACT_DATE_COLUMNS.get(fact_name)
+
+    def _order_for_load(self, fact_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Ghi theo thứ tự ngày để dữ liệu vật lý tăng dần theo ngày (BRIN range hẹp, không cần CLUSTER lại)."""
+        date_column = self._load_order_column(fact_name)
+        if date_column not in df.columns:
+            return df
+        return df.sort_values(date_column, kind='stable')
+
+    def _parallel_writer(self, rows: int):
+        """Writer song song khi được bật và bảng đủ lớn để bù chi phí N kết nối, ngược lại None."""
+        if self.etl_config.parallel_copy_workers <= 1 or rows < self.etl_config.parallel_copy_min_rows:
+            return None
+        if self.parallel_writer is None:
+            self.parallel_writer = ParallelCopyWriter(self.config, self._copy_dataframe,
+                                                      self.etl_config.parallel_copy_workers, self.backend)
+        return self.parallel_writer
+
+    def _load_facts_batched(self, facts: Dict[str, pd.DataFrame], run_key: Tuple[str, str] = None,
+                            unit: str = 'load'):
+        """
+        Tải Facts theo batch, mỗi batch = ghi tiến độ + COPY + cập nhật aggregates trong
+        cùng 1 transaction rồi commit. Chạy lại cùng run sẽ bỏ qua batch đã commit.
+        ID của batch: '{unit}/{fact}:{start}-{end}' (unit = phần input của lần execute này).
+        """
+        self.log_info("----> BẮT ĐẦU TẢI FACTS (BATCHED) <----")
+        batch_rows = self.etl_config.fact_commit_batch_rows
+        completed = self.committed_batches(run_key)
+        self._recover_prepared_copies()
+        # Mỗi batch cần 1 dòng etl_load_progress (delta aggregates + điểm quyết định của COPY prepared),
+        # kể cả khi không có checkpoint
+        decision_key = run_key or self._adhoc_run_key()
+
+        for fact_name, df in facts.items():
+            if df.empty:
+                self.log_info(f"----> Fact table {fact_name} is empty, skipping load.")
+                continue
+
+            db_columns = set(self.schema_cache.get_columns(fact_name, self.connector.conn))
+            df_cols_to_load = [col for col in df.columns if col in db_columns]
+
+            if self.quality_gate:
+                df, _ = self.quality_gate.execute(fact_name, df, self.connector.conn,
+                                                  self.orphan_masks.get(fact_name))
+            # Sort ổn định -> cùng input luôn cho cùng thứ tự batch khi resume
+            df = self._order_for_load(fact_name, df)
+
+            # Batch được commit theo thứ tự -> bỏ qua đoạn dòng liên tục đã commit
+            start = contiguous_offset(completed, f"{unit}/{fact_name}")
+            if start:
+                self.log_info(f"----> {fact_name}: {start} rows already committed, resuming")
+
+            while start < len(df):
+                rows = self.governor.recommend('copy') if self.governor else batch_rows
+                batch = self.backend.to_pandas(df.iloc[start:start + rows])
+                batch_id = f"{unit}/{fact_name}:{start}-{start + len(batch)}"
+                if self.governor:
+                    self.governor.observe('copy', len(batch), int(batch.memory_usage(deep=True).sum()))
+
+                if not self.aggregator.claim(decision_key, batch_id, len(batch)):
+                    self.connector.conn.rollback()
+                    self.log_warning(f"----> Batch {batch_id} was already committed, skipping")
+                    start += len(batch)
+                    continue
+
+                writer, gids = self._parallel_writer(len(batch)), []
+                try:
+                    with self.connector.conn.cursor() as cursor:
+                        if writer and writer.supports_prepared():
+                            # COPY thẳng vào bảng đích, commit sau khi tiến độ batch đã commit
+                            gids = writer.copy_prepared(fact_name, batch[df_cols_to_load], *decision_key, batch_id)
+                        elif writer:
+                            writer.copy_via_staging(cursor, fact_name, batch[df_cols_to_load],
+                                                    self._load_order_column(fact_name))
+                        else:
+                            self._copy_dataframe(cursor, fact_name, batch[df_cols_to_load])
+                    self.aggregator.execute({fact_name: batch}, (*decision_key, batch_id))
+                    self.connector.conn.commit()
+                except Exception:
+                    if gids:
+                        writer.rollback_prepared(gids)
+                    raise
+                if gids:
+                    writer.commit_prepared(gids)
+                self.log_info(f"----> Committed batch {batch_id} ({len(batch)} records)")
+                start += len(batch)
+        self.log_info("----> TẢI FACTS (BATCHED) HOÀN TẤT <----")
+
+    def _recover_prepared_copies(self):
+        """1 lần mỗi kết nối: xử lý slice COPY còn ở trạng thái PREPARED từ lần chạy bị ngắt."""
+        if self._prepared_recovered or self.etl_config.parallel_copy_workers <= 1:
+            return
+        writer = self._parallel_writer(self.etl_config.parallel_copy_min_rows)
+        if writer.supports_prepared():
+            recovered = writer.recover()
+            if recovered:
+                self.log_warning(f"----> Resolved {recovered} orphaned prepared COPY transactions")
+        self._prepared_recovered = True
+
+    def committed_batches(self, run_key: Tuple[str, str]) -> set:
+        """batch_id đã commit trong etl_load_progress của (run_id, input_fingerprint)."""
+        if not run_key:
+            return set()
+        if not self.connector:
+            self.connect()
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT batch_id FROM etl_load_progress WHERE run_id = %s AND input_fingerprint = %s",
+                run_key
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    @staticmethod
+    def _adhoc_run_key() -> Tuple[str, str]:
+        """Key tiến độ cho lần load không có checkpoint: duy nhất mỗi lần gọi, không bao giờ bị coi là đã commit."""
+        return (f"adhoc:{uuid.uuid4().hex}", "-")
+
+    @staticmethod
+    def _source_rows(facts: Dict[str, pd.DataFrame]) -> int:
+        return max((len(df) for df in facts.values()), default=0)
+
+    def _without_daily_snapshots(self, facts: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """Ở chế độ 'daily', bảng snapshot không tải trực tiếp từ nguồn mà được sinh lại theo ngày."""
+        if self.etl_config.snapshot_mode != 'daily':
+            return facts
+        return {name: df for name, df in facts.items() if name not in DAILY_SNAPSHOT_SOURCES}
+
+    def _stage_card_states(self, facts: Dict[str, pd.DataFrame]):
+        """
+        Ghi trạng thái thẻ (đã qua quality gate) vào bảng chờ, cùng transaction với facts:
+        Fact_Card_Snapshot được sinh từ bảng này, không từ DataFrame của riêng 1 chunk / batch.
+        """
+        states = facts.get('fact_card_snapshot')
+        if states is None or states.empty:
+            return
+        if self.quality_gate:
+            states, _ = self.quality_gate.execute('fact_card_snapshot', states, self.connector.conn,
+                                                  self.orphan_masks.get('fact_card_snapshot'))
+        states = self.backend.to_pandas(states)
+        states = states[[col for col in DailySnapshotBuilder.CARD_COLUMNS if col in states.columns]]
+        with self.connector.conn.cursor() as cursor:
+            self._copy_dataframe(cursor, 'fact_card_snapshot', states, PENDING_CARD_STATES)
+        self.log_info(f"----> Staged {len(states)} card states for daily snapshots")
+
+    def _load_daily_snapshots(self):
+        """
+        Sinh snapshot cuối ngày tăng dần từ ngày snapshot cuối cùng trong DB và COPY
+        từng partition (không commit). Nguồn là dòng đã commit trong DB (giao dịch sau ngày
+        snapshot cuối + trạng thái thẻ đang chờ) -> input chia nhiều chunk / batch không
+        thứ tự theo ngày vẫn được tính đủ, chỉ cần gọi 1 lần sau chunk / batch cuối.
+        """
+        self.log_info("----> BẮT ĐẦU SINH DAILY SNAPSHOTS <----")
+        builder = DailySnapshotBuilder(self.etl_config.snapshot_partition_rows, self.backend)
+
+        for table_name, source_name in DAILY_SNAPSHOT_SOURCES.items():
+            last_state = self._get_last_snapshot(table_name)
+            source = self._get_snapshot_source(source_name, last_state)
+            if source.empty:
+                self.log_info(f"----> No source rows for {table_name}, skipping")
+                continue
+
+            total = 0
+            with self.connector.conn.cursor() as cursor:
+                for partition in builder.execute(table_name, source, last_state):
+                    self._ensure_dates(cursor, partition['snapshot_date_key'].min(), partition['snapshot_date_key'].max())
+                    self._copy_dataframe(cursor, table_name, partition)
+                    total += len(partition)
+            self.log_info(f"----> Copied {total} daily snapshot rows into {table_name}")
+
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {PENDING_CARD_STATES};")
+        self.log_info("----> SINH DAILY SNAPSHOTS HOÀN TẤT <----")
+
+    def _get_snapshot_source(self, source_name: str, last_state: pd.DataFrame) -> pd.DataFrame:
+        """Giao dịch sau ngày snapshot cuối (ngày trước đó đã được tính), hoặc toàn bộ trạng thái thẻ đang chờ."""
+        if source_name != 'fact_transaction':
+            return self._query_frame(f"SELECT * FROM {source_name};")
+
+        since = "" if last_state.empty else "WHERE transaction_date_key > %s"
+        return self._query_frame(
+            f"SELECT account_key, customer_key, transaction_date_key, transaction_type, transaction_amount, "
+            f"acc_balance_after_transaction FROM fact_transaction {since} "
+            f"ORDER BY transaction_date_key, transaction_key;",
+            () if last_state.empty else (last_state['snapshot_date_key'].max(),)
+        )
+
+    def _get_last_snapshot(self, table_name: str) -> pd.DataFrame:
+        """Các dòng của ngày snapshot mới nhất = số dư mở đầu cho lần sinh tiếp theo."""
+        return self._query_frame(
+            f"SELECT * FROM {table_name} WHERE snapshot_date_key = (SELECT MAX(snapshot_date_key) FROM {table_name});"
+        )
+
+    def _query_frame(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        with self.connector.conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [desc[0] for desc in cursor.description]
+            frame = pd.DataFrame(cursor.fetchall(), columns=columns)
+            # NUMERIC (oid 1700) đọc về dạng Decimal -> float để cộng dồn với biến động mới
+            numeric = [desc[0] for desc in cursor.description if desc[1] == 1700]
+            frame[numeric] = frame[numeric].astype(float)
+            return frame
+
+    def _ensure_dates(self, cursor, start_date, end_date):
+        """Bổ sung vào dim_date các ngày không có giao dịch (FK của bảng snapshot)."""
+        cursor.execute("""
+            INSERT INTO dim_date (date_key, full_date_desc, day_of_week_num, day_of_week_name, day_of_month,
+                                  month_num, month_name, quarter_num, year_num, is_weekend, is_holiday)
+            SELECT d::date, to_char(d, 'DD-MM-YYYY'), EXTRACT(ISODOW FROM d), to_char(d, 'FMDay'),
+                   EXTRACT(DAY FROM d), EXTRACT(MONTH FROM d), 'Tháng ' || EXTRACT(MONTH FROM d)::int,
+                   EXTRACT(QUARTER FROM d), EXTRACT(YEAR FROM d), EXTRACT(ISODOW FROM d) IN (6, 7), FALSE
+            FROM generate_series(%s::date, %s::date, INTERVAL '1 day') AS d
+            ON CONFLICT (date_key) DO NOTHING;
+        """, (start_date, end_date))
+
+    def _copy_dataframe(self, cursor, table_name: str, df: pd.DataFrame, into: str = None):
+        """
+        COPY 1 DataFrame pandas vào bảng qua cursor hiện tại (không commit).
+        `into`: bảng đích khác (vd. staging) có cùng kiểu cột với `table_name`.
+        """
+        table_meta = self.schema_cache.get_table(table_name, self.connector.conn) or {"columns": {}}
+        df = df.copy()
+        # Key sau khi map có thể là float (do NaN) -> ép về Int64 để COPY vào cột INT
+        for col, col_meta in table_meta["columns"].items():
+            if col in df.columns and col_meta["type"] in ('integer', 'bigint', 'smallint'):
+                df[col] = df[col].astype('Int64')
+
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        cols = ", ".join([f'"{col}"' for col in df.columns])
+        cursor.copy_expert(f"COPY {into or table_name} ({cols}) FROM STDIN WITH (FORMAT csv)", buffer)
 
     def close(self):
+        if self.premap_connector:
+            self.premap_connector.close()
+            self.premap_connector = None
+        if self.parallel_writer:
+            self.parallel_writer.close()
+            self.parallel_writer = None
         if self.connector:
             self.connector.close()
             self.log_info("----> Postgres connection closed")
\ No newline at end of file
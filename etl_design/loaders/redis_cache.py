@@ -14,9 +14,9 @@ class RedisCache(BaseETL):
             self.connector  = RedisConnect(
                 host = self.config.host, 
                 port = self.config.port,
-                user = self.config.user,
+                user = getattr(self.config, 'user', None),
                 password = self.config.password,
-                db = int(self.config.database) if self.config.database.isdigit() else 0
+                db = int(self.config.database) if str(self.config.database).isdigit() else 0
             )
             self.connector.connect()
             self.log_info(f"----> Kết nối Redis thành công.")
@@ -41,7 +41,30 @@ class RedisCache(BaseETL):
                 return self._cache_etl_metadata(kwargs.get('metadata'))
             
             elif operation == 'get_etl_metadata':
-                return self._get_etl_metadata()
+                return self._get_etl_metadata(kwargs.get('limit', 10))
+
+            elif operation == 'record_run':
+                return self._record_run(kwargs.get('record'), kwargs.get('max_runs', 1000))
+
+            elif operation == 'get_run_history':
+                return self._get_run_history(kwargs.get('since'), kwargs.get('until'), kwargs.get('limit'))
+
+            elif operation == 'get_snapshot_index':
+                return self._get_snapshot_index(kwargs.get('source_id'), kwargs.get('entity'))
+
+            elif operation == 'save_snapshot_index':
+                return self._save_snapshot_index(kwargs.get('source_id'), kwargs.get('entity'),
+                                                 kwargs.get('mapping'))
+
+            elif operation == 'cache_customer360':
+                return self._cache_customer360(kwargs.get('records'), kwargs.get('deleted'),
+                                               kwargs.get('ttl', 0))
+
+            elif operation == 'get_customer360':
+                return self._get_customer360_many([kwargs.get('customer_id')]).get(str(kwargs.get('customer_id')))
+
+            elif operation == 'get_customer360_many':
+                return self._get_customer360_many(kwargs.get('customer_ids'))
             else:
                 self.log_error(f"----> Unknown operation: {operation}")
                 return None
@@ -115,10 +138,10 @@ class RedisCache(BaseETL):
         pipeline.execute()
         return True
     
-    def _get_etl_metadata(self):
-        self.log_info(f"----> Lấy 10 metadata chạy ETL gần nhất")
+    def _get_etl_metadata(self, limit: int = 10):
+        self.log_info(f"----> Lấy {limit} metadata chạy ETL gần nhất")
         
-        recent_run_keys = self.connector.client.lrange("etl:recent_runs", 0, 9)
+        recent_run_keys = self.connector.client.lrange("etl:recent_runs", 0, limit - 1)
         
         if not recent_run_keys:
             return []
@@ -128,10 +151,123 @@ class RedisCache(BaseETL):
         metadata_list = []
         for data in metadata_json_list:
             if data:
-                metadata_list.append(json.loads(data.decode('utf-0')))
+                metadata_list.append(json.loads(data.decode('utf-8') if isinstance(data, bytes) else data))
 
         return metadata_list
+
+    def _record_run(self, record: Dict, max_runs: int = 1000):
+        """
+        Lưu record hiệu năng của 1 lần chạy vào lịch sử (không hết hạn, giữ `max_runs` lần mới nhất).
+
+        Format in Redis:
+        Key: etl:run_history (Kiểu SORTED SET)
+        Score: thời điểm bắt đầu chạy (epoch)
+        Member: record JSON (run_id, run_mode, status, metrics)
+        """
+        if not record or record.get('ts') is None:
+            self.log_error("----> Không thể lưu run history vì record thiếu 'ts'")
+            return False
+
+        pipeline = self.connector.client.pipeline()
+        pipeline.zadd("etl:run_history", {json.dumps(record, sort_keys=True): record['ts']})
+        pipeline.zremrangebyrank("etl:run_history", 0, -(max_runs + 1))
+        pipeline.execute()
+        return True
+
+    def _get_run_history(self, since=None, until=None, limit=None) -> list:
+        """Record trong khoảng thời gian [since, until] (epoch), cũ -> mới; `limit` lấy N record mới nhất."""
+        low = since if since is not None else '-inf'
+        high = until if until is not None else '+inf'
+        if limit:
+            members = self.connector.client.zrevrangebyscore("etl:run_history", high, low, start=0, num=limit)
+            members = list(reversed(members))
+        else:
+            members = self.connector.client.zrangebyscore("etl:run_history", low, high)
+        return [json.loads(m.decode('utf-8') if isinstance(m, bytes) else m) for m in members]
     
+    def _get_snapshot_index(self, source_id: str, entity: str) -> Dict:
+        """
+        Hash index của lần chạy trước cho 1 thực thể.
+
+        Format in Redis:
+        Key: snapshot:{source_id}:{entity} (Kiểu HASH)
+        Field: {business_key}
+        Value: {row_hash}
+        """
+        redis_key = f"snapshot:{source_id}:{entity}"
+        mapping = {}
+        # HSCAN thay vì HGETALL để không chặn Redis với index lớn
+        for field, value in self.connector.client.hscan_iter(redis_key, count=10000):
+            field = field.decode('utf-8') if isinstance(field, bytes) else field
+            value = value.decode('utf-8') if isinstance(value, bytes) else value
+            mapping[field] = value
+
+        self.log_info(f"----> Retrieved {len(mapping)} row hashes từ Hash '{redis_key}'")
+        return mapping
+
+    def _save_snapshot_index(self, source_id: str, entity: str, mapping: Dict, chunk_size: int = 10000):
+        """Thay toàn bộ hash index trong 1 transaction (MULTI/EXEC)."""
+        redis_key = f"snapshot:{source_id}:{entity}"
+        items = list((mapping or {}).items())
+
+        pipeline = self.connector.client.pipeline(transaction=True)
+        pipeline.delete(redis_key)
+        for start in range(0, len(items), chunk_size):
+            pipeline.hset(redis_key, mapping=dict(items[start:start + chunk_size]))
+        pipeline.execute()
+
+        self.log_info(f"----> Saved {len(items)} row hashes vào Hash '{redis_key}'")
+        return True
+
+    def _cache_customer360(self, records: Dict, deleted=None, ttl: int = 0, chunk_size: int = 1000):
+        """
+        Ghi đè projection customer 360.
+
+        Format in Redis:
+        Key: c360:{customer_id} (Kiểu HASH)
+        Field: {attribute} (accounts / cards là JSON)
+
+        DEL + HSET của mỗi chunk nằm trong 1 MULTI/EXEC nên client đọc không
+        bao giờ thấy hash đang ghi dở hoặc còn field cũ.
+        """
+        items = list((records or {}).items())
+        deleted = list(deleted or [])
+        for start in range(0, len(items), chunk_size):
+            pipeline = self.connector.client.pipeline(transaction=True)
+            for customer_id, mapping in items[start:start + chunk_size]:
+                redis_key = f"c360:{customer_id}"
+                pipeline.delete(redis_key)
+                pipeline.hset(redis_key, mapping=mapping)
+                if ttl:
+                    pipeline.expire(redis_key, ttl)
+            pipeline.execute()
+        if deleted:
+            self.connector.client.delete(*[f"c360:{customer_id}" for customer_id in deleted])
+
+        self.log_info(f"----> Cached {len(items)} customer 360 records, removed {len(deleted)}")
+        return True
+
+    def _get_customer360_many(self, customer_ids) -> Dict:
+        """Đọc nhiều projection customer 360 trong 1 round trip (pipeline HGETALL)."""
+        customer_ids = [str(customer_id) for customer_id in (customer_ids or []) if customer_id is not None]
+        pipeline = self.connector.client.pipeline(transaction=False)
+        for customer_id in customer_ids:
+            pipeline.hgetall(f"c360:{customer_id}")
+
+        result = {}
+        for customer_id, raw in zip(customer_ids, pipeline.execute()):
+            if not raw:
+                continue
+            record = {
+                (field.decode('utf-8') if isinstance(field, bytes) else field):
+                    (value.decode('utf-8') if isinstance(value, bytes) else value)
+                for field, value in raw.items()
+            }
+            for field in ('accounts', 'cards'):
+                record[field] = json.loads(record[field]) if field in record else []
+            result[customer_id] = record
+        return result
+
     def close(self):
         if self.connector:
             self.connector.close()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import io
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+from etl_design.base_etl import BaseETL
+from etl_design.transformers.dim_trans import DimensionTransformers
+from etl_design.transformers.fact_trans import FactTransformer
+from connector_storage.minio_transfer import MinIOTransferManager
+from etl_design.lazy_import import lazy_module
+pd = lazy_module("pandas")
+
+# Ứng viên của từng tham số (được cắt theo kích thước mẫu / số CPU)
+CHUNK_ROWS_CANDIDATES = [10000, 25000, 50000, 100000, 200000, 400000]
+COPY_BATCH_CANDIDATES = [5000, 10000, 25000, 50000, 100000, 200000]
+TRANSFER_WORKER_CANDIDATES = [1, 2, 4, 8, 16, 32, 64]
+PART_SIZE_MB_CANDIDATES = [8, 16, 32, 64, 128]
+
+
+class AutoTuner(BaseETL):
+    """
+    Calibration ngắn trên 1 mẫu của input để chọn tham số có throughput cao nhất trên host hiện tại.
+
+        - extract: minio_transfer_workers, rồi minio_part_size_mb (range GET `sample_mb` đầu object)
+        - transform: pipeline_chunk_rows (Dimension + Fact transform trên `sample_rows` dòng)
+        - load: fact_commit_batch_rows (COPY + commit từng batch vào bảng TEMP)
+
+    Mỗi ứng viên đo `repeats` lần, lấy median. Các stage độc lập nên tune lần lượt từng
+    tham số (coordinate search) thay vì cả lưới. Khi nhiều ứng viên nằm trong `tolerance`
+    của throughput tốt nhất, chọn giá trị nhỏ nhất (ít bộ nhớ / kết nối hơn).
+    """
+
+    def __init__(self, minio_connector, pg_connector, sample_rows: int = 200000, sample_mb: int = 64,
+                 repeats: int = 2, tolerance: float = 0.05, backend=None):
+        super().__init__("AutoTuner", backend)
+        self.minio_connector = minio_connector
+        self.pg_connector = pg_connector
+        self.sample_rows = sample_rows
+        self.sample_bytes = sample_mb * 1024 * 1024
+        self.repeats = max(1, repeats)
+        self.tolerance = tolerance
+
+    def execute(self, bucket_name: str, object_name: str, sample: pd.DataFrame, current: Dict) -> Tuple[Dict, Dict]:
+        """
+        Args:
+            sample: `sample_rows` dòng đầu của input (raw DataFrame)
+            current: Giá trị hiện tại của các tham số (dùng làm điểm xuất phát)
+
+        Returns:
+            (settings đã tune, measurements {tham số: {ứng viên: throughput}})
+        """
+        settings, measurements = dict(current), {}
+        sample = self.backend.to_pandas(sample)
+        self.log_info(f"----> Auto-tuning on {len(sample)} sample rows and "
+                      f"{self.sample_bytes // (1024 * 1024)}MB of {bucket_name}/{object_name}")
+
+        # 1. Extract: số luồng trước (ảnh hưởng lớn nhất), rồi kích thước part với số luồng đã chọn
+        max_workers = (os.cpu_count() or 1) * 4
+        settings['minio_transfer_workers'], measurements['minio_transfer_workers'] = self._search(
+            [w for w in TRANSFER_WORKER_CANDIDATES if w <= max_workers],
+            lambda workers: self._measure_transfer(bucket_name, object_name, workers, settings['minio_part_size_mb']),
+        )
+        settings['minio_part_size_mb'], measurements['minio_part_size_mb'] = self._search(
+            [mb for mb in PART_SIZE_MB_CANDIDATES if mb * 1024 * 1024 <= self.sample_bytes] or [min(PART_SIZE_MB_CANDIDATES)],
+            lambda part_mb: self._measure_transfer(bucket_name, object_name, settings['minio_transfer_workers'], part_mb),
+        )
+
+        # 2. Transform
+        settings['pipeline_chunk_rows'], measurements['pipeline_chunk_rows'] = self._search(
+            self._fit(CHUNK_ROWS_CANDIDATES, len(sample)),
+            lambda rows: self._measure_transform(sample, rows),
+        )
+
+        # 3. Load: COPY các dòng fact transaction của mẫu
+        facts = FactTransformer(self.backend).execute(sample, {}) or {}
+        copy_sample = self.backend.to_pandas(facts.get('fact_transaction', sample))
+        settings['fact_commit_batch_rows'], measurements['fact_commit_batch_rows'] = self._search(
+            self._fit(COPY_BATCH_CANDIDATES, len(copy_sample)),
+            lambda rows: self._measure_copy(copy_sample, rows),
+        )
+
+        self.log_info(f"----> Tuned settings: {settings}")
+        return settings, measurements
+
+    # ---------- Search ----------
+    @staticmethod
+    def _fit(candidates: List[int], sample_size: int) -> List[int]:
+        """Ứng viên lớn hơn mẫu cho cùng kết quả -> chỉ giữ 1 ứng viên >= kích thước mẫu."""
+        fitted = [value for value in candidates if value < sample_size]
+        larger = [value for value in candidates if value >= sample_size]
+        return fitted + larger[:1]
+
+    def _search(self, candidates: List[int], measure: Callable[[int], float]) -> Tuple[int, Dict]:
+        results = {}
+        for candidate in candidates:
+            throughputs = [measure(candidate) for _ in range(self.repeats)]
+            results[candidate] = round(statistics.median(throughputs), 1)
+            self.log_info(f"----> candidate {candidate}: {results[candidate]}/s")
+        best = max(results.values())
+        chosen = min(candidate for candidate, value in results.items() if value >= best * (1 - self.tolerance))
+        return chosen, {str(candidate): value for candidate, value in results.items()}
+
+    # ---------- Calibration passes ----------
+    def _measure_transfer(self, bucket_name: str, object_name: str, workers: int, part_size_mb: int) -> float:
+        """MB/s khi range GET `sample_mb` đầu object."""
+        transfer = MinIOTransferManager(self.minio_connector, part_size=part_size_mb * 1024 * 1024,
+                                        max_workers=workers)
+        fd, local_path = tempfile.mkstemp(suffix='.sample')
+        os.close(fd)
+        try:
+            start = time.perf_counter()
+            if not transfer.download(bucket_name, object_name, local_path, length=self.sample_bytes):
+                raise RuntimeError(f"----> Calibration download of {bucket_name}/{object_name} failed")
+            elapsed = time.perf_counter() - start
+            return os.path.getsize(local_path) / (1024 * 1024) / elapsed
+        finally:
+            os.remove(local_path)
+
+    def _measure_transform(self, sample: pd.DataFrame, chunk_rows: int) -> float:
+        """Dòng/s khi transform mẫu theo từng chunk `chunk_rows` dòng."""
+        dim_transformer = DimensionTransformers(self.backend)
+        fact_transformer = FactTransformer(self.backend)
+        start = time.perf_counter()
+        for offset in range(0, len(sample), chunk_rows):
+            chunk = self.backend.from_pandas(sample.iloc[offset:offset + chunk_rows])
+            dim_transformer.execute(chunk)
+            fact_transformer.execute(chunk, {})
+        return len(sample) / (time.perf_counter() - start)
+
+    def _measure_copy(self, df: pd.DataFrame, batch_rows: int) -> float:
+        """Dòng/s khi COPY + commit từng batch vào 1 bảng TEMP (không đụng bảng thật)."""
+        conn = self.pg_connector.conn
+        columns = ", ".join(f'"c{i}" text' for i in range(len(df.columns)))
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS etl_autotune_copy ({columns})")
+            cursor.execute("TRUNCATE etl_autotune_copy")
+        conn.commit()
+        start = time.perf_counter()
+        for offset in range(0, len(df), batch_rows):
+            buffer = io.StringIO()
+            df.iloc[offset:offset + batch_rows].to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            with conn.cursor() as cursor:
+                cursor.copy_expert("COPY etl_autotune_copy FROM STDIN WITH (FORMAT csv)", buffer)
+            conn.commit()
+        elapsed = time.perf_counter() - start
+        with conn.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS etl_autotune_copy")
+        conn.commit()
+        return len(df) / elapsed
@@ -0,0 +1,137 @@
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, Iterable, Set
+
+
+def contiguous_offset(batch_ids: Iterable[str], prefix: str) -> int:
+    """
+    Vị trí dòng đã xử lý liên tục từ đầu, từ các batch_id dạng '{prefix}:{start}-{end}'.
+    Batch được commit theo thứ tự nên đây là điểm resume an toàn.
+    """
+    ranges = {}
+    for batch_id in batch_ids:
+        name, _, span = batch_id.rpartition(':')
+        if name == prefix and '-' in span:
+            batch_start, batch_end = span.split('-')
+            ranges[int(batch_start)] = int(batch_end)
+    offset = 0
+    while offset in ranges:
+        offset = ranges[offset]
+    return offset
+
+
+class CheckpointStore:
+    """
+    Lưu output của từng stage ETL xuống Parquet để chạy lại có thể resume.
+
+    Cấu trúc thư mục:
+        {base_dir}/{run_id}/{input_fingerprint}/
+            manifest.json               # stage đã xong + batch đã commit
+            {stage}.parquet             # stage trả về 1 DataFrame
+            {stage}/{name}.parquet      # stage trả về dict DataFrame
+
+    Cùng run_id nhưng input khác (fingerprint khác) sẽ dùng thư mục mới,
+    nên không bao giờ resume từ dữ liệu của 1 file nguồn khác.
+    """
+
+    def __init__(self, base_dir: str, run_id: str, input_fingerprint: str, backend=None):
+        self.run_id = run_id
+        self.input_fingerprint = input_fingerprint
+        self.backend = backend
+        self.path = os.path.join(base_dir, run_id, input_fingerprint)
+        self.manifest_path = os.path.join(self.path, "manifest.json")
+        os.makedirs(self.path, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    # ---------- Manifest ----------
+    def _read_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {
+            "run_id": self.run_id,
+            "input_fingerprint": self.input_fingerprint,
+            "stages": {},
+            "batches": {},
+        }
+
+    def _write_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_done(self, stage: str) -> bool:
+        return self.manifest["stages"].get(stage, {}).get("status") == "done"
+
+    def mark_done(self, stage: str, **info):
+        self.manifest["stages"][stage] = {
+            "status": "done",
+            "completed_at": datetime.now().isoformat(),
+            **info,
+        }
+        self._write_manifest()
+
+    # ---------- Batch trong 1 stage ----------
+    def completed_batches(self, stage: str) -> Set[str]:
+        return set(self.manifest["batches"].get(stage, []))
+
+    def mark_batch_done(self, stage: str, batch_id: str):
+        batches = self.manifest["batches"].setdefault(stage, [])
+        if batch_id not in batches:
+            batches.append(batch_id)
+            self._write_manifest()
+
+    # ---------- Dữ liệu ----------
+    def _read_parquet(self, path: str):
+        if self.backend is not None:
+            return self.backend.lib.read_parquet(path)
+        import pandas as pd
+        return pd.read_parquet(path)
+
+    def save_frame(self, stage: str, df):
+        df.to_parquet(os.path.join(self.path, f"{stage}.parquet"))
+        self.mark_done(stage, kind="frame", rows=len(df))
+
+    def load_frame(self, stage: str):
+        return self._read_parquet(os.path.join(self.path, f"{stage}.parquet"))
+
+    def save_frames(self, stage: str, frames: Dict[str, object]):
+        stage_dir = os.path.join(self.path, stage)
+        os.makedirs(stage_dir, exist_ok=True)
+        for name, df in frames.items():
+            if df is not None:
+                df.to_parquet(os.path.join(stage_dir, f"{name}.parquet"))
+        self.mark_done(stage, kind="frames", names=[name for name, df in frames.items() if df is not None])
+
+    def load_frames(self, stage: str) -> Dict[str, object]:
+        stage_dir = os.path.join(self.path, stage)
+        names: Iterable[str] = self.manifest["stages"][stage].get("names", [])
+        return {name: self._read_parquet(os.path.join(stage_dir, f"{name}.parquet")) for name in names}
+
+    def save_key_mappings(self, stage: str, dim_keys: Dict[str, Dict]):
+        """Key mapping {dim: {business_key: surrogate_key}} được lưu dạng bảng 2 cột."""
+        import pandas as pd
+        frames = {
+            dim_name: pd.DataFrame({
+                "business_key": list(mapping.keys()),
+                "surrogate_key": list(mapping.values()),
+            })
+            for dim_name, mapping in dim_keys.items()
+        }
+        self.save_frames(stage, frames)
+
+    def load_key_mappings(self, stage: str) -> Dict[str, Dict]:
+        import pandas as pd
+        stage_dir = os.path.join(self.path, stage)
+        names = self.manifest["stages"][stage].get("names", [])
+        dim_keys = {}
+        for name in names:
+            df = pd.read_parquet(os.path.join(stage_dir, f"{name}.parquet"))
+            dim_keys[name] = dict(zip(df["business_key"].tolist(), df["surrogate_key"].tolist()))
+        return dim_keys
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,416 @@
+import os
+import time
+from dataclasses import replace
+from datetime import datetime
+from typing import Dict
+from etl_design.base_etl import BaseETL
+from etl_design.extractors.minio_extractor import Minio_Extracter
+from etl_design.extractors.csv_extractor import CSV_Extractor
+from etl_design.transformers.dim_trans import DimensionTransformers
+from etl_design.transformers.fact_trans import FactTransformer
+from etl_design.transformers.dimension_deduplicator import DimensionDeduplicator
+from etl_design.transformers.snapshot_diff import SnapshotDiffEngine
+from etl_design.loaders.redis_cache import RedisCache
+from etl_design.loaders.postgres_loader import PostgresLoader
+from etl_design.loaders.customer360_projection import Customer360Projection
+from etl_design.loaders.parquet_exporter import ParquetExporter
+from connector_storage.minio_connector import MinIOConnector
+from etl_design.pipeline.checkpoint_store import CheckpointStore, contiguous_offset
+from etl_design.pipeline.memory_governor import MemoryGovernor
+from etl_design.pipeline.pipelined_runner import PipelinedRunner
+from etl_design.pipeline.auto_tuner import AutoTuner
+from etl_design.pipeline.run_history import RegressionAnalyzer, run_record
+from config.base_config import TUNABLE_FIELDS, get_etl_config, load_tuned_profile, save_tuned_profile
+
+
+class ETLPipeline(BaseETL):
+    """
+    Điều phối 1 lần chạy ETL: MinIO -> CSV -> Dimensions -> Facts -> Postgres.
+
+    Khi bật checkpoint, output của mỗi stage được lưu theo (run_id, fingerprint
+    của object nguồn). Chạy lại cùng run_id sẽ bỏ qua các stage đã xong và
+    chỉ chạy lại từ stage bị lỗi.
+    """
+
+    def __init__(self, db_configs: Dict, etl_config=None, backend=None):
+        super().__init__("ETLPipeline", backend)
+        self.db_configs = db_configs
+        self.etl_config = etl_config or get_etl_config()
+
+    def execute(self, bucket_name: str, object_name: str, run_id: str = None) -> Dict:
+        """
+        Args:
+            bucket_name: Bucket chứa file nguồn
+            object_name: Tên object CSV nguồn
+            run_id: ID của lần chạy, mặc định là ngày hiện tại (chạy lại trong ngày sẽ resume)
+
+        Returns:
+            Metadata của lần chạy (thời gian, số dòng từng stage)
+        """
+        run_id = run_id or datetime.now().strftime("%Y%m%d")
+        metadata = {"run_id": run_id, "source": f"{bucket_name}/{object_name}", "stages": {},
+                    "started_at": datetime.now().isoformat(timespec="seconds")}
+        start = time.perf_counter()
+        try:
+            self._execute_run(bucket_name, object_name, run_id, metadata)
+            metadata["status"] = "success"
+            return metadata
+        except Exception:
+            metadata["status"] = "failed"
+            raise
+        finally:
+            metadata["duration_s"] = round(time.perf_counter() - start, 3)
+            self._record_run(metadata)
+
+    def _execute_run(self, bucket_name: str, object_name: str, run_id: str, metadata: Dict) -> Dict:
+        """Các stage của 1 lần chạy, ghi thời gian / số dòng vào `metadata`."""
+        if self.etl_config.auto_tune == "always" or (self.etl_config.auto_tune == "once" and not load_tuned_profile()):
+            self._auto_tune(bucket_name, object_name, metadata)
+
+        extractor = Minio_Extracter(self.db_configs["minio"], self.etl_config)
+        checkpoint = self._open_checkpoint(extractor, bucket_name, object_name, run_id)
+        metadata["input_fingerprint"] = checkpoint.input_fingerprint if checkpoint else None
+
+        if self.etl_config.run_mode == "pipelined":
+            if self.etl_config.snapshot_diff_enabled:
+                # Cần toàn bộ snapshot mới biết key nào bị xoá; chế độ pipelined chỉ dedup giữa các chunk
+                self.log_warning("----> Snapshot diff is not supported in pipelined mode, ignoring")
+            return self._execute_pipelined(extractor, bucket_name, object_name, checkpoint, metadata)
+
+        governor = self._create_governor(inflight_batches=1)
+        loader = PostgresLoader(self.db_configs["postgres"], self.backend, self.etl_config, governor)
+        try:
+            # 1. Extract
+            raw_df = self._run_stage(metadata, checkpoint, "raw",
+                                     lambda: self._extract(extractor, bucket_name, object_name))
+
+            # 2. Transform Dimensions (nguồn full snapshot: chỉ các key thay đổi so với lần chạy trước)
+            snapshot_diff, diff = self._diff_snapshot(raw_df, bucket_name, object_name, metadata)
+            changed_keys = diff['changed_keys'] if diff else None
+            dimensions = self._run_stage(metadata, checkpoint, "dimensions",
+                                         lambda: DimensionTransformers(self.backend).execute(raw_df, changed_keys))
+
+            # 3. Transform Facts
+            facts = self._run_stage(metadata, checkpoint, "facts",
+                                    lambda: FactTransformer(self.backend).execute(raw_df, {}))
+
+            # 4. Load
+            if checkpoint and checkpoint.is_done("load"):
+                self.log_info(f"----> Stage 'load' already completed for run {run_id}, skipping")
+                metadata["stages"]["load"] = {"resumed": True}
+            else:
+                start = time.perf_counter()
+                # Hoàn tất load được ghi vào etl_load_progress trong transaction của load: chết sau commit
+                # nhưng trước mark_done thì lần resume bỏ qua load thay vì ghi lại facts + aggregates
+                run_key = (checkpoint.run_id, checkpoint.input_fingerprint) if checkpoint else None
+                dim_keys = loader.execute(dimensions, facts, checkpoint, run_key=run_key)
+                if checkpoint:
+                    if dim_keys and not checkpoint.is_done("dim_keys"):
+                        checkpoint.save_key_mappings("dim_keys", dim_keys)
+                    checkpoint.mark_done("load")
+                metadata["stages"]["load"] = {
+                    "resumed": False,
+                    "duration_s": round(time.perf_counter() - start, 3),
+                }
+
+            # 5. Expire key đã bị xoá khỏi nguồn, rồi mới lưu hash index mới
+            if snapshot_diff:
+                loader.expire_deleted(diff['deleted_keys'])
+                snapshot_diff.commit()
+
+            # 6. Cập nhật projection customer 360 cho các khách hàng bị chạm tới
+            projection = self._create_projection(loader)
+            if projection:
+                touched = projection.touched_customers(dimensions, facts)
+                if diff:
+                    touched.update(diff['deleted_keys'].get('dim_customer', []))
+                metadata["customer360"] = {"refreshed": projection.execute(touched)}
+                projection.redis_cache.close()
+
+            # 7. Export Parquet các partition mới cho phân tích offline
+            self._export_parquet(loader, metadata)
+
+            if governor:
+                metadata["memory_governor"] = governor.metrics()
+            self.log_info(f"----> Pipeline run {run_id} completed")
+            return metadata
+        finally:
+            loader.close()
+
+    def _execute_pipelined(self, extractor: Minio_Extracter, bucket_name: str, object_name: str,
+                           checkpoint, metadata: Dict) -> Dict:
+        """
+        Extract (stream theo chunk) -> Transform -> Load chạy đồng thời qua queue có giới hạn.
+        Mỗi chunk được load và commit riêng; chạy lại sẽ bỏ qua các chunk đã commit.
+        """
+        chunk_rows = self.etl_config.pipeline_chunk_rows
+        # Mỗi queue giữ tối đa queue_size chunk, cộng thêm chunk đang xử lý ở từng stage
+        governor = self._create_governor(inflight_batches=2 * self.etl_config.pipeline_queue_size + 3)
+        dim_transformer = DimensionTransformers(self.backend)
+        fact_transformer = FactTransformer(self.backend)
+        deduplicator = DimensionDeduplicator(
+            os.path.join(self.etl_config.dedup_spill_dir, metadata["run_id"]),
+            self.etl_config.dedup_memory_budget_mb,
+            self.backend,
+        )
+        loader = PostgresLoader(self.db_configs["postgres"], self.backend, self.etl_config, governor)
+        projection = self._create_projection(loader)
+        # Chunk đã commit được ghi vào etl_load_progress cùng transaction với facts + aggregates của chunk
+        run_key = (checkpoint.run_id, checkpoint.input_fingerprint) if checkpoint else None
+
+        def extract_chunks():
+            chunks = extractor.iter_chunks(bucket_name, object_name, chunk_rows, governor, resume_offset)
+            for start, chunk in chunks:
+                chunk_id = f"chunk:{start}-{start + len(chunk)}"
+                yield chunk_id, self.backend.from_pandas(chunk)
+
+        def transform(item):
+            chunk_id, chunk = item
+            dimensions, facts = self._transform_partitions(chunk, dim_transformer, fact_transformer, governor)
+            if dimensions is None or facts is None:
+                raise RuntimeError(f"----> Transform failed for chunk {chunk_id}")
+            # Chỉ đưa dòng dimension mới/thay đổi so với các chunk trước vào SCD merge
+            return chunk_id, deduplicator.execute(dimensions), facts
+
+        def load(item):
+            chunk_id, dimensions, facts = item
+            loader.execute(dimensions, facts, build_snapshots=False, run_key=run_key, batch_id=chunk_id)
+            # Chỉ ghi nhận dòng dimension đã commit (sau quality gate) cho việc dedup các chunk sau
+            deduplicator.commit(loader.loaded_dimensions)
+            if projection:
+                projection.execute(projection.touched_customers(dimensions, facts))
+            return chunk_id
+
+        runner = PipelinedRunner(queue_size=self.etl_config.pipeline_queue_size)
+        try:
+            resume_offset = contiguous_offset(loader.committed_batches(run_key), "chunk")
+            metadata["stages"] = runner.execute(extract_chunks(), [("transform", transform), ("load", load)])
+            # Snapshot cuối ngày 1 lần từ giao dịch của mọi chunk (chunk không theo thứ tự ngày)
+            if self.etl_config.snapshot_mode == "daily":
+                start = time.perf_counter()
+                loader.build_daily_snapshots()
+                metadata["stages"]["snapshots"] = {"duration_s": round(time.perf_counter() - start, 3)}
+            # Export 1 lần sau khi mọi chunk đã commit
+            self._export_parquet(loader, metadata)
+        finally:
+            loader.close()
+            deduplicator.close()
+            if projection:
+                projection.redis_cache.close()
+
+        if checkpoint:
+            checkpoint.mark_done("load", mode="pipelined")
+        if governor:
+            metadata["memory_governor"] = governor.metrics()
+        self.log_info(f"----> Pipelined run {metadata['run_id']} completed")
+        return metadata
+
+    def _record_run(self, metadata: Dict):
+        """
+        Lưu metadata + record hiệu năng của lần chạy vào Redis, so sánh với các lần chạy
+        trước để phát hiện hồi quy. Lỗi ở đây không làm hỏng lần chạy.
+        """
+        if not self.etl_config.run_history_enabled:
+            return
+        record = run_record(metadata, self.etl_config.run_mode)
+        redis_cache = RedisCache(self.db_configs["redis"])
+        try:
+            redis_cache.execute('cache_etl_metadata', metadata=metadata)
+            if record["status"] == "success":
+                # Lấy dư để còn đủ baseline sau khi lọc lần chạy lỗi / khác run_mode
+                history = redis_cache.execute('get_run_history', limit=self.etl_config.regression_window * 3) or []
+                analyzer = RegressionAnalyzer(window=self.etl_config.regression_window,
+                                              min_change=self.etl_config.regression_min_change,
+                                              batch_window_s=self.etl_config.batch_window_s)
+                metadata["regressions"] = analyzer.execute(history, record)
+            redis_cache.execute('record_run', record=record, max_runs=self.etl_config.run_history_max_runs)
+        except Exception as e:
+            self.log_error(f"----> Failed to record run history: {e}")
+        finally:
+            redis_cache.close()
+
+    def _create_projection(self, loader: PostgresLoader):
+        """Projection customer 360 dùng chung kết nối Postgres của loader (nếu bật customer360)."""
+        if not self.etl_config.customer360_enabled:
+            return None
+        if not loader.connector:
+            loader.connect()
+        return Customer360Projection(
+            loader.connector,
+            RedisCache(self.db_configs["redis"]),
+            window_days=self.etl_config.customer360_window_days,
+            ttl_seconds=self.etl_config.customer360_ttl_s,
+            backend=self.backend,
+        )
+
+    def _minio_connector(self) -> MinIOConnector:
+        minio_config = self.db_configs["minio"]
+        return MinIOConnector(minio_config.endpoint, minio_config.access_key,
+                              minio_config.secret_key, minio_config.secure)
+
+    def _auto_tune(self, bucket_name: str, object_name: str, metadata: Dict):
+        """Calibration trên mẫu của input, lưu tuned profile của host và áp dụng cho lần chạy này."""
+        start = time.perf_counter()
+        extractor = Minio_Extracter(self.db_configs["minio"], self.etl_config)
+        chunks = extractor.iter_chunks(bucket_name, object_name, self.etl_config.autotune_sample_rows)
+        try:
+            _, sample = next(chunks)
+        finally:
+            chunks.close()
+
+        loader = PostgresLoader(self.db_configs["postgres"], self.backend, self.etl_config)
+        try:
+            loader.connect()
+            tuner = AutoTuner(
+                self._minio_connector(),
+                loader.connector,
+                sample_rows=self.etl_config.autotune_sample_rows,
+                sample_mb=self.etl_config.autotune_sample_mb,
+                backend=self.backend,
+            )
+            current = {field: getattr(self.etl_config, field) for field in TUNABLE_FIELDS}
+            settings, measurements = tuner.execute(bucket_name, object_name, self.backend.from_pandas(sample), current)
+        finally:
+            loader.close()
+
+        path = save_tuned_profile(settings, measurements)
+        self.etl_config = replace(self.etl_config, **settings)
+        metadata["stages"]["auto_tune"] = {
+            "settings": settings,
+            "duration_s": round(time.perf_counter() - start, 3),
+        }
+        self.log_info(f"----> Saved tuned profile to {path}")
+
+    def _export_parquet(self, loader: PostgresLoader, metadata: Dict):
+        """Export dimensions + partition Fact mới ra MinIO (nếu bật export)."""
+        if not self.etl_config.export_enabled:
+            return
+        if not loader.connector:
+            loader.connect()
+        exporter = ParquetExporter(
+            loader.connector,
+            self._minio_connector(),
+            self.etl_config.export_bucket,
+            prefix=self.etl_config.export_prefix,
+            partition=self.etl_config.export_partition,
+            compression=self.etl_config.export_compression,
+            batch_rows=self.etl_config.export_batch_rows,
+        )
+        start = time.perf_counter()
+        summary = exporter.execute(metadata["run_id"])
+        metadata["stages"]["export"] = dict(summary, duration_s=round(time.perf_counter() - start, 3))
+
+    def _diff_snapshot(self, raw_df, bucket_name: str, object_name: str, metadata: Dict):
+        """So sánh snapshot nguồn với hash index của lần chạy trước (nếu bật snapshot_diff)."""
+        if not self.etl_config.snapshot_diff_enabled:
+            return None, None
+        redis_cache = RedisCache(self.db_configs["redis"]) if self.etl_config.snapshot_diff_store == "redis" else None
+        engine = SnapshotDiffEngine(
+            f"{bucket_name}/{object_name}",
+            store=self.etl_config.snapshot_diff_store,
+            index_dir=self.etl_config.snapshot_index_dir,
+            redis_cache=redis_cache,
+            backend=self.backend,
+        )
+        diff = engine.execute(raw_df)
+        metadata["snapshot_diff"] = diff['stats']
+        return engine, diff
+
+    def _create_governor(self, inflight_batches: int):
+        if not self.etl_config.memory_governor_enabled:
+            return None
+        return MemoryGovernor(
+            budget_mb=self.etl_config.memory_budget_mb,
+            initial_rows={
+                "extract": self.etl_config.pipeline_chunk_rows,
+                "transform": self.etl_config.pipeline_chunk_rows,
+                "copy": self.etl_config.fact_commit_batch_rows,
+            },
+            min_rows=self.etl_config.governor_min_rows,
+            max_rows=self.etl_config.governor_max_rows,
+            inflight_batches=inflight_batches,
+        )
+
+    def _transform_partitions(self, chunk, dim_transformer, fact_transformer, governor):
+        """Transform 1 chunk theo từng partition (kích thước do governor quyết định) rồi ghép lại."""
+        if governor is None:
+            return dim_transformer.execute(chunk), fact_transformer.execute(chunk, {})
+
+        lib = self.backend.lib
+        dim_parts, fact_parts = [], []
+        start = 0
+        while start < len(chunk):
+            rows = governor.recommend("transform")
+            part = chunk.iloc[start:start + rows]
+            dimensions = dim_transformer.execute(part)
+            facts = fact_transformer.execute(part, {})
+            if dimensions is None or facts is None:
+                return None, None
+            output_bytes = sum(
+                int(df.memory_usage(deep=True).sum())
+                for df in list(dimensions.values()) + list(facts.values()) if df is not None
+            )
+            governor.observe("transform", len(part), output_bytes)
+            dim_parts.append(dimensions)
+            fact_parts.append(facts)
+            start += len(part)
+
+        if len(dim_parts) == 1:
+            return dim_parts[0], fact_parts[0]
+
+        def combine(parts):
+            return {name: lib.concat([p[name] for p in parts], ignore_index=True) for name in parts[0]}
+
+        return combine(dim_parts), combine(fact_parts)
+
+    def _open_checkpoint(self, extractor: Minio_Extracter, bucket_name: str, object_name: str, run_id: str):
+        if not self.etl_config.checkpoint_enabled:
+            return None
+        fingerprint = extractor.get_object_fingerprint(bucket_name, object_name)
+        if fingerprint is None:
+            self.log_warning("----> Cannot fingerprint source object, checkpointing disabled for this run")
+            return None
+        return CheckpointStore(self.etl_config.checkpoint_dir, run_id, fingerprint, self.backend)
+
+    def _extract(self, extractor: Minio_Extracter, bucket_name: str, object_name: str):
+        local_path = extractor.execute(bucket_name, object_name)
+        if local_path is None:
+            raise RuntimeError(f"----> Failed to extract {bucket_name}/{object_name}")
+        try:
+            # File trong cache ổn định trên đĩa -> parse qua memory map thay vì đọc vào buffer
+            # memory_map chỉ có tác dụng với pandas (Spark tự đọc file theo partition)
+            memory_map = extractor.is_cached(local_path) and self.backend.name == 'pandas'
+            df = CSV_Extractor(self.backend).execute(local_path, memory_map=memory_map)
+        finally:
+            extractor.release(local_path)
+        if df is None:
+            raise RuntimeError(f"----> Failed to parse {bucket_name}/{object_name}")
+        return df
+
+    def _run_stage(self, metadata: Dict, checkpoint, stage: str, func):
+        """Chạy 1 stage hoặc đọc lại output từ checkpoint nếu stage đã xong."""
+        start = time.perf_counter()
+
+        if checkpoint and checkpoint.is_done(stage):
+            self.log_info(f"----> Resuming stage '{stage}' from checkpoint")
+            kind = checkpoint.manifest["stages"][stage].get("kind")
+            result = checkpoint.load_frames(stage) if kind == "frames" else checkpoint.load_frame(stage)
+            resumed = True
+        else:
+            result = func()
+            if result is None:
+                raise RuntimeError(f"----> Stage '{stage}' returned no data")
+            if checkpoint:
+                if isinstance(result, dict):
+                    checkpoint.save_frames(stage, result)
+                else:
+                    checkpoint.save_frame(stage, result)
+            resumed = False
+
+        rows = sum(len(df) for df in result.values() if df is not None) if isinstance(result, dict) else len(result)
+        metadata["stages"][stage] = {
+            "resumed": resumed,
+            "duration_s": round(time.perf_counter() - start, 3),
+            "rows": rows,
+        }
+        return result
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from typing import Dict, List
+from etl_design.base_etl import BaseETL
+
+try:
+    import psutil
+except ImportError:  # psutil là tuỳ chọn, fallback sang /proc hoặc resource
+    psutil = None
+
+
+def current_rss_bytes() -> int:
+    """RSS hiện tại của process (bytes)."""
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss là peak (KB trên Linux), chỉ dùng khi không đọc được RSS hiện tại
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryGovernor(BaseETL):
+    """
+    Điều chỉnh kích thước batch theo RSS của process và chi phí bộ nhớ mỗi dòng.
+
+    Mỗi loại batch ('extract', 'transform', 'copy') có kích thước riêng. Sau mỗi
+    batch, stage gọi observe() với số dòng và số byte thực tế; lần recommend()
+    tiếp theo tính lại số dòng sao cho (RSS hiện tại + các batch đang xử lý)
+    nằm trong memory budget. Mọi thay đổi được ghi lại để đưa vào run metrics.
+    """
+
+    KINDS = ('extract', 'transform', 'copy')
+
+    def __init__(self, budget_mb: int, initial_rows: Dict[str, int], min_rows: int = 1000,
+                 max_rows: int = 1000000, inflight_batches: int = 1, safety_fraction: float = 0.8,
+                 overhead_factor: float = 3.0):
+        super().__init__("MemoryGovernor")
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.min_rows = min_rows
+        self.max_rows = max_rows
+        # Số batch có thể cùng nằm trong bộ nhớ (vd: queue_size + số stage ở chế độ pipelined)
+        self.inflight_batches = max(1, inflight_batches)
+        self.safety_fraction = safety_fraction
+        # Bản sao trung gian của pandas khi transform/COPY so với kích thước batch
+        self.overhead_factor = overhead_factor
+
+        self.current_rows = {kind: self._clamp(initial_rows.get(kind, min_rows)) for kind in self.KINDS}
+        self.row_cost = {}
+        self.decisions: List[Dict] = []
+        self.peak_rss = current_rss_bytes()
+        self._lock = threading.Lock()
+
+    def execute(self, kind: str) -> int:
+        return self.recommend(kind)
+
+    def _clamp(self, rows: float) -> int:
+        return int(max(self.min_rows, min(self.max_rows, rows)))
+
+    def observe(self, kind: str, rows: int, bytes_used: int):
+        """Ghi nhận chi phí bộ nhớ thực tế của 1 batch."""
+        if rows <= 0:
+            return
+        with self._lock:
+            cost = bytes_used / rows
+            previous = self.row_cost.get(kind)
+            # EMA để tránh dao động theo từng batch
+            self.row_cost[kind] = cost if previous is None else 0.7 * previous + 0.3 * cost
+            self.peak_rss = max(self.peak_rss, current_rss_bytes())
+
+    def recommend(self, kind: str) -> int:
+        """Số dòng cho batch tiếp theo của loại `kind`."""
+        with self._lock:
+            current = self.current_rows[kind]
+            cost = self.row_cost.get(kind)
+            if cost is None:
+                return current
+
+            rss = current_rss_bytes()
+            self.peak_rss = max(self.peak_rss, rss)
+            headroom = self.budget_bytes * self.safety_fraction - rss
+
+            if headroom <= 0:
+                target = current / 2
+                reason = "over_budget"
+            else:
+                target = headroom / (cost * self.overhead_factor * self.inflight_batches)
+                # Tăng tối đa gấp đôi mỗi bước, giảm thì áp dụng ngay
+                target = min(target, current * 2)
+                reason = "grow" if target > current else "shrink"
+
+            new_rows = self._clamp(target)
+            if abs(new_rows - current) > 0.1 * current:
+                decision = {
+                    "time": round(time.time(), 3),
+                    "kind": kind,
+                    "from_rows": current,
+                    "to_rows": new_rows,
+                    "reason": reason,
+                    "rss_mb": round(rss / 1024 / 1024, 1),
+                    "row_cost_bytes": round(cost, 1),
+                }
+                self.decisions.append(decision)
+                self.log_info(f"----> Resize {kind} batch {current} -> {new_rows} rows ({reason}, rss={decision['rss_mb']}MB)")
+                self.current_rows[kind] = new_rows
+            return self.current_rows[kind]
+
+    def metrics(self) -> Dict:
+        """Tóm tắt quyết định của governor để đưa vào metadata của lần chạy."""
+        with self._lock:
+            return {
+                "budget_mb": round(self.budget_bytes / 1024 / 1024, 1),
+                "peak_rss_mb": round(self.peak_rss / 1024 / 1024, 1),
+                "current_rows": dict(self.current_rows),
+                "row_cost_bytes": {kind: round(cost, 1) for kind, cost in self.row_cost.items()},
+                "decision_count": len(self.decisions),
+                "decisions": self.decisions[-50:],
+            }
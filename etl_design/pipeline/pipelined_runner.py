@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+from etl_design.base_etl import BaseETL
+
+_SENTINEL = object()
+
+
+class PipelinedRunner(BaseETL):
+    """
+    Chạy các stage ETL đồng thời, nối với nhau bằng queue có giới hạn.
+
+    source (vd: các chunk extract) -> stage 1 -> stage 2 -> ... mỗi stage 1 thread.
+    Queue đầy thì stage phía trước bị chặn (backpressure), nên bộ nhớ chỉ giữ
+    tối đa queue_size item giữa 2 stage. Khi 1 stage lỗi, toàn bộ pipeline
+    được huỷ và lỗi đầu tiên được raise lại ở thread gọi execute.
+    """
+
+    def __init__(self, queue_size: int = 4, poll_interval: float = 0.1):
+        super().__init__("PipelinedRunner")
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+
+    def execute(self, source: Iterable, stages: List[Tuple[str, Callable]]) -> Dict:
+        """
+        Args:
+            source: Iterable sinh ra các item đầu vào (chạy trong thread 'extract')
+            stages: Danh sách (tên stage, hàm xử lý 1 item); output của stage trước là input của stage sau
+
+        Returns:
+            Thống kê: số item, thời gian bận của từng stage và tổng thời gian
+        """
+        cancel = threading.Event()
+        errors = []
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        stats = {"extract": {"items": 0, "busy_s": 0.0}}
+        stats.update({name: {"items": 0, "busy_s": 0.0} for name, _ in stages})
+
+        def put(q, item) -> bool:
+            while not cancel.is_set():
+                try:
+                    q.put(item, timeout=self.poll_interval)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not cancel.is_set():
+                try:
+                    return q.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    continue
+            return _SENTINEL
+
+        def fail(stage_name: str, error: Exception):
+            self.log_error(f"----> Stage '{stage_name}' failed, cancelling pipeline: {error}")
+            errors.append(error)
+            cancel.set()
+
+        def produce():
+            iterator = iter(source)
+            try:
+                while not cancel.is_set():
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                    stats["extract"]["busy_s"] += time.perf_counter() - start
+                    stats["extract"]["items"] += 1
+                    if not put(queues[0], item):
+                        break
+            except Exception as e:
+                fail("extract", e)
+            finally:
+                if hasattr(iterator, "close"):
+                    iterator.close()
+                put(queues[0], _SENTINEL)
+
+        def consume(index: int, name: str, func: Callable):
+            in_q = queues[index]
+            out_q = queues[index + 1] if index + 1 < len(queues) else None
+            try:
+                while True:
+                    item = get(in_q)
+                    if item is _SENTINEL:
+                        break
+                    start = time.perf_counter()
+                    result = func(item)
+                    stats[name]["busy_s"] += time.perf_counter() - start
+                    stats[name]["items"] += 1
+                    if out_q is not None and not put(out_q, result):
+                        break
+            except Exception as e:
+                fail(name, e)
+            finally:
+                if out_q is not None:
+                    put(out_q, _SENTINEL)
+
+        threads = [threading.Thread(target=produce, name="etl-extract", daemon=True)]
+        threads += [
+            threading.Thread(target=consume, args=(i, name, func), name=f"etl-{name}", daemon=True)
+            for i, (name, func) in enumerate(stages)
+        ]
+
+        wall_start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=self.poll_interval)
+        except KeyboardInterrupt:
+            self.log_error("----> Interrupted, cancelling pipeline")
+            cancel.set()
+            for thread in threads:
+                thread.join()
+            raise
+
+        for stage_stats in stats.values():
+            stage_stats["busy_s"] = round(stage_stats["busy_s"], 3)
+        stats["wall_s"] = round(time.perf_counter() - wall_start, 3)
+
+        if errors:
+            raise errors[0]
+
+        self.log_info(f"----> Pipelined run completed: {stats}")
+        return stats
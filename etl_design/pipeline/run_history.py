@@ -0,0 +1,148 @@
+import math
+import statistics
+from datetime import datetime
+from typing import Dict, List, Optional
+from etl_design.base_etl import BaseETL
+
+
+def run_record(metadata: Dict, run_mode: str) -> Dict:
+    """
+    Rút gọn metadata của 1 lần chạy thành record lịch sử: chỉ các số đo hiệu năng phẳng
+    dạng `{stage}.duration_s`, `{stage}.rows`, `{stage}.rows_per_s` và `run.*`.
+    Stage đọc lại từ checkpoint (resumed) và auto-tune bị bỏ qua vì không phản ánh hiệu năng.
+    """
+    metrics = {}
+    stages = metadata.get("stages") or {}
+    for stage, stats in stages.items():
+        # Chế độ pipelined có thêm 'wall_s' dạng số, đã có trong run.duration_s
+        if not isinstance(stats, dict) or stats.get("resumed") or stage == "auto_tune":
+            continue
+        seconds = stats.get("duration_s", stats.get("busy_s"))
+        if seconds is not None:
+            metrics[f"{stage}.duration_s"] = seconds
+        if stats.get("rows") is not None:
+            metrics[f"{stage}.rows"] = stats["rows"]
+            if seconds:
+                metrics[f"{stage}.rows_per_s"] = round(stats["rows"] / seconds, 1)
+
+    if metadata.get("duration_s") is not None:
+        tuning = (stages.get("auto_tune") or {}).get("duration_s", 0)
+        metrics["run.duration_s"] = round(metadata["duration_s"] - tuning, 3)
+        if metrics.get("raw.rows") and metrics["run.duration_s"] > 0:
+            metrics["run.rows_per_s"] = round(metrics["raw.rows"] / metrics["run.duration_s"], 1)
+
+    started_at = metadata.get("started_at") or datetime.now().isoformat(timespec="seconds")
+    return {
+        "run_id": metadata.get("run_id"),
+        "source": metadata.get("source"),
+        "run_mode": run_mode,
+        "status": metadata.get("status", "success"),
+        "started_at": started_at,
+        "ts": datetime.fromisoformat(started_at).timestamp(),
+        "metrics": metrics,
+    }
+
+
+def _direction(metric: str) -> int:
+    """+1: tăng là xấu (thời gian), -1: giảm là xấu (throughput), 0: không đánh giá (số dòng)."""
+    if metric.endswith("_per_s"):
+        return -1
+    if metric.endswith("duration_s"):
+        return 1
+    return 0
+
+
+class RegressionAnalyzer(BaseETL):
+    """
+    So sánh 1 lần chạy với baseline trượt gồm `window` lần chạy thành công gần nhất
+    (cùng run_mode) để phát hiện hồi quy hiệu năng:
+
+        - shift: giá trị lệch khỏi median baseline quá `z_threshold` lần độ lệch robust
+          (1.4826 * MAD) và quá `min_change` tương đối -> chậm đột ngột
+        - trend: kiểm định Mann-Kendall 1 phía trên baseline + lần chạy hiện tại, độ dốc
+          Theil-Sen cho biết mức trôi -> chậm dần qua nhiều lần chạy, mỗi lần đều dưới ngưỡng shift
+
+    Với `batch_window_s` > 0, trend của run.duration_s kèm số lần chạy còn lại trước khi
+    vượt cửa sổ batch nếu tiếp tục chậm theo độ dốc hiện tại.
+
+    Median / MAD thay vì mean / stdev để 1 lần chạy bất thường trong baseline không làm
+    lệch ngưỡng.
+    """
+
+    def __init__(self, window: int = 20, min_runs: int = 5, z_threshold: float = 3.0,
+                 trend_z: float = 2.33, min_change: float = 0.1, batch_window_s: float = 0, backend=None):
+        super().__init__("RegressionAnalyzer", backend)
+        self.window = window
+        self.min_runs = max(3, min_runs)
+        self.z_threshold = z_threshold
+        self.trend_z = trend_z
+        self.min_change = min_change
+        self.batch_window_s = batch_window_s
+
+    def execute(self, history: List[Dict], current: Optional[Dict] = None) -> List[Dict]:
+        """
+        Args:
+            history: Record lịch sử theo thứ tự thời gian (cũ -> mới)
+            current: Record cần đánh giá, mặc định là record mới nhất trong `history`
+
+        Returns:
+            Danh sách phát hiện {'metric', 'kind', 'value', ...}, rỗng nếu không có hồi quy
+        """
+        runs = [run for run in history if run.get("status") == "success"]
+        if current is None:
+            if not runs:
+                return []
+            current = runs.pop()
+        baseline = [run for run in runs
+                    if run.get("run_mode") == current.get("run_mode") and run.get("ts", 0) < current.get("ts", 0)]
+        baseline = baseline[-self.window:]
+        if len(baseline) < self.min_runs:
+            self.log_info(f"----> Only {len(baseline)} baseline runs, need {self.min_runs} to detect regressions")
+            return []
+
+        findings = []
+        for metric, value in current.get("metrics", {}).items():
+            direction = _direction(metric)
+            values = [run["metrics"][metric] for run in baseline if metric in run.get("metrics", {})]
+            if not direction or len(values) < self.min_runs:
+                continue
+            for finding in (self._shift(metric, value, values, direction),
+                            self._trend(metric, values + [value], direction)):
+                if finding:
+                    findings.append(finding)
+
+        for finding in findings:
+            self.log_warning(f"----> Performance regression ({finding['kind']}) on {finding['metric']}: {finding}")
+        return findings
+
+    def _shift(self, metric: str, value: float, values: List[float], direction: int) -> Optional[Dict]:
+        median = statistics.median(values)
+        if not median:
+            return None
+        mad = statistics.median(abs(v - median) for v in values)
+        # Baseline gần như hằng số -> MAD = 0, dùng 1% median để z không chia cho 0
+        scale = 1.4826 * mad or abs(median) * 0.01
+        z = direction * (value - median) / scale
+        change = direction * (value - median) / abs(median)
+        if z < self.z_threshold or change < self.min_change:
+            return None
+        return {"metric": metric, "kind": "shift", "value": value, "baseline_median": median,
+                "change_pct": round(change * 100, 1), "z": round(z, 2)}
+
+    def _trend(self, metric: str, series: List[float], direction: int) -> Optional[Dict]:
+        n = len(series)
+        pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+        s = sum((series[j] > series[i]) - (series[j] < series[i]) for i, j in pairs)
+        variance = n * (n - 1) * (2 * n + 5) / 18
+        z = direction * (s - math.copysign(1, s)) / math.sqrt(variance) if s else 0.0
+        slope = statistics.median((series[j] - series[i]) / (j - i) for i, j in pairs)
+        median = statistics.median(series)
+        drift = direction * slope * (n - 1) / abs(median) if median else 0.0
+        if z < self.trend_z or drift < self.min_change:
+            return None
+
+        finding = {"metric": metric, "kind": "trend", "value": series[-1], "runs": n,
+                   "slope_per_run": round(slope, 3), "drift_pct": round(drift * 100, 1), "z": round(z, 2)}
+        if metric == "run.duration_s" and self.batch_window_s and slope > 0:
+            finding["runs_until_batch_window"] = max(0, math.floor((self.batch_window_s - series[-1]) / slope))
+        return finding
@@ -0,0 +1,119 @@
+from __future__ import annotations
+from typing import Dict, List
+from etl_design.base_etl import BaseETL
+from etl_design.transformers.fact_trans import FACT_TABLES
+from etl_design.lazy_import import lazy_module
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+# Ngày sự kiện của từng bảng Fact, dùng để chọn đúng phiên bản SCD2
+FACT_EVENT_DATES = {
+    'fact_transaction': 'transaction_date',
+    'fact_loan_application': 'application_date',
+    'fact_feedback': 'feedback_date',
+    'fact_account_snapshot': 'snapshot_date_key',
+    'fact_card_snapshot': 'snapshot_date_key',
+}
+
+# Key sai tên sẽ không bao giờ khớp Fact nào -> fact bị map theo phiên bản hiện tại mà không báo lỗi
+_unknown_facts = set(FACT_EVENT_DATES) - set(FACT_TABLES)
+if _unknown_facts:
+    raise ValueError(f"----> FACT_EVENT_DATES has tables FactTransformer does not produce: {sorted(_unknown_facts)}")
+
+
+class AsOfKeyResolver(BaseETL):
+    """
+    Map business key + ngày sự kiện -> surrogate key của phiên bản SCD2 có hiệu lực tại ngày đó.
+
+    Các khoảng (business_key, valid_from_date, valid_to_date, surrogate_key) của
+    dimension được đọc 1 lần cho các business key trong batch, sort theo
+    valid_from_date, rồi tra cứu toàn bộ fact trong 1 lần merge_asof (by business key).
+
+    Fact có ngày sự kiện trước phiên bản đầu tiên (vd: backfill dữ liệu cũ trước khi
+    dimension được tải lần đầu) được gán phiên bản sớm nhất của business key đó.
+    """
+
+    def __init__(self, connector, backend=None):
+        super().__init__("AsOfKeyResolver", backend)
+        self.connector = connector
+
+    def execute(self, dim_name: str, config: Dict, business_keys: pd.Series, event_dates: pd.Series) -> pd.Series:
+        intervals = self.load_intervals(dim_name, config, business_keys)
+        return self.resolve(business_keys, event_dates, intervals)
+
+    def load_intervals(self, dim_name: str, config: Dict, business_keys: pd.Series, conn=None) -> pd.DataFrame:
+        """
+        Đọc mọi phiên bản của các business key cần tra cứu.
+
+        Args:
+            conn: Kết nối khác với kết nối của loader (vd. thread map key trước khi ghi dimension)
+        """
+        b_key = config['business_key']
+        s_key = config['surrogate_key']
+        keys = [str(value) for value in business_keys.dropna().unique().tolist()]
+
+        with (conn or self.connector.conn).cursor() as cursor:
+            cursor.execute(
+                f"SELECT {b_key}, valid_from_date, valid_to_date, {s_key} FROM {dim_name} "
+                f"WHERE {b_key} = ANY(%s::varchar[]);",
+                (keys,)
+            )
+            rows = cursor.fetchall()
+
+        intervals = pd.DataFrame(rows, columns=['_bk', 'valid_from', 'valid_to', 'surrogate_key'])
+        intervals['_bk'] = intervals['_bk'].astype(str)
+        intervals['valid_from'] = pd.to_datetime(intervals['valid_from'], errors='coerce')
+        # '9999-12-31' vượt giới hạn datetime64[ns] -> NaT, hiểu là khoảng còn mở
+        intervals['valid_to'] = pd.to_datetime(intervals['valid_to'], errors='coerce')
+        intervals = intervals.dropna(subset=['valid_from']).sort_values('valid_from', kind='stable')
+        self.log_info(f"----> Loaded {len(intervals)} SCD2 intervals from {dim_name} for {len(keys)} business keys")
+        return intervals.reset_index(drop=True)
+
+    @staticmethod
+    def with_pending_versions(intervals: pd.DataFrame, expired_keys: List[int], new_versions: pd.DataFrame) -> pd.DataFrame:
+        """
+        Áp dụng trước lên các khoảng đã đọc đúng thay đổi mà merge SCD2 sắp ghi:
+        phiên bản bị expire đóng tại CURRENT_DATE - 1, phiên bản mới (cùng cột với intervals) được thêm vào.
+        """
+        intervals = intervals.copy()
+        if expired_keys:
+            closing = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+            intervals.loc[intervals['surrogate_key'].isin(expired_keys), 'valid_to'] = closing
+        if len(new_versions):
+            intervals = pd.concat([intervals, new_versions], ignore_index=True)
+        return intervals.sort_values('valid_from', kind='stable').reset_index(drop=True)
+
+    def resolve(self, business_keys: pd.Series, event_dates: pd.Series, intervals: pd.DataFrame) -> pd.Series:
+        """
+        Returns:
+            Series surrogate key (Int64) cùng index với business_keys; <NA> khi thiếu
+            business key / ngày sự kiện hoặc không có phiên bản nào.
+        """
+        facts = pd.DataFrame({
+            '_bk': business_keys.astype(str).where(business_keys.notna()).to_numpy(),
+            '_date': pd.to_datetime(event_dates, errors='coerce').to_numpy(),
+            '_row': np.arange(len(business_keys)),
+        })
+        result = np.full(len(facts), np.nan)
+        facts = facts.dropna(subset=['_bk', '_date'])
+
+        if len(facts) and len(intervals):
+            facts = facts.sort_values('_date', kind='stable')
+
+            # 1. Phiên bản mới nhất có valid_from <= ngày sự kiện
+            matched = pd.merge_asof(facts, intervals, left_on='_date', right_on='valid_from',
+                                    by='_bk', direction='backward')
+            covered = matched['surrogate_key'].notna() & (
+                matched['valid_to'].isna() | (matched['_date'] <= matched['valid_to'])
+            )
+            result[matched.loc[covered, '_row'].to_numpy()] = matched.loc[covered, 'surrogate_key'].to_numpy(dtype=float)
+
+            # 2. Ngày sự kiện trước phiên bản đầu tiên -> phiên bản sớm nhất
+            before_first = matched.loc[matched['surrogate_key'].isna(), ['_bk', '_date', '_row']]
+            if len(before_first):
+                earliest = pd.merge_asof(before_first, intervals, left_on='_date', right_on='valid_from',
+                                         by='_bk', direction='forward')
+                found = earliest['surrogate_key'].notna()
+                result[earliest.loc[found, '_row'].to_numpy()] = earliest.loc[found, 'surrogate_key'].to_numpy(dtype=float)
+
+        return pd.Series(result, index=business_keys.index).astype('Int64')
@@ -1,20 +1,25 @@
-from typing import Dict
-import pandas as pd
+from __future__ import annotations
+from typing import Dict, Set
 from etl_design.base_etl import BaseETL
-from datetime import datetime
+from etl_design.transformers.dimension_deduplicator import DIM_BUSINESS_KEYS
+from datetime import date, datetime
+from etl_design.lazy_import import lazy_module
+pd = lazy_module("pandas")
 
 class DimensionTransformers(BaseETL):
     """Transform data for dimension tables"""
     
-    def __init__(self):
-        super().__init__(DimensionTransformers)
+    def __init__(self, backend=None):
+        super().__init__("DimensionTransformers", backend)
 
-    def execute(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    def execute(self, df: pd.DataFrame, changed_keys: Dict[str, Set[str]] = None) -> Dict[str, pd.DataFrame]:
         """
         Transform raw data into dimension tables
         
         Args:
             df: Raw DataFrame
+            changed_keys: Business key mới/thay đổi của từng dimension (từ SnapshotDiffEngine);
+                          None = giữ tất cả
             
         Returns:
             Dict of dimension DataFrames
@@ -32,12 +37,26 @@ class DimensionTransformers(BaseETL):
             dimensions['dim_loan'] = self._transform_loan(df)
             dimensions['dim_date'] = self._transform_date(df)
 
+            if changed_keys is not None:
+                dimensions = self._keep_changed(dimensions, changed_keys)
+
             self.log_info(f"----> Dimension tranformation completed")
             return dimensions
         except Exception as e:
             self.log_error(f"----> Error tranforming dimensions: {e}")
             return None
     
+    def _keep_changed(self, dimensions: Dict[str, pd.DataFrame], changed_keys: Dict[str, Set[str]]) -> Dict[str, pd.DataFrame]:
+        """Chỉ giữ các dòng có business key nằm trong changed_keys (dimension không có trong changed_keys giữ nguyên)."""
+        for dim_name, keys in changed_keys.items():
+            dim_df = dimensions.get(dim_name)
+            b_key = DIM_BUSINESS_KEYS.get(dim_name)
+            if dim_df is None or b_key not in dim_df.columns:
+                continue
+            dimensions[dim_name] = dim_df[dim_df[b_key].astype(str).isin(keys)]
+            self.log_info(f"----> {dim_name}: {len(dimensions[dim_name])}/{len(dim_df)} rows changed since last snapshot")
+        return dimensions
+
     def _transform_customer(self, df: pd.DataFrame) -> pd.DataFrame:
         """Transform customer dimension"""
         customer_df = df[['Customer ID', 'Age', 'Gender', 'City']].copy()
@@ -54,7 +73,7 @@ class DimensionTransformers(BaseETL):
         })
 
         customer_df['valid_from_date'] = datetime.now().date()
-        customer_df['valid_to_date'] =  pd.to_datetime('9999-12-31').date()
+        customer_df['valid_to_date'] =  date(9999, 12, 31)
         customer_df['is_current'] = True
 
         return customer_df[['customer_id_source', 'birth_year', 'gender', 'city', 'valid_from_date', 'valid_to_date', 'is_current']]
@@ -78,6 +97,7 @@ class DimensionTransformers(BaseETL):
     def _transform_branch(self, df: pd.DataFrame) -> pd.DataFrame:
         """Transform branch dimension"""
         branch_df = df[['Branch ID']].copy()
+        branch_df = branch_df.drop_duplicates(subset=['Branch ID'])
         
         branch_df = branch_df.rename(columns={'Branch ID': 'branch_id_source'})
         branch_df['branch_name'] = 'Branch ' + branch_df['branch_id_source'].astype(str)
@@ -93,13 +113,13 @@ class DimensionTransformers(BaseETL):
         account_df = account_df.drop_duplicates(subset=['Customer ID'])
         
         account_df['account_id_source'] = 'ACC_' + account_df['Customer ID'].astype(str)
-        account_df['date_of_account_opening'] = pd.to_datetime(account_df['Date Of Account Opening'])
-        account_df['last_transaction_date'] = pd.to_datetime(account_df['Last Transaction Date'])
+        account_df['date_of_account_opening'] = self.backend.lib.to_datetime(account_df['Date Of Account Opening'])
+        account_df['last_transaction_date'] = self.backend.lib.to_datetime(account_df['Last Transaction Date'])
         
         account_df = account_df.rename(columns={'Account Type': 'account_type'})
         
         account_df['valid_from_date'] = datetime.now().date()
-        account_df['valid_to_date'] = pd.to_datetime('9999-12-31').date()
+        account_df['valid_to_date'] = date(9999, 12, 31)
         account_df['is_current'] = True
         
         return account_df[['account_id_source', 'account_type', 'date_of_account_opening',
@@ -118,7 +138,7 @@ class DimensionTransformers(BaseETL):
         })
         
         card_df['valid_from_date'] = datetime.now().date()
-        card_df['valid_to_date'] = pd.to_datetime('9999-12-31').date()
+        card_df['valid_to_date'] = date(9999, 12, 31)
         card_df['is_current'] = True
         
         return card_df
@@ -139,7 +159,7 @@ class DimensionTransformers(BaseETL):
         })
         
         loan_df['valid_from_date'] = datetime.now().date()
-        loan_df['valid_to_date'] = pd.to_datetime('9999-12-31').date()
+        loan_df['valid_to_date'] = date(9999, 12, 31)
         loan_df['is_current'] = True
         
         return loan_df
@@ -150,14 +170,15 @@ class DimensionTransformers(BaseETL):
                        'Last Transaction Date', 'Approval/Rejection Date', 
                        'Feedback Date', 'Resolution Date']
         
+        lib = self.backend.lib
         all_dates = []
         for col in date_columns:
             if col in df.columns:
-                dates = pd.to_datetime(df[col], errors='coerce').dropna()
-                all_dates.extend(dates.unique())
+                dates = lib.to_datetime(df[col], errors='coerce').dropna()
+                all_dates.append(dates.rename('date_key'))
         
-        all_dates = pd.Series(all_dates).unique()
-        date_df = pd.DataFrame({'date_key': pd.to_datetime(all_dates)})
+        all_dates = lib.concat(all_dates, ignore_index=True).drop_duplicates()
+        date_df = all_dates.to_frame(name='date_key')
         date_df = date_df.sort_values('date_key').reset_index(drop=True)
         
         # Generate date attributes
@@ -0,0 +1,230 @@
+from __future__ import annotations
+import os
+import shutil
+from typing import Dict, List, Tuple
+from etl_design.base_etl import BaseETL
+from etl_design.lazy_import import lazy_module
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+# Business key của từng dimension sau khi DimensionTransformers rename cột
+DIM_BUSINESS_KEYS = {
+    'dim_customer': 'customer_id_source',
+    'dim_customer_pii': 'customer_id_source',
+    'dim_branch': 'branch_id_source',
+    'dim_account': 'account_id_source',
+    'dim_card': 'card_id_source',
+    'dim_loan': 'loan_id_source',
+    'dim_date': 'date_key',
+}
+
+# Cột SCD do ETL tự sinh, không dùng để phát hiện thay đổi
+SCD_COLUMNS = {'valid_from_date', 'valid_to_date', 'is_current'}
+
+
+class SpillingKeyStore:
+    """
+    Lưu (hash business key -> hash thuộc tính) cho 1 dimension.
+
+    Tầng bộ nhớ là 1 Series uint64 (index = key hash). Khi vượt memory budget,
+    toàn bộ được sort và ghi ra 1 file .npy (run) trên đĩa, tra cứu bằng
+    searchsorted trên file memory-mapped. Quá max_runs file thì gộp lại thành 1.
+    """
+
+    def __init__(self, spill_dir: str, memory_budget_bytes: int, max_runs: int = 8):
+        self.spill_dir = spill_dir
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_runs = max_runs
+        self.memory = pd.Series(np.array([], dtype=np.uint64), index=pd.Index([], dtype=np.uint64))
+        self.runs: List[str] = []
+        self.spill_count = 0
+
+    def lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Trả về (found mask, attr hash) cho từng key; bản ghi mới nhất được ưu tiên."""
+        found = np.zeros(len(keys), dtype=bool)
+        attrs = np.zeros(len(keys), dtype=np.uint64)
+
+        positions = self.memory.index.get_indexer(keys)
+        hit = positions >= 0
+        attrs[hit] = self.memory.values[positions[hit]]
+        found |= hit
+
+        for run_path in reversed(self.runs):
+            pending = np.flatnonzero(~found)
+            if len(pending) == 0:
+                break
+            run = np.load(run_path, mmap_mode='r')
+            run_keys = run[0]
+            pos = np.searchsorted(run_keys, keys[pending])
+            pos_clipped = np.minimum(pos, len(run_keys) - 1)
+            hit = run_keys[pos_clipped] == keys[pending]
+            attrs[pending[hit]] = run[1][pos_clipped[hit]]
+            found[pending[hit]] = True
+
+        return found, attrs
+
+    def update(self, keys: np.ndarray, attrs: np.ndarray):
+        if len(keys) == 0:
+            return
+        keep = ~self.memory.index.isin(keys)
+        self.memory = pd.concat([self.memory[keep], pd.Series(attrs, index=pd.Index(keys, dtype=np.uint64))])
+        if self.memory.memory_usage(index=True) > self.memory_budget_bytes:
+            self._spill()
+
+    def _spill(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        memory = self.memory.sort_index()
+        run_path = os.path.join(self.spill_dir, f"run_{self.spill_count:05d}.npy")
+        np.save(run_path, np.vstack([memory.index.values, memory.values]))
+        self.runs.append(run_path)
+        self.spill_count += 1
+        self.memory = self.memory.iloc[0:0]
+
+        if len(self.runs) > self.max_runs:
+            self._compact()
+
+    def _compact(self, block_rows: int = 1 << 20):
+        """
+        Gộp các run thành 1 run bằng k-way merge theo block, giữ bản ghi mới nhất của mỗi key.
+
+        Mỗi vòng lấy pivot = nhỏ nhất trong các key cuối của block kế tiếp ở từng run, rồi chỉ đọc
+        (memory-mapped) các key <= pivot của mọi run -> mỗi run góp tối đa block_rows dòng, bộ nhớ
+        ~ số run x block_rows thay vì toàn bộ các run. Kết quả ghi nối tiếp ra file tạm rồi chép vào .npy.
+        """
+        runs = [np.load(run_path, mmap_mode='r') for run_path in self.runs]
+        positions = [0] * len(runs)
+        run_path = os.path.join(self.spill_dir, f"run_{self.spill_count:05d}.npy")
+        tmp_paths = [f"{run_path}.keys.tmp", f"{run_path}.attrs.tmp"]
+        total = 0
+
+        with open(tmp_paths[0], 'wb') as keys_file, open(tmp_paths[1], 'wb') as attrs_file:
+            while True:
+                active = [i for i, run in enumerate(runs) if positions[i] < run.shape[1]]
+                if not active:
+                    break
+                pivot = min(runs[i][0, min(positions[i] + block_rows, runs[i].shape[1]) - 1] for i in active)
+
+                keys, attrs, ages = [], [], []
+                for i in active:
+                    start = positions[i]
+                    end = start + int(np.searchsorted(runs[i][0, start:], pivot, side='right'))
+                    keys.append(np.asarray(runs[i][0, start:end]))
+                    attrs.append(np.asarray(runs[i][1, start:end]))
+                    ages.append(np.full(end - start, i))
+                    positions[i] = end
+
+                keys, attrs, ages = np.concatenate(keys), np.concatenate(attrs), np.concatenate(ages)
+                # Sort theo key rồi theo thứ tự run: với key trùng, dòng cuối thuộc run mới nhất
+                order = np.lexsort((ages, keys))
+                keys, attrs = keys[order], attrs[order]
+                latest = np.append(keys[1:] != keys[:-1], True)
+                keys[latest].tofile(keys_file)
+                attrs[latest].tofile(attrs_file)
+                total += int(latest.sum())
+
+        merged = np.lib.format.open_memmap(run_path, mode='w+', dtype=np.uint64, shape=(2, total))
+        for row, tmp_path in enumerate(tmp_paths):
+            values = np.memmap(tmp_path, dtype=np.uint64, mode='r', shape=(total,))
+            for start in range(0, total, block_rows):
+                merged[row, start:start + block_rows] = values[start:start + block_rows]
+            del values
+            os.remove(tmp_path)
+        merged.flush()
+        del merged, runs
+
+        for old_path in self.runs:
+            os.remove(old_path)
+        self.runs = [run_path]
+        self.spill_count += 1
+
+    def __len__(self):
+        return len(self.memory) + sum(np.load(run_path, mmap_mode='r').shape[1] for run_path in self.runs)
+
+
+class DimensionDeduplicator(BaseETL):
+    """
+    Loại bỏ các dòng dimension đã gặp ở chunk trước (cùng business key, cùng thuộc tính).
+
+    Chỉ dòng xuất hiện lần đầu hoặc có thuộc tính thay đổi mới được đưa vào
+    SCD merge. Trạng thái được giữ xuyên suốt 1 lần chạy theo chunk.
+
+    `execute` chỉ tra cứu; key store chỉ được cập nhật qua `commit` với các dòng đã
+    load thành công (sau quality gate), nên dòng bị cách ly hoặc bị rollback vẫn được
+    đưa vào merge ở chunk sau. Chunk đang transform song song với lần load trước có
+    thể gửi lại dòng chưa commit - SCD merge so với DB nên không tạo phiên bản thừa.
+    """
+
+    def __init__(self, spill_dir: str = ".dedup_spill", memory_budget_mb: int = 256, backend=None):
+        super().__init__("DimensionDeduplicator", backend)
+        self.spill_dir = spill_dir
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.stores: Dict[str, SpillingKeyStore] = {}
+
+    def execute(self, dimensions: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """
+        Args:
+            dimensions: Dict dimension DataFrame của 1 chunk (output của DimensionTransformers)
+
+        Returns:
+            Dict dimension DataFrame chỉ còn các dòng mới hoặc thay đổi
+        """
+        deduped = {}
+        for dim_name, df in dimensions.items():
+            b_key = DIM_BUSINESS_KEYS.get(dim_name)
+            if df is None or b_key is None or b_key not in df.columns or df.empty:
+                deduped[dim_name] = df
+                continue
+
+            pdf = self.backend.to_pandas(df)
+            mask = self._new_or_changed(dim_name, pdf, b_key)
+            kept = pdf[mask]
+            self.log_info(f"----> {dim_name}: {len(kept)}/{len(pdf)} rows are new or changed")
+            deduped[dim_name] = self.backend.from_pandas(kept)
+        return deduped
+
+    def _store(self, dim_name: str) -> SpillingKeyStore:
+        if dim_name not in self.stores:
+            # Chia đều memory budget cho các dimension
+            budget = self.memory_budget_bytes // len(DIM_BUSINESS_KEYS)
+            self.stores[dim_name] = SpillingKeyStore(os.path.join(self.spill_dir, dim_name), budget)
+        return self.stores[dim_name]
+
+    def commit(self, dimensions: Dict[str, pd.DataFrame]):
+        """
+        Ghi nhận vào key store các dòng dimension đã load thành công.
+
+        Args:
+            dimensions: Dict dimension DataFrame đã qua quality gate và merge xong (PostgresLoader.loaded_dimensions)
+        """
+        for dim_name, df in dimensions.items():
+            b_key = DIM_BUSINESS_KEYS.get(dim_name)
+            if df is None or b_key is None or b_key not in df.columns or df.empty:
+                continue
+            keys, attrs = self._hash_rows(self.backend.to_pandas(df), b_key)
+            first = ~pd.Index(keys).duplicated(keep='first')
+            self._store(dim_name).update(keys[first], attrs[first])
+
+    @staticmethod
+    def _hash_rows(df: pd.DataFrame, b_key: str) -> Tuple[np.ndarray, np.ndarray]:
+        attr_cols = [col for col in df.columns if col != b_key and col not in SCD_COLUMNS]
+
+        # Hash theo chuỗi để kiểu dữ liệu suy luận khác nhau giữa các chunk không làm lệch hash
+        keys = pd.util.hash_pandas_object(df[b_key].astype(str), index=False).to_numpy(dtype=np.uint64)
+        if attr_cols:
+            attrs = pd.util.hash_pandas_object(df[attr_cols].astype(str), index=False).to_numpy(dtype=np.uint64)
+        else:
+            attrs = np.zeros(len(df), dtype=np.uint64)
+        return keys, attrs
+
+    def _new_or_changed(self, dim_name: str, df: pd.DataFrame, b_key: str) -> np.ndarray:
+        keys, attrs = self._hash_rows(df, b_key)
+
+        # Trùng key trong cùng chunk: giữ dòng đầu tiên (giống drop_duplicates của transformer)
+        first_in_chunk = ~pd.Index(keys).duplicated(keep='first')
+
+        found, previous = self._store(dim_name).lookup(keys)
+        return first_in_chunk & (~found | (previous != attrs))
+
+    def close(self):
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+        self.stores = {}
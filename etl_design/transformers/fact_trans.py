@@ -1,12 +1,18 @@
+from __future__ import annotations
 from typing import Dict
-import pandas as pd
 from etl_design.base_etl import BaseETL
+from etl_design.lazy_import import lazy_module
+pd = lazy_module("pandas")
+
+# Các bảng Fact do FactTransformer sinh ra (key của dict trả về từ execute)
+FACT_TABLES = ('fact_transaction', 'fact_loan_application', 'fact_feedback',
+               'fact_account_snapshot', 'fact_card_snapshot')
 
 class FactTransformer(BaseETL):
     """Transform data for fact tables"""
 
-    def __init__(self):
-        super().__init__(FactTransformer)
+    def __init__(self, backend=None):
+        super().__init__("FactTransformer", backend)
     
     def execute(self,df: pd.DataFrame, dimension_keys: Dict) -> Dict[str, pd.DataFrame]:
         """
@@ -22,13 +28,17 @@ class FactTransformer(BaseETL):
         try:
             self.log_info(f"----> Transforming facts")
             
+            transforms = {
+                'fact_transaction': self._transform_transaction,
+                'fact_loan_application': self._transform_loan_application,
+                'fact_feedback': self._transform_feedback,
+                'fact_account_snapshot': self._transform_account_snapshot,
+                'fact_card_snapshot': self._transform_card_snapshot,
+            }
             facts = {}
-
-            facts['fact_transaction'] = self._transform_transaction(df, dimension_keys)
-            facts['fact_loan_application'] = self._transform_transaction(df, dimension_keys)
-            facts['fact_feedback'] = self._transform_transaction(df, dimension_keys)
-            facts['fact_account_snapshot'] = self._transform_transaction(df, dimension_keys)
-            facts['fact_card_snapshot'] = self._transform_transaction(df, dimension_keys)
+            for fact_name in FACT_TABLES:
+                facts[fact_name] = transforms[fact_name](df, dimension_keys)
+                self.log_info(f"----> {fact_name}: {len(facts[fact_name])} rows")
 
             self.log_info(f"----> Fact transformation completed")
             return facts
@@ -47,11 +57,11 @@ class FactTransformer(BaseETL):
             'Transaction Date': 'transaction_date',
             'Transaction Type': 'transaction_type',
             'Transaction Amount': 'transaction_amount',
-            'Account Balance After Transaction': 'acc_balancer_after_transaction',
+            'Account Balance After Transaction': 'acc_balance_after_transaction',
             'Anomaly': 'anomaly_flag'
         })
         
-        trans_df['date_key'] = pd.to_datetime(trans_df['date_key'])
+        trans_df['transaction_date'] = self.backend.lib.to_datetime(trans_df['transaction_date'])
         
         # Map to dimension keys (placeholder - will be done via JOIN in loader)
         trans_df['customer_id_source'] = df['Customer ID']
@@ -71,7 +81,7 @@ class FactTransformer(BaseETL):
             'Loan Status': 'application_status'
         })
         
-        loan_df['application_date_key'] = pd.to_datetime(loan_df['application_date_key'])
+        loan_df['application_date'] = self.backend.lib.to_datetime(loan_df['application_date'])
         loan_df['customer_id_source'] = df['Customer ID']
         loan_df['loan_id_source'] = df['Loan ID']
         
@@ -90,8 +100,8 @@ class FactTransformer(BaseETL):
             'Resolution Status': 'resolution_status'
         })
         
-        feedback_df['feedback_date_key'] = pd.to_datetime(feedback_df['feedback_date_key'])
-        feedback_df['resolution_date_key'] = pd.to_datetime(feedback_df['resolution_date_key'], errors='coerce')
+        feedback_df['feedback_date'] = self.backend.lib.to_datetime(feedback_df['feedback_date'])
+        feedback_df['resolution_date'] = self.backend.lib.to_datetime(feedback_df['resolution_date'], errors='coerce')
         feedback_df['customer_id_source'] = df['Customer ID']
         
         return feedback_df
@@ -106,7 +116,7 @@ class FactTransformer(BaseETL):
             'Account Balance': 'account_balance'
         })
         
-        snapshot_df['snapshot_date_key'] = pd.to_datetime(snapshot_df['snapshot_date_key'])
+        snapshot_df['snapshot_date_key'] = self.backend.lib.to_datetime(snapshot_df['snapshot_date_key'])
         snapshot_df['customer_id_source'] = df['Customer ID']
         snapshot_df['account_id_source'] = 'ACC_' + df['Customer ID'].astype(str)
         
@@ -125,8 +135,8 @@ class FactTransformer(BaseETL):
             'Payment Due Date': 'payment_due_date'
         })
         
-        card_snap_df['snapshot_date_key'] = pd.to_datetime(card_snap_df['snapshot_date_key'])
-        card_snap_df['payment_due_date'] = pd.to_datetime(card_snap_df['payment_due_date'])
+        card_snap_df['snapshot_date_key'] = self.backend.lib.to_datetime(card_snap_df['snapshot_date_key'])
+        card_snap_df['payment_due_date'] = self.backend.lib.to_datetime(card_snap_df['payment_due_date'])
         card_snap_df['customer_id_source'] = df['Customer ID']
         card_snap_df['card_id_source'] = df['CardID']
         
@@ -0,0 +1,197 @@
+from __future__ import annotations
+from typing import Dict, Iterator, List, Optional
+from etl_design.base_etl import BaseETL
+from etl_design.lazy_import import lazy_module
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+
+class DailySnapshotBuilder(BaseETL):
+    """
+    Sinh snapshot cuối ngày cho Fact_Account_Snapshot / Fact_Card_Snapshot.
+
+    Chỉ lưu các "điểm thay đổi" (entity, ngày, giá trị) đã sort, mã hoá thành
+    1 mảng int64 (entity * span + ngày). Giá trị của 1 entity tại 1 ngày bất kỳ
+    là điểm thay đổi gần nhất <= ngày đó, tìm bằng searchsorted -> forward-fill
+    qua các ngày không có giao dịch mà không cần dựng cả lưới entity x ngày.
+    Lưới chỉ được sinh theo từng partition tối đa `partition_rows` dòng.
+
+    Tăng dần: trạng thái của ngày snapshot cuối cùng (last_state) là số dư mở đầu,
+    chỉ sinh các ngày sau ngày đó.
+    """
+
+    # Chiều của giao dịch đối với số dư tài khoản
+    TRANSACTION_SIGNS = {'deposit': 1, 'withdrawal': -1, 'transfer': -1}
+
+    ACCOUNT_COLUMNS = ['snapshot_date_key', 'account_key', 'customer_key', 'account_balance']
+    CARD_COLUMNS = ['snapshot_date_key', 'card_key', 'customer_key',
+                    'credit_card_balance', 'minimum_payment_due', 'payment_due_date']
+
+    def __init__(self, partition_rows: int = 500000, backend=None):
+        super().__init__("DailySnapshotBuilder", backend)
+        self.partition_rows = partition_rows
+
+    def execute(self, table_name: str, source: pd.DataFrame, last_state: Optional[pd.DataFrame] = None,
+                end_date=None) -> Iterator[pd.DataFrame]:
+        if table_name == 'fact_account_snapshot':
+            return self.build_account_snapshots(source, last_state, end_date)
+        if table_name == 'fact_card_snapshot':
+            return self.build_card_snapshots(source, last_state, end_date)
+        raise ValueError(f"No snapshot builder for {table_name}")
+
+    # ---------- Account ----------
+    def build_account_snapshots(self, transactions: pd.DataFrame, last_state: Optional[pd.DataFrame] = None,
+                                end_date=None) -> Iterator[pd.DataFrame]:
+        """
+        Args:
+            transactions: Fact_Transaction đã map key (account_key, customer_key, transaction_date_key,
+                          transaction_type, transaction_amount[, acc_balance_after_transaction])
+            last_state: Các dòng Fact_Account_Snapshot của ngày snapshot cuối cùng (nếu có)
+            end_date: Ngày snapshot cuối cần sinh (mặc định: ngày giao dịch mới nhất)
+
+        Yields:
+            Các partition DataFrame theo cột ACCOUNT_COLUMNS, tăng dần theo ngày
+        """
+        tx = self.backend.to_pandas(transactions)
+        tx = tx.dropna(subset=['account_key', 'transaction_date_key']).copy()
+        tx['_day'] = pd.to_datetime(tx['transaction_date_key'], errors='coerce').dt.normalize()
+        tx = self._drop_before(tx.dropna(subset=['_day']), last_state, 'fact_account_snapshot')
+
+        sign = tx['transaction_type'].astype(str).str.strip().str.lower().map(self.TRANSACTION_SIGNS)
+        if sign.isna().any():
+            self.log_warning(f"----> {int(sign.isna().sum())} transactions have an unknown type, ignored in balances")
+        tx['_delta'] = pd.to_numeric(tx['transaction_amount'], errors='coerce').fillna(0) * sign.fillna(0)
+        tx = tx.sort_values(['account_key', '_day'], kind='stable')
+
+        # Số dư mở đầu: snapshot trước đó, hoặc suy ra từ số dư sau giao dịch đầu tiên
+        opening = self._opening(last_state, 'account_key', ['customer_key', 'account_balance'])
+        new_accounts = tx[~tx['account_key'].isin(opening['account_key'])]
+        if len(new_accounts):
+            first = new_accounts.groupby('account_key', sort=False).first()
+            if 'acc_balance_after_transaction' in first.columns:
+                seed = pd.to_numeric(first['acc_balance_after_transaction'], errors='coerce').fillna(0) - first['_delta']
+            else:
+                seed = pd.Series(0.0, index=first.index)
+            opening = pd.concat([opening, pd.DataFrame({
+                'account_key': first.index,
+                'customer_key': first['customer_key'].to_numpy(),
+                'account_balance': seed.to_numpy(),
+            })], ignore_index=True)
+
+        # Số dư cuối ngày = số dư mở đầu + cumsum biến động theo ngày
+        daily = tx.groupby(['account_key', '_day'], sort=False).agg(
+            _delta=('_delta', 'sum'), customer_key=('customer_key', 'last')
+        ).reset_index()
+        base = daily['account_key'].map(opening.set_index('account_key')['account_balance']).fillna(0)
+        daily['account_balance'] = (daily.groupby('account_key', sort=False)['_delta'].cumsum() + base).round(2)
+
+        return self._daily_partitions(daily, opening, 'account_key', ['customer_key', 'account_balance'],
+                                      last_state, end_date, self.ACCOUNT_COLUMNS)
+
+    # ---------- Card ----------
+    def build_card_snapshots(self, card_states: pd.DataFrame, last_state: Optional[pd.DataFrame] = None,
+                             end_date=None) -> Iterator[pd.DataFrame]:
+        """
+        Args:
+            card_states: Trạng thái thẻ đã map key tại các ngày có dữ liệu
+                         (snapshot_date_key, card_key, customer_key, credit_card_balance, ...)
+
+        Yields:
+            Các partition DataFrame theo cột CARD_COLUMNS, trạng thái được giữ nguyên qua các ngày trống
+        """
+        value_cols = self.CARD_COLUMNS[2:]
+        states = self.backend.to_pandas(card_states)
+        states = states.dropna(subset=['card_key', 'snapshot_date_key']).copy()
+        states['_day'] = pd.to_datetime(states['snapshot_date_key'], errors='coerce').dt.normalize()
+        states = self._drop_before(states.dropna(subset=['_day']), last_state, 'fact_card_snapshot')
+        states = states.sort_values(['card_key', '_day'], kind='stable')
+        changes = states.drop_duplicates(['card_key', '_day'], keep='last')[['card_key', '_day'] + value_cols]
+
+        opening = self._opening(last_state, 'card_key', value_cols)
+        return self._daily_partitions(changes, opening, 'card_key', value_cols,
+                                      last_state, end_date, self.CARD_COLUMNS)
+
+    # ---------- Helpers ----------
+    @staticmethod
+    def _last_date(last_state: Optional[pd.DataFrame]):
+        if last_state is None or last_state.empty:
+            return None
+        return pd.to_datetime(last_state['snapshot_date_key']).max().normalize()
+
+    def _drop_before(self, df: pd.DataFrame, last_state: Optional[pd.DataFrame], table_name: str) -> pd.DataFrame:
+        """Dòng thuộc ngày đã có snapshot không thể áp dụng lại mà không sinh lại lịch sử -> bỏ qua."""
+        last_date = self._last_date(last_state)
+        if last_date is None:
+            return df
+        late = df['_day'] <= last_date
+        if late.any():
+            self.log_warning(f"----> {int(late.sum())} rows are on or before the last {table_name} "
+                             f"date {last_date.date()}, skipped")
+        return df[~late]
+
+    @staticmethod
+    def _opening(last_state: Optional[pd.DataFrame], entity_col: str, value_cols: List[str]) -> pd.DataFrame:
+        if last_state is None or last_state.empty:
+            return pd.DataFrame(columns=[entity_col] + value_cols)
+        return last_state[[entity_col] + value_cols].drop_duplicates(entity_col, keep='last').reset_index(drop=True)
+
+    def _daily_partitions(self, changes: pd.DataFrame, opening: pd.DataFrame, entity_col: str,
+                          value_cols: List[str], last_state: Optional[pd.DataFrame], end_date,
+                          columns: List[str]) -> Iterator[pd.DataFrame]:
+        last_date = self._last_date(last_state)
+        start = last_date + pd.Timedelta(days=1) if last_date is not None else (
+            changes['_day'].min() if len(changes) else None
+        )
+        end = pd.Timestamp(end_date).normalize() if end_date is not None else (
+            changes['_day'].max() if len(changes) else None
+        )
+        if start is None or end is None or pd.isna(start) or pd.isna(end) or end < start:
+            self.log_info(f"----> No new snapshot days for {entity_col}")
+            return
+
+        entities = pd.Index(pd.concat([opening[entity_col], changes[entity_col]], ignore_index=True).unique())
+        n_days = (end - start).days + 1
+        span = n_days + 1  # ô 0 = số dư mở đầu, ô 1..n_days = các ngày cần sinh
+
+        # Mảng điểm thay đổi đã sort theo (entity, ngày)
+        codes = np.concatenate([
+            entities.get_indexer(opening[entity_col]).astype(np.int64) * span,
+            entities.get_indexer(changes[entity_col]).astype(np.int64) * span
+            + (changes['_day'] - start).dt.days.to_numpy(dtype=np.int64) + 1,
+        ])
+        values = {col: np.concatenate([opening[col].to_numpy(dtype=object), changes[col].to_numpy(dtype=object)])
+                  for col in value_cols}
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        values = {col: arr[order] for col, arr in values.items()}
+        self.log_info(f"----> Building {n_days} snapshot days for {len(entities)} {entity_col} "
+                      f"from {len(codes)} change points")
+
+        entity_block = max(1, min(len(entities), self.partition_rows))
+        window_days = max(1, self.partition_rows // entity_block)
+        for day_from in range(1, n_days + 1, window_days):
+            days = np.arange(day_from, min(day_from + window_days, n_days + 1), dtype=np.int64)
+            for entity_from in range(0, len(entities), entity_block):
+                entity_ids = np.arange(entity_from, min(entity_from + entity_block, len(entities)), dtype=np.int64)
+                partition = self._fill(codes, values, span, entities, entity_ids, days, start, entity_col, value_cols)
+                if len(partition):
+                    yield partition[columns]
+
+    @staticmethod
+    def _fill(codes: np.ndarray, values: Dict[str, np.ndarray], span: int, entities: pd.Index,
+              entity_ids: np.ndarray, days: np.ndarray, start, entity_col: str, value_cols: List[str]) -> pd.DataFrame:
+        """Giá trị của mỗi (entity, ngày) trong partition = điểm thay đổi gần nhất trước hoặc tại ngày đó."""
+        query = (days[:, None] + entity_ids[None, :] * span).ravel()
+        pos = np.searchsorted(codes, query, side='right') - 1
+        known = pos >= 0
+        known[known] = codes[pos[known]] // span == query[known] // span
+        pos = pos[known]
+        query = query[known]
+
+        partition = pd.DataFrame({
+            'snapshot_date_key': (start + pd.to_timedelta(query % span - 1, unit='D')).date,
+            entity_col: entities.take(query // span),
+        })
+        for col in value_cols:
+            partition[col] = values[col][pos]
+        return partition
@@ -0,0 +1,137 @@
+from __future__ import annotations
+import os
+import re
+from typing import Dict, List
+from etl_design.base_etl import BaseETL
+from etl_design.lazy_import import lazy_module
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+
+# Thực thể trong file nguồn: (cột business key, cột thuộc tính, dimension sinh ra, tiền tố business key của dimension)
+SOURCE_ENTITIES = {
+    'customer': ('Customer ID', ['Age', 'Gender', 'City', 'First Name', 'Last Name',
+                                 'Address', 'Contact Number', 'Email'],
+                 ['dim_customer', 'dim_customer_pii'], ''),
+    'branch': ('Branch ID', [], ['dim_branch'], ''),
+    'account': ('Customer ID', ['Account Type', 'Date Of Account Opening', 'Last Transaction Date'],
+                ['dim_account'], 'ACC_'),
+    'card': ('CardID', ['Card Type', 'Credit Limit', 'Rewards Points'], ['dim_card'], ''),
+    'loan': ('Loan ID', ['Loan Type', 'Loan Amount', 'Interest Rate', 'Loan Term', 'Loan Status'],
+             ['dim_loan'], ''),
+}
+
+
+class SnapshotDiffEngine(BaseETL):
+    """
+    Phát hiện thay đổi theo dòng cho nguồn gửi lại toàn bộ snapshot mỗi lần.
+
+    Mỗi thực thể (customer, account, ...) được hash theo business key (hash thuộc tính),
+    so sánh với hash index của lần chạy trước (Parquet hoặc Redis HASH) để tách ra
+    các key inserted / updated / deleted. Chỉ key inserted + updated được đưa vào
+    DimensionTransformers; key deleted được expire ở các dimension SCD2.
+
+    Index mới chỉ được ghi khi gọi commit() sau khi load thành công, nên lần chạy lỗi
+    sẽ so sánh lại với index cũ.
+    """
+
+    def __init__(self, source_id: str, store: str = "parquet", index_dir: str = ".snapshot_index",
+                 redis_cache=None, backend=None):
+        super().__init__("SnapshotDiffEngine", backend)
+        # bucket/object -> tên thư mục / Redis key an toàn
+        self.source_id = re.sub(r"[^A-Za-z0-9_.-]+", "_", source_id)
+        self.store = store
+        self.index_dir = os.path.join(index_dir, self.source_id)
+        self.redis_cache = redis_cache
+        self._pending: Dict[str, pd.DataFrame] = {}
+
+    def execute(self, df: pd.DataFrame) -> Dict:
+        """
+        Args:
+            df: Snapshot nguồn đầy đủ (raw DataFrame)
+
+        Returns:
+            {
+                'changed_keys': {dim_name: set business key mới / thay đổi},
+                'deleted_keys': {dim_name: list business key không còn trong snapshot},
+                'stats': {entity: {'inserted', 'updated', 'deleted', 'unchanged'}},
+            }
+        """
+        df = self.backend.to_pandas(df)
+        changed_keys, deleted_keys, stats = {}, {}, {}
+        self._pending = {}
+
+        for entity, (key_col, attr_cols, dim_names, prefix) in SOURCE_ENTITIES.items():
+            if key_col not in df.columns:
+                continue
+            current = self._hash_rows(df, key_col, [col for col in attr_cols if col in df.columns])
+            previous = self._read_index(entity)
+
+            previous_hash = current['business_key'].map(previous.set_index('business_key')['row_hash'])
+            inserted = previous_hash.isna()
+            updated = ~inserted & (previous_hash != current['row_hash'])
+            deleted = previous.loc[~previous['business_key'].isin(current['business_key']), 'business_key']
+
+            changed = current.loc[inserted | updated, 'business_key']
+            for dim_name in dim_names:
+                changed_keys[dim_name] = set(prefix + changed)
+                deleted_keys[dim_name] = (prefix + deleted).tolist()
+            stats[entity] = {
+                'inserted': int(inserted.sum()),
+                'updated': int(updated.sum()),
+                'deleted': len(deleted),
+                'unchanged': int(len(current) - inserted.sum() - updated.sum()),
+            }
+            self._pending[entity] = current
+            self.log_info(f"----> {entity}: {stats[entity]}")
+
+        return {'changed_keys': changed_keys, 'deleted_keys': deleted_keys, 'stats': stats}
+
+    @staticmethod
+    def _hash_rows(df: pd.DataFrame, key_col: str, attr_cols: List[str]) -> pd.DataFrame:
+        # Dòng đầu tiên của mỗi business key, giống drop_duplicates của DimensionTransformers
+        rows = df.dropna(subset=[key_col]).drop_duplicates(subset=key_col, keep='first')
+        if attr_cols:
+            # Hash theo chuỗi để kiểu dữ liệu suy luận khác nhau giữa các lần chạy không làm lệch hash
+            row_hash = pd.util.hash_pandas_object(rows[attr_cols].astype(str), index=False).to_numpy(dtype=np.uint64)
+        else:
+            row_hash = np.zeros(len(rows), dtype=np.uint64)
+        return pd.DataFrame({'business_key': rows[key_col].astype(str).to_numpy(), 'row_hash': row_hash})
+
+    # ---------- Hash index ----------
+    def _index_path(self, entity: str) -> str:
+        return os.path.join(self.index_dir, f"{entity}.parquet")
+
+    def _read_index(self, entity: str) -> pd.DataFrame:
+        empty = pd.DataFrame({'business_key': pd.Series([], dtype=object),
+                              'row_hash': pd.Series([], dtype=np.uint64)})
+        if self.store == "redis":
+            mapping = self.redis_cache.execute('get_snapshot_index', source_id=self.source_id, entity=entity)
+            if not mapping:
+                return empty
+            return pd.DataFrame({
+                'business_key': list(mapping.keys()),
+                'row_hash': np.array([int(value) for value in mapping.values()], dtype=np.uint64),
+            })
+
+        path = self._index_path(entity)
+        if not os.path.exists(path):
+            return empty
+        return pd.read_parquet(path)
+
+    def commit(self):
+        """Ghi hash index của snapshot vừa load thành công."""
+        for entity, index in self._pending.items():
+            if self.store == "redis":
+                # RedisCache trả về None khi lỗi: index cũ còn nguyên -> lần sau diff lại toàn bộ thay đổi,
+                # nhưng phải báo lỗi để pipeline không coi snapshot là đã commit
+                saved = self.redis_cache.execute('save_snapshot_index', source_id=self.source_id, entity=entity,
+                                                 mapping=dict(zip(index['business_key'], index['row_hash'].astype(str))))
+                if not saved:
+                    raise RuntimeError(f"----> Failed to save snapshot hash index for {entity} to Redis")
+            else:
+                os.makedirs(self.index_dir, exist_ok=True)
+                tmp_path = f"{self._index_path(entity)}.tmp"
+                index.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, self._index_path(entity))
+        self.log_info(f"----> Saved snapshot hash index for {len(self._pending)} entities ({self.store})")
+        self._pending = {}
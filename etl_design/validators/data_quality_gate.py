@@ -0,0 +1,109 @@
+import os
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from etl_design.base_etl import BaseETL
+
+
+class DataQualityGate(BaseETL):
+    """
+    Kiểm tra chất lượng dữ liệu trước khi load, theo từng cột (vectorized).
+
+    Rule được sinh từ metadata của schema (sql/schema.sql đã deploy, đọc qua
+    SchemaMetadataCache):
+        - not_null:       cột NOT NULL có giá trị rỗng
+        - max_length:     VARCHAR(n) vượt quá n ký tự
+        - numeric_format: giá trị không parse được sang số cho cột NUMERIC
+        - numeric_range:  NUMERIC(p, s) vượt quá phần nguyên cho phép
+        - orphan_fk:      foreign key không tìm thấy trong dimension
+
+    Các dòng lỗi được cách ly ra file Parquet kèm lý do, chỉ dòng sạch được load tiếp.
+    """
+
+    def __init__(self, schema_cache, quarantine_dir: str = ".quarantine", backend=None):
+        super().__init__("DataQualityGate", backend)
+        self.schema_cache = schema_cache
+        self.quarantine_dir = quarantine_dir
+        self.run_tag = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    def execute(self, table_name: str, df, conn=None,
+                orphan_masks: Optional[Dict[str, object]] = None) -> Tuple[object, int]:
+        """
+        Args:
+            table_name: Tên bảng đích trong Postgres
+            df: DataFrame chuẩn bị load
+            conn: Connection dùng để introspect nếu cache metadata chưa có
+            orphan_masks: {cột FK: mask True ở dòng có business key nhưng không map được surrogate key}
+
+        Returns:
+            (DataFrame sạch, số dòng bị cách ly)
+        """
+        table_meta = self.schema_cache.get_table(table_name, conn)
+        if not table_meta:
+            self.log_warning(f"----> No schema metadata for {table_name}, skipping quality gate")
+            return df, 0
+
+        masks = self._build_masks(df, table_meta)
+        for col, mask in (orphan_masks or {}).items():
+            masks[f"orphan_fk:{col}"] = mask
+
+        if not masks:
+            return df, 0
+
+        lib = self.backend.lib
+        mask_df = lib.DataFrame(masks)
+        bad = mask_df.any(axis=1)
+        bad_count = int(bad.sum())
+        if bad_count == 0:
+            self.log_info(f"----> Quality gate passed for {table_name} ({len(df)} rows)")
+            return df, 0
+
+        rule_counts = {rule: int(count) for rule, count in mask_df.sum().items() if count}
+        self.log_warning(f"----> Quarantining {bad_count}/{len(df)} rows of {table_name}: {rule_counts}")
+        self._quarantine(table_name, df[bad], mask_df[bad])
+
+        return df[~bad], bad_count
+
+    def _build_masks(self, df, table_meta: Dict) -> Dict[str, object]:
+        lib = self.backend.lib
+        masks = {}
+
+        for col, col_meta in table_meta["columns"].items():
+            if col not in df.columns:
+                continue
+            series = df[col]
+            is_null = series.isna()
+
+            if col_meta.get("not_null"):
+                masks[f"not_null:{col}"] = is_null
+
+            max_length = col_meta.get("char_max_length")
+            if max_length:
+                masks[f"max_length:{col}"] = ~is_null & (series.astype(str).str.len() > max_length)
+
+            precision = col_meta.get("numeric_precision")
+            if precision:
+                scale = col_meta.get("numeric_scale") or 0
+                numeric = lib.to_numeric(series, errors='coerce')
+                masks[f"numeric_format:{col}"] = ~is_null & numeric.isna()
+                masks[f"numeric_range:{col}"] = numeric.abs().round(scale) >= 10 ** (precision - scale)
+
+        return masks
+
+    def _quarantine(self, table_name: str, bad_df, bad_masks):
+        """Ghi các dòng lỗi kèm cột dq_reasons ra Parquet."""
+        bad_df = self.backend.to_pandas(bad_df).copy()
+        bad_masks = self.backend.to_pandas(bad_masks)
+        bad_df["dq_reasons"] = bad_masks.dot(bad_masks.columns + ";").str.rstrip(";").values
+        bad_df["dq_quarantined_at"] = datetime.now()
+
+        target_dir = os.path.join(self.quarantine_dir, table_name)
+        os.makedirs(target_dir, exist_ok=True)
+        target_path = os.path.join(target_dir, f"{self.run_tag}.parquet")
+        if os.path.exists(target_path):
+            target_path = os.path.join(target_dir, f"{self.run_tag}_{datetime.now().strftime('%f')}.parquet")
+
+        try:
+            bad_df.to_parquet(target_path, index=False)
+            self.log_info(f"----> Quarantined rows written to {target_path}")
+        except Exception as e:
+            self.log_error(f"----> Failed to write quarantine file {target_path}: {e}")
@@ -0,0 +1,42 @@
+-- Physical design theo workload, chạy sau schema.sql (SchemaManager physical_design='workload')
+-- Thay các B-tree 1 cột trên mọi FK của bảng Fact bằng:
+--   - BRIN trên cột ngày được load theo thứ tự tăng dần (rất nhỏ, gần như không tốn chi phí khi load)
+--   - B-tree composite / covering cho các access path của dashboard: (branch, ngày) và (customer, ngày)
+-- Các Dim theo SCD2 không bao giờ bị DELETE nên FK không cần index phía Fact để kiểm tra.
+
+-----------------------------
+-------------Fact------------
+-----------------------------
+-- 1. Fact Transaction
+DROP INDEX IF EXISTS idx_fact_trans_date_key;
+DROP INDEX IF EXISTS idx_fact_trans_customer_key;
+DROP INDEX IF EXISTS idx_fact_trans_account_key;
+DROP INDEX IF EXISTS idx_fact_trans_branch_key;
+DROP INDEX IF EXISTS idx_fact_trans_card_key;
+
+-- Quét theo khoảng ngày (báo cáo ngày / tháng / quý)
+CREATE INDEX idx_fact_trans_date_brin ON Fact_Transaction
+    USING BRIN (transaction_date_key) WITH (pages_per_range = 32, autosummarize = on);
+-- Dashboard chi nhánh: branch = ? AND ngày trong khoảng, đủ cột để index-only scan
+CREATE INDEX idx_fact_trans_branch_date ON Fact_Transaction (branch_key, transaction_date_key)
+    INCLUDE (transaction_type, transaction_amount);
+-- Lịch sử giao dịch của khách hàng (customer 360, số dư cuối)
+CREATE INDEX idx_fact_trans_customer_date ON Fact_Transaction (customer_key, transaction_date_key)
+    INCLUDE (transaction_amount, acc_balance_after_transaction);
+
+-- 2. Fact Account Snapshot / 3. Fact Card Snapshot
+-- PK (snapshot_date_key, ...) đã phục vụ truy vấn theo ngày; thêm access path theo khách hàng
+CREATE INDEX idx_fact_acc_snap_customer_date ON Fact_Account_Snapshot (customer_key, snapshot_date_key)
+    INCLUDE (account_balance);
+CREATE INDEX idx_fact_card_snap_customer_date ON Fact_Card_Snapshot (customer_key, snapshot_date_key)
+    INCLUDE (credit_card_balance);
+
+-- 4. Fact Loan Application
+DROP INDEX IF EXISTS idx_fact_loan_app_customer_key;
+DROP INDEX IF EXISTS idx_fact_loan_app_loan_key;
+CREATE INDEX idx_fact_loan_app_customer_date ON Fact_Loan_Application (customer_key, application_date_key);
+
+-- 5. Fact Feedback
+DROP INDEX IF EXISTS idx_fact_feedback_customer_key;
+DROP INDEX IF EXISTS idx_fact_feedback_res_date_key;
+CREATE INDEX idx_fact_feedback_customer_date ON Fact_Feedback (customer_key, feedback_date_key);
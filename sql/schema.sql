@@ -83,7 +83,7 @@ CREATE INDEX idx_dim_loan_business_key ON Dim_Loan(loan_id_source);
 -- 4. Dim Branch
 CREATE TABLE Dim_Branch (
     branch_key                  SERIAL PRIMARY KEY,
-    branch_id_source            VARCHAR(50) NOT NULL, -- Business Key
+    branch_id_source            VARCHAR(50) NOT NULL UNIQUE, -- Business Key
     branch_name                 VARCHAR(255),  
     branch_location             VARCHAR(255)             
 );
@@ -149,14 +149,14 @@ CREATE TABLE Fact_Transaction (
     acc_balance_after_transaction   NUMERIC(18,2) NOT NULL,     -- Semi-additive
 
     -- FK Constraint
-    CONSTRAINT fk_fact_trans_date FOREIGN KEY (date_key) REFERENCES Dim_Date(date_key),
+    CONSTRAINT fk_fact_trans_date FOREIGN KEY (transaction_date_key) REFERENCES Dim_Date(date_key),
     CONSTRAINT fk_fact_trans_customer FOREIGN KEY (customer_key) REFERENCES Dim_Customer(customer_key),
     CONSTRAINT fk_fact_trans_account FOREIGN KEY (account_key) REFERENCES Dim_Account(account_key),
     CONSTRAINT fk_fact_trans_branch FOREIGN KEY (branch_key) REFERENCES Dim_Branch(branch_key),
     CONSTRAINT fk_fact_trans_card FOREIGN KEY (card_key) REFERENCES Dim_Card(card_key)
 );
 COMMENT ON TABLE Fact_Transaction IS 'Ghi lại chi tiết mỗi giao dịch. Granularity: 1 hàng / 1 giao dịch.';
-CREATE INDEX idx_fact_trans_date_key ON Fact_Transaction(date_key);
+CREATE INDEX idx_fact_trans_date_key ON Fact_Transaction(transaction_date_key);
 CREATE INDEX idx_fact_trans_customer_key ON Fact_Transaction(customer_key);
 CREATE INDEX idx_fact_trans_account_key ON Fact_Transaction(account_key);
 CREATE INDEX idx_fact_trans_branch_key ON Fact_Transaction(branch_key);
@@ -242,4 +242,82 @@ CREATE TABLE Fact_Feedback (
 COMMENT ON TABLE Fact_Feedback IS 'Ghi lại các sự kiện phản hồi từ khách hàng.';
 CREATE INDEX idx_fact_feedback_date_key ON Fact_Feedback(feedback_date_key);
 CREATE INDEX idx_fact_feedback_res_date_key ON Fact_Feedback(resolution_date_key);
-CREATE INDEX idx_fact_feedback_customer_key ON Fact_Feedback(customer_key);
\ No newline at end of file
+CREATE INDEX idx_fact_feedback_customer_key ON Fact_Feedback(customer_key);
+
+-----------------------------
+-----------Aggregate---------
+-----------------------------
+-- Các bảng tổng hợp được loader cập nhật tăng dần (chỉ cộng delta của mỗi lần load)
+DROP TABLE IF EXISTS Agg_Daily_Branch_Transaction CASCADE;
+DROP TABLE IF EXISTS Agg_Monthly_Customer_Balance CASCADE;
+DROP TABLE IF EXISTS Agg_Loan_Approval_By_Type CASCADE;
+
+-- 1. Tổng giao dịch theo ngày / chi nhánh / loại giao dịch
+CREATE TABLE Agg_Daily_Branch_Transaction (
+    transaction_date_key            DATE NOT NULL,
+    branch_key                      INT NOT NULL,
+    transaction_type                VARCHAR(50) NOT NULL,
+
+    -- Measure
+    transaction_count               BIGINT NOT NULL DEFAULT 0,
+    total_amount                    NUMERIC(20,2) NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (transaction_date_key, branch_key, transaction_type)
+);
+COMMENT ON TABLE Agg_Daily_Branch_Transaction IS 'Tổng hợp giao dịch theo ngày, chi nhánh và loại giao dịch.';
+CREATE INDEX idx_agg_daily_branch_key ON Agg_Daily_Branch_Transaction(branch_key, transaction_date_key);
+
+-- 2. Số dư theo tháng / khách hàng
+CREATE TABLE Agg_Monthly_Customer_Balance (
+    month_key                       DATE NOT NULL,          -- Ngày đầu tháng
+    customer_key                    INT NOT NULL,
+
+    -- Measure
+    transaction_count               BIGINT NOT NULL DEFAULT 0,
+    min_balance                     NUMERIC(18,2),
+    max_balance                     NUMERIC(18,2),
+    closing_balance                 NUMERIC(18,2),          -- Số dư sau giao dịch cuối cùng trong tháng
+    last_transaction_date           DATE,
+
+    PRIMARY KEY (month_key, customer_key)
+);
+COMMENT ON TABLE Agg_Monthly_Customer_Balance IS 'Tổng hợp số dư tài khoản của khách hàng theo tháng.';
+CREATE INDEX idx_agg_monthly_customer_key ON Agg_Monthly_Customer_Balance(customer_key, month_key);
+
+-- 3. Tỉ lệ duyệt khoản vay theo loại khoản vay
+CREATE TABLE Agg_Loan_Approval_By_Type (
+    loan_type                       VARCHAR(100) PRIMARY KEY,
+
+    -- Measure
+    application_count               BIGINT NOT NULL DEFAULT 0,
+    approved_count                  BIGINT NOT NULL DEFAULT 0,
+    approval_rate                   NUMERIC(7,4) GENERATED ALWAYS AS (
+        CASE WHEN application_count = 0 THEN 0
+             ELSE approved_count::NUMERIC / application_count END
+    ) STORED
+);
+COMMENT ON TABLE Agg_Loan_Approval_By_Type IS 'Tỉ lệ duyệt khoản vay theo Dim_Loan.loan_type.';
+
+
+-----------------------------
+---------ETL Control---------
+-----------------------------
+DROP TABLE IF EXISTS Etl_Load_Progress CASCADE;
+DROP TABLE IF EXISTS Etl_Pending_Card_State CASCADE;
+
+-- Batch facts đã commit (ghi trong cùng transaction với batch) -> chạy lại sẽ bỏ qua
+CREATE TABLE Etl_Load_Progress (
+    run_id                          VARCHAR(100) NOT NULL,
+    input_fingerprint               VARCHAR(64) NOT NULL,
+    batch_id                        VARCHAR(200) NOT NULL,
+    row_count                       INT NOT NULL,
+    committed_at                    TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (run_id, input_fingerprint, batch_id)
+);
+COMMENT ON TABLE Etl_Load_Progress IS 'Tiến độ commit theo batch của các lần load facts.';
+
+-- Trạng thái thẻ đã qua quality gate, chờ sinh Fact_Card_Snapshot theo ngày (xoá khi đã sinh).
+-- Ghi cùng transaction với chunk / batch facts -> chunk sau và lần resume đều thấy
+CREATE TABLE Etl_Pending_Card_State (LIKE Fact_Card_Snapshot);
+COMMENT ON TABLE Etl_Pending_Card_State IS 'Trạng thái thẻ chờ sinh snapshot cuối ngày (snapshot_mode = daily).';
@@ -3,6 +3,7 @@ from psycopg2.errors import Error as PsycopgError
 import os
 import sys
 from dotenv import load_dotenv
+from src.schema_metadata import SchemaMetadataCache, FACT_DATE_COLUMNS
 
 load_dotenv()
 
@@ -16,6 +17,9 @@ PG_CONN_INFO = {
 
 SQL_FILE_PATH = r"D:\Project\Data_Engineering\DE_Pipeline\sql\schema.sql"
 
+# Physical design theo workload, nằm cạnh schema.sql
+PHYSICAL_DESIGN_FILE_NAME = "physical_design.sql"
+
 # Tên schema và các bảng quan trọng cần kiểm tra
 PG_SCHEMA_NAME = "risk_dwh"
 EXPECTED_PG_TABLES = [
@@ -33,30 +37,73 @@ EXPECTED_PG_TABLES = [
 class SchemaManager:
     """
     Quản lý việc tạo và xác thực schema cho PostgreSQL.
+
+    physical_design:
+        - 'default': index như trong schema.sql (B-tree 1 cột trên mọi FK của Fact)
+        - 'workload': áp dụng thêm physical_design.sql (BRIN trên cột ngày, index
+          composite / covering cho (branch, ngày) và (customer, ngày))
     """
-    def __init__(self, pg_conn_info):
+    def __init__(self, pg_conn_info, physical_design="default"):
+        if physical_design not in ("default", "workload"):
+            raise ValueError(f"Unknown physical design: {physical_design}")
         self.pg_conn_info = pg_conn_info
-        print(f"----> SchemaManager khởi tạo. Sẵn sàng kết nối")
+        self.physical_design = physical_design
+        print(f"----> SchemaManager khởi tạo (physical design: {physical_design}). Sẵn sàng kết nối")
 
     def create_postgresql_schema(self, sql_file_path):
         print(f"----> Đang thực thi {sql_file_path} trên PostgreSQL")
         if not os.path.exists(sql_file_path):
             print(f"----> Lỗi. Không tìm thấy file {sql_file_path}")
             return False
+        physical_design_path = os.path.join(os.path.dirname(sql_file_path), PHYSICAL_DESIGN_FILE_NAME)
+        sql_files = [sql_file_path]
+        if self.physical_design == "workload":
+            sql_files.append(physical_design_path)
         try:
             with psycopg2.connect(**self.pg_conn_info) as conn:
                 with conn.cursor() as cur:
-                    with open(sql_file_path, 'r', encoding='utf-8') as f:
-                        sql_scripts = f.read()
+                    # Schema + physical design trong cùng 1 transaction
+                    for path in sql_files:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            sql_scripts = f.read()
 
-                    cur.execute(sql_scripts)
+                        cur.execute(sql_scripts)
                 conn.commit()
 
-            print(f"----> Đã thực thi {sql_file_path} thành công")
+            # DDL vừa chạy -> fingerprint catalog đã đổi, xoá luôn các bản cache cũ (cùng key với loader)
+            SchemaMetadataCache(self.pg_conn_info).invalidate()
+
+            print(f"----> Đã thực thi {', '.join(sql_files)} thành công")
             return True
         except (PsycopgError, IOError) as e:
             print(f"----> Lỗi khi tạo PostgreSQL schema: {e}")
             return False
+
+    def cluster_fact_tables(self, tables=None):
+        """
+        Sắp xếp lại dữ liệu đã có của các bảng Fact theo cột ngày (CLUSTER), để BRIN
+        trên cột ngày có range hẹp. Dữ liệu load sau đó được loader ghi theo thứ tự ngày.
+
+        CLUSTER cần 1 B-tree -> tạo index tạm trên cột ngày, CLUSTER rồi xoá index.
+        CLUSTER giữ ACCESS EXCLUSIVE lock trên bảng, chỉ chạy ngoài giờ load.
+        """
+        tables = tables or list(FACT_DATE_COLUMNS)
+        try:
+            with psycopg2.connect(**self.pg_conn_info) as conn:
+                with conn.cursor() as cur:
+                    for table in tables:
+                        date_column = FACT_DATE_COLUMNS[table]
+                        print(f"----> CLUSTER {table} theo {date_column}")
+                        cur.execute(f"CREATE INDEX tmp_cluster_{table} ON {table} ({date_column})")
+                        cur.execute(f"CLUSTER {table} USING tmp_cluster_{table}")
+                        cur.execute(f"DROP INDEX tmp_cluster_{table}")
+                        cur.execute(f"ANALYZE {table}")
+                conn.commit()
+            print(f"----> Đã CLUSTER {len(tables)} bảng Fact theo ngày")
+            return True
+        except (PsycopgError, KeyError) as e:
+            print(f"----> Lỗi khi CLUSTER bảng Fact: {e}")
+            return False
         
     def validate_postgresql_schema(self, schema_name, table_list):
         """
@@ -76,15 +123,9 @@ class SchemaManager:
                         return False
                     print(f"----> Schema '{schema_name}' tồn tại")
                     
-                    # 2. Kiểm tra sự tồn tại của các bảng
-                    missing_tables = []
-                    for table in table_list:
-                        cur.execute(
-                            "SELECT 1 FROM information_schema.tables WHERE table_schema = %s AND table_name = %s",
-                            (schema_name, table)
-                        )
-                        if not cur.fetchone():
-                            missing_tables.append(table)
+                    # 2. Kiểm tra sự tồn tại của các bảng (fingerprint đọc từ catalog -> cache luôn khớp DDL hiện tại)
+                    metadata = SchemaMetadataCache(self.pg_conn_info, schema_name).load(conn)
+                    missing_tables = [table for table in table_list if table.lower() not in metadata]
                     
                     if missing_tables:
                         print(f"----> Lỗi. Thiếu các bảng sau: '{missing_tables}'")    
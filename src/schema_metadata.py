@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, ".cache", "schema_metadata")
+
+# Bảng Fact -> cột ngày: thứ tự ghi của loader và cột CLUSTER của schema_manager khi physical_design = 'workload'
+FACT_DATE_COLUMNS = {
+    'fact_transaction': 'transaction_date_key',
+    'fact_account_snapshot': 'snapshot_date_key',
+    'fact_card_snapshot': 'snapshot_date_key',
+    'fact_loan_application': 'application_date_key',
+    'fact_feedback': 'feedback_date_key',
+}
+
+# Cache trong bộ nhớ, dùng chung giữa các loader/validator của cùng 1 process
+_MEMORY_CACHE: Dict[str, Dict] = {}
+
+# Phiên bản DDL của schema: xmin của các dòng pg_class / pg_attribute / pg_constraint đổi
+# mỗi khi CREATE / ALTER / DROP chạm tới bảng, cột hoặc constraint -> 1 query rẻ để biết
+# cache còn đúng với database hay không, không cần introspect lại
+SQL_CATALOG_VERSION = r"""
+    SELECT md5(coalesce(string_agg(part, ',' ORDER BY part), ''))
+    FROM (
+        SELECT 'c' || c.oid || ':' || c.xmin AS part
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %(schema)s
+          AND c.relkind IN ('r', 'p')
+        UNION ALL
+        SELECT 'a' || a.attrelid || '.' || a.attnum || ':' || a.xmin
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %(schema)s
+          AND c.relkind IN ('r', 'p')
+          AND a.attnum > 0
+        UNION ALL
+        SELECT 'k' || k.oid || ':' || k.xmin
+        FROM pg_constraint k
+        JOIN pg_namespace n ON n.oid = k.connamespace
+        WHERE n.nspname = %(schema)s
+    ) AS parts;
+"""
+
+# 1 query duy nhất trên pg_catalog cho toàn bộ bảng của schema (Dim_*, Fact_*, Agg_*, Etl_*):
+# nhánh 1 trả về cột, nhánh 2 trả về constraint (PK, UNIQUE, FK, CHECK)
+SQL_INTROSPECT = r"""
+    SELECT 'column'                                       AS kind,
+           c.relname                                      AS table_name,
+           a.attnum                                       AS ordinal,
+           a.attname::text                                AS name,
+           format_type(a.atttypid, a.atttypmod)           AS data_type,
+           a.attnotnull                                   AS not_null,
+           CASE WHEN a.atttypid IN (1042, 1043) AND a.atttypmod > 0
+                THEN a.atttypmod - 4 END                  AS char_max_length,
+           CASE WHEN a.atttypid = 1700 AND a.atttypmod > 0
+                THEN ((a.atttypmod - 4) >> 16) & 65535 END AS numeric_precision,
+           CASE WHEN a.atttypid = 1700 AND a.atttypmod > 0
+                THEN (a.atttypmod - 4) & 65535 END        AS numeric_scale,
+           NULL::text[]                                   AS columns,
+           NULL::text                                     AS ref_table,
+           NULL::text[]                                   AS ref_columns
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE n.nspname = %(schema)s
+      AND c.relkind IN ('r', 'p')
+    UNION ALL
+    SELECT 'constraint',
+           c.relname,
+           0,
+           k.conname::text,
+           k.contype::text,
+           NULL, NULL, NULL, NULL,
+           ARRAY(SELECT att.attname::text
+                 FROM unnest(k.conkey) WITH ORDINALITY AS u(attnum, ord)
+                 JOIN pg_attribute att ON att.attrelid = k.conrelid AND att.attnum = u.attnum
+                 ORDER BY u.ord),
+           CASE WHEN k.contype = 'f' THEN rc.relname::text END,
+           CASE WHEN k.contype = 'f' THEN
+               ARRAY(SELECT att.attname::text
+                     FROM unnest(k.confkey) WITH ORDINALITY AS u(attnum, ord)
+                     JOIN pg_attribute att ON att.attrelid = k.confrelid AND att.attnum = u.attnum
+                     ORDER BY u.ord) END
+    FROM pg_constraint k
+    JOIN pg_class c ON c.oid = k.conrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_class rc ON rc.oid = k.confrelid
+    WHERE n.nspname = %(schema)s
+      AND c.relkind IN ('r', 'p')
+    ORDER BY 2, 1, 3;
+"""
+
+CONSTRAINT_TYPES = {'p': 'primary_key', 'u': 'unique', 'f': 'foreign_key', 'c': 'check'}
+
+
+class SchemaMetadataCache:
+    """
+    Cache metadata (cột, kiểu dữ liệu, constraint) của các bảng trong 1 schema.
+
+    Metadata được introspect bằng 1 query pg_catalog, giữ trong bộ nhớ và lưu
+    xuống file JSON local theo fingerprint = database đích + phiên bản DDL đọc từ
+    catalog (SQL_CATALOG_VERSION). DDL chạy ở bất kỳ đâu (schema_manager, migration
+    tay) đều đổi fingerprint nên cache cũ tự động bị bỏ qua.
+
+    Fingerprint được tính 1 lần cho mỗi instance (loader / validator của 1 lần chạy);
+    DDL chạy trong lúc instance còn dùng thì gọi `invalidate`.
+    """
+
+    def __init__(self, pg_conn_info: Dict, schema_name: str = "public", cache_dir: str = DEFAULT_CACHE_DIR):
+        self.pg_conn_info = pg_conn_info
+        self.schema_name = schema_name
+        self.cache_dir = cache_dir
+        self._fingerprint = None
+
+    @property
+    def database_key(self) -> str:
+        """Định danh database + schema đích, phần đầu của fingerprint và tên file cache."""
+        digest = hashlib.sha256()
+        for key in ("host", "port", "dbname"):
+            digest.update(f"{key}={self.pg_conn_info.get(key)};".encode("utf-8"))
+        digest.update(f"schema={self.schema_name};".encode("utf-8"))
+        return f"{self.schema_name}_{digest.hexdigest()[:12]}"
+
+    def fingerprint(self, conn=None) -> str:
+        if self._fingerprint is None:
+            version = self._with_connection(conn, self._catalog_version)
+            self._fingerprint = f"{self.database_key}_{version[:16]}"
+        return self._fingerprint
+
+    def _cache_path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint}.json")
+
+    def load(self, conn=None) -> Dict[str, Dict]:
+        """Lấy metadata theo thứ tự: bộ nhớ -> file local -> introspect database."""
+        fingerprint = self.fingerprint(conn)
+        metadata = _MEMORY_CACHE.get(fingerprint)
+        if metadata is not None:
+            return metadata
+
+        cache_path = self._cache_path(fingerprint)
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+                print(f"----> Đọc schema metadata từ cache {cache_path}")
+            except (OSError, ValueError) as e:
+                print(f"----> Cache schema metadata bị lỗi, introspect lại: {e}")
+                metadata = None
+
+        if metadata is None:
+            return self.refresh(conn)
+
+        _MEMORY_CACHE[fingerprint] = metadata
+        return metadata
+
+    def refresh(self, conn=None) -> Dict[str, Dict]:
+        """Introspect lại toàn bộ bảng và ghi đè cache."""
+        fingerprint = self.fingerprint(conn)
+        metadata = self._with_connection(conn, self._introspect)
+
+        _MEMORY_CACHE[fingerprint] = metadata
+        self._persist(fingerprint, metadata)
+        print(f"----> Đã introspect metadata cho {len(metadata)} bảng (fingerprint={fingerprint})")
+        return metadata
+
+    def invalidate(self):
+        """Xoá mọi cache (bộ nhớ + file) của database + schema này, dùng sau khi chạy DDL."""
+        prefix = f"{self.database_key}_"
+        for fingerprint in [key for key in _MEMORY_CACHE if key.startswith(prefix)]:
+            _MEMORY_CACHE.pop(fingerprint, None)
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(prefix):
+                    os.remove(os.path.join(self.cache_dir, name))
+        self._fingerprint = None
+
+    def get_table(self, table_name: str, conn=None) -> Optional[Dict]:
+        return self.load(conn).get(table_name.lower())
+
+    def get_columns(self, table_name: str, conn=None) -> List[str]:
+        table = self.get_table(table_name, conn)
+        return list(table["columns"].keys()) if table else []
+
+    def table_exists(self, table_name: str, conn=None) -> bool:
+        return self.get_table(table_name, conn) is not None
+
+    def _with_connection(self, conn, query):
+        """Chạy `query(conn)` trên kết nối được truyền vào, hoặc 1 kết nối riêng mở rồi đóng ngay."""
+        if conn is not None:
+            return query(conn)
+        import psycopg2
+        own_conn = psycopg2.connect(**self.pg_conn_info)
+        try:
+            return query(own_conn)
+        finally:
+            own_conn.close()
+
+    def _catalog_version(self, conn) -> str:
+        with conn.cursor() as cur:
+            cur.execute(SQL_CATALOG_VERSION, {"schema": self.schema_name})
+            return cur.fetchone()[0]
+
+    def _introspect(self, conn) -> Dict[str, Dict]:
+        with conn.cursor() as cur:
+            cur.execute(SQL_INTROSPECT, {"schema": self.schema_name})
+            rows = cur.fetchall()
+
+        metadata = {}
+        for (kind, table_name, _, name, data_type, not_null, char_max_length,
+             numeric_precision, numeric_scale, columns, ref_table, ref_columns) in rows:
+            table = metadata.setdefault(table_name, {"columns": {}, "constraints": []})
+            if kind == "column":
+                table["columns"][name] = {
+                    "type": data_type,
+                    "not_null": not_null,
+                    "char_max_length": char_max_length,
+                    "numeric_precision": numeric_precision,
+                    "numeric_scale": numeric_scale,
+                }
+            else:
+                table["constraints"].append({
+                    "name": name,
+                    "type": CONSTRAINT_TYPES.get(data_type, data_type),
+                    "columns": list(columns or []),
+                    "ref_table": ref_table,
+                    "ref_columns": list(ref_columns or []),
+                })
+        return metadata
+
+    def _persist(self, fingerprint: str, metadata: Dict):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self._cache_path(fingerprint)
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"----> Không thể lưu cache schema metadata: {e}")